@@ -1,13 +1,15 @@
 """ Fetch news articles from the Iprox system """
 import base64
+import threading
 from queue import Queue
 import json
-import requests
-from requests.exceptions import JSONDecodeError
 from GenericFunctions.Hashing import Hashing
+from GenericFunctions.HttpClient import HttpClient
+from GenericFunctions.JsonCodec import JsonCodec
 from GenericFunctions.Logger import Logger
 from GenericFunctions.TextSanitizers import TextSanitizers
-from FetchData.IproxRecursion import IproxRecursion
+from FetchData.IproxFields import IproxFields
+from FetchData.IproxIndex import IproxIndex
 
 
 class IproxArticle:
@@ -17,9 +19,33 @@ class IproxArticle:
 
         {'identifier': md5hash, 'source_identifier': md5hash, 'url': string}
     """
+    # Fields of the article nodes, compiled once (see FetchData.IproxFields)
+    data_fields = IproxFields({
+        'summary': ('Samenvatting', 'Txt', 'sanitize', ''),
+        'publication_date': ('Brondatum', 'Dtm', 'date', ''),
+        'images': ('Hero afbeelding', None, 'image')
+    }, lists=['images'])
+    content_fields = IproxFields({
+        'preface': ('Inleiding', 'Txt', 'sanitize', ''),
+        'content': ('Tekst', 'Txt', 'sanitize', ''),
+        'texts': ('Tekst', None)
+    }, lists=['texts'])
 
-    def __init__(self, backend_host='api-server', backend_port=8000, base_path='/api/v1/ingest', headers=dict):
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 backend_host='api-server',
+                 backend_port=8000,
+                 base_path='/api/v1/ingest',
+                 headers=dict,
+                 client=None,
+                 workers=1,
+                 state_store=None,
+                 full=False,
+                 buffer=None,
+                 page_store=None,
+                 negative_cache=None,
+                 parser_pool=None):
         self.logger = Logger()
+        self.client = client if client is not None else HttpClient()
         self.backend_host = backend_host
         self.backend_port = backend_port
         self.base_path = base_path
@@ -30,6 +56,16 @@ class IproxArticle:
         self.query_param = '?AppIdt=app-pagetype&reload=true'
         self.page_targets = ['Meta', 'Gegevens', 'Inhoud', 'Verwijzing', 'Download']
         self.scraper_report = {}
+        self.workers = max(1, workers)
+        self.state_store = state_store
+        self.full = full
+        self.buffer = buffer
+        self.page_store = page_store
+        self.negative_cache = negative_cache
+        self.parser_pool = parser_pool
+        self.articles = {}  # identifier -> {'jobs': [...], 'done': bool, 'article_data': {...}}
+        self.threads = []
+        self.lock = threading.Lock()
 
     @staticmethod
     def skeleton():
@@ -76,10 +112,27 @@ class IproxArticle:
         :return: json or None
         """
         try:
-            result = requests.get(url, timeout=10)
-            return result.json()
-        except JSONDecodeError:
+            # The page may have been fetched already when it was discovered
+            body = self.page_store.pop(url) if self.page_store is not None else None
+            if body is None:
+                if self.negative_cache is not None and self.negative_cache.is_dead(url):
+                    return None
+                result = self.client.get(url, timeout=10)
+                if result.status_code != 200:
+                    self.logger.error(f'failed fetching data from {url}: status {result.status_code}')
+                    # Gone for good is remembered, a failing server (eg. 429 or 5xx) is asked again on the next run
+                    if result.status_code in (404, 410) and self.negative_cache is not None:
+                        self.negative_cache.mark_dead(url, f'status {result.status_code}')
+                    return None
+                body = result.content
+            raw_data = JsonCodec.loads(body)
+            if self.negative_cache is not None:
+                self.negative_cache.mark_alive(url)
+            return raw_data
+        except json.JSONDecodeError:
             self.logger.error(f'failed fetching data from {url}: this is not json!')
+            if self.negative_cache is not None:
+                self.negative_cache.mark_dead(url, 'not json')
         except Exception as error:
             self.logger.error(f'failed fetching data from {url}: {error}')
         return None
@@ -88,28 +141,32 @@ class IproxArticle:
         """ Downloads assets from Iprox server (pdf, images) """
 
         # Check if we already have this asset on API Server, Prevent API-bandwidth saturation
-        url = f'http://{self.backend_host}:{self.backend_port}{self.base_path}/asset'
-        result_api_server_get = requests.get(url,
-                                             headers=self.headers,
-                                             params={'identifier': identifier},
-                                             timeout=10).json()
+        asset_url = f'http://{self.backend_host}:{self.backend_port}{self.base_path}/asset'
+        result_api_server_get = JsonCodec.loads(self.client.get(asset_url,
+                                                                headers=self.headers,
+                                                                params={'identifier': identifier},
+                                                                timeout=10).content)
         if result_api_server_get['status'] is False:
-            asset_result = requests.get(url, timeout=10)
+            asset_result = self.client.get(url, timeout=10)
             if asset_result.status_code == 200:
                 payload = {
                     'identifier': identifier,
                     'url': url,
                     'mime_type': mime_type,
-                    'data': base64.b64encode(asset_result.content)
+                    'data': base64.b64encode(asset_result.content).decode()
                 }
-                result_api_server_post = requests.post(url, headers=self.headers, json=payload, timeout=10)
+                result_api_server_post = self.client.post(asset_url,
+                                                          headers=dict(self.headers,
+                                                                       **{'Content-Type': 'application/json'}),
+                                                          data=JsonCodec.dumps(payload),
+                                                          timeout=10,
+                                                          idempotent=True)
                 if result_api_server_post.status_code != 200:
                     self.logger.error(result_api_server_post.text)
 
     def filter_results(self, data):
         """ Get filtered results from the iprox system """
-        iprox = IproxRecursion()
-        return iprox.filter(data, [], targets=self.page_targets)
+        return IproxIndex(data).filter(self.page_targets)
 
     def scraper(self, article):
         """ Actual scraper logic, create object, scrape data, populate object, save """
@@ -117,7 +174,26 @@ class IproxArticle:
         if raw_data is None or raw_data == {}:
             return {}
 
+        # Parse the page (in a worker process if there is a parser pool), then upload the assets it refers to
+        if self.parser_pool is not None:
+            article_data, assets = self.parser_pool.run(IproxArticle.parse, raw_data, article)
+        else:
+            article_data, assets = self.parse_page(raw_data, article)
+        for identifier, mime_type, url in assets:
+            self.get_set_asset(identifier, mime_type, url)
+        return article_data
+
+    @staticmethod
+    def parse(raw_data, article):
+        """ Article data and assets of an article page (run by the workers of a parser pool) """
+        return IproxArticle().parse_page(raw_data, article)
+
+    def parse_page(self, raw_data, article):
+        """ Article data of an article page and the assets to upload [(identifier, mime_type, url), ...], without
+            any network calls
+        """
         article_data = self.skeleton()
+        assets = []
 
         page = raw_data.get('item', {}).get('page', {})
         date = page.get('CorDtm')
@@ -136,81 +212,56 @@ class IproxArticle:
 
         for i in range(0, len(filtered_results), 1):  # pylint: disable=too-many-nested-blocks
             if filtered_results[i].get('Gegevens', None) is not None:
-                for j in range(0, len(filtered_results[i]['Gegevens']), 1):
-                    # Get summary for this news item
-                    if filtered_results[i]['Gegevens'][j].get('Nam') == 'Samenvatting':
-                        html = filtered_results[i]['Gegevens'][j].get('Txt')
-                        article_data['body']['summary']['text'] = self.sanitizer.strip_html(html)
-                        article_data['body']['summary']['html'] = self.sanitizer.rewrite_html(html)
-
-                    if filtered_results[i]['Gegevens'][j].get('Nam') == 'Brondatum':
-                        date = filtered_results[i]['Gegevens'][j].get('Dtm', '')
-                        article_data['publication_date'] = '{year}-{month}-{day}'.format(year=date[0:4],
-                                                                                           month=date[4:6],
-                                                                                           day=date[6:8])
-
-                    # Get main image for news item
-                    if filtered_results[i]['Gegevens'][j].get('Nam') == 'Hero afbeelding':
-                        data = filtered_results[i]['Gegevens'][j]
+                fields = self.data_fields(filtered_results[i]['Gegevens'])
+
+                # Get summary for this news item
+                if 'summary' in fields:
+                    html, text = fields['summary']
+                    article_data['body']['summary']['text'] = text
+                    article_data['body']['summary']['html'] = html
+
+                if 'publication_date' in fields:
+                    article_data['publication_date'] = fields['publication_date']
+
+                # Get main image for news item
+                for sources in fields['images']:
+                    article_data['images'].append({'type': 'banner', 'sources': sources})
+
+            if filtered_results[i].get('Inhoud', None) is not None:
+                fields = self.content_fields(filtered_results[i]['Inhoud'])
+
+                # Get preface for this news item
+                if 'preface' in fields:
+                    html, text = fields['preface']
+                    article_data['body']['preface']['text'] = text
+                    article_data['body']['preface']['html'] = html
+
+                # Get content for this news item
+                if 'content' in fields:
+                    html, text = fields['content']
+                    article_data['body']['content']['text'] = text
+                    article_data['body']['content']['html'] = html
+
+                # Get additional images for this news item
+                for text in fields['texts']:
+                    for asset in text.get('asset', {}):
+                        if isinstance(asset, str):
+                            asset = text['asset']
                         domain = 'https://www.amsterdam.nl'
-                        location = data.get('Src', {}).get('_', '')
+                        location = asset.get('Src', '')
+                        size = location.split('/')[-2]
                         image = {
-                            'type': 'banner',
+                            'type': 'additional',
                             'sources': {
-                                'orig': {
-                                    'url': '{domain}{location}'.format(domain=domain, location=location),
-                                    'image_id': self.hash.make_md5_hash('{domain}{location}'.format(domain=domain,
-                                                                                                    location=location)),
-                                    'filename': data.get('FilNam', ''),
+                                size: {
+                                    'url': '{domain}/publish/{location}'.format(domain=domain, location=location),
+                                    'image_id': self.hash.make_md5_hash(f'{domain}{location}'),
+                                    'filename': location.split('/')[-1],
                                     'description': ''}
                             }
                         }
-                        for asset in data.get('asset'):
-                            location = asset.get('Src', {}).get('_')
-                            filename = asset.get('FilNam', '')
-                            size = location.split('/')[-2]
-                            image['sources'][size] = {
-                                'url': '{domain}{location}'.format(domain=domain, location=location),
-                                'image_id': Hashing().make_md5_hash('{domain}{location}'.format(domain=domain,
-                                                                                                location=location)),
-                                'filename': filename,
-                                'description': ''
-                            }
                         article_data['images'].append(image)
 
-            if filtered_results[i].get('Inhoud', None) is not None:
-                for j in range(0, len(filtered_results[i]['Inhoud']), 1):
-                    # Get preface for this news item
-                    if filtered_results[i]['Inhoud'][j].get('Nam') == 'Inleiding':
-                        html = filtered_results[i]['Inhoud'][j].get('Txt')
-                        article_data['body']['preface']['text'] = self.sanitizer.strip_html(html)
-                        article_data['body']['preface']['html'] = self.sanitizer.rewrite_html(html)
-
-                    # Get content for this news item
-                    if filtered_results[i]['Inhoud'][j].get('Nam') == 'Tekst':
-                        html = filtered_results[i]['Inhoud'][j].get('Txt')
-                        article_data['body']['content']['text'] = self.sanitizer.strip_html(html)
-                        article_data['body']['content']['html'] = self.sanitizer.rewrite_html(html)
-
-                        # Get additional images for this news item
-                        for asset in filtered_results[i]['Inhoud'][j].get('asset', {}):
-                            if isinstance(asset, str):
-                                asset = filtered_results[i]['Inhoud'][j]['asset']
-                            domain = 'https://www.amsterdam.nl'
-                            location = asset.get('Src', '')
-                            size = location.split('/')[-2]
-                            image = {
-                                'type': 'additional',
-                                'sources': {
-                                    size: {
-                                        'url': '{domain}/publish/{location}'.format(domain=domain, location=location),
-                                        'image_id': self.hash.make_md5_hash(f'{domain}{location}'),
-                                        'filename': location.split('/')[-1],
-                                        'description': ''}
-                                }
-                            }
-                            article_data['images'].append(image)
-
             # Get assets for this news item
             if filtered_results[i].get('Verwijzing', None) is not None:
                 if filtered_results[i]['Verwijzing'].get('veld', {}).get('Nam') == 'Bestand':
@@ -219,7 +270,7 @@ class IproxArticle:
                     identifier = self.hash.make_md5_hash(url)
                     mime_type = 'application/{mime_type}'.format(mime_type=source.get('FilNam', '').split('.')[-1])
 
-                    self.get_set_asset(identifier, mime_type, url)
+                    assets.append((identifier, mime_type, url))
                     article_data['assets'].append({
                         'identifier': identifier,
                         'mime_type': mime_type,
@@ -228,39 +279,146 @@ class IproxArticle:
                         'filename': source.get('FilNam', '')
                     })
 
-        return article_data
+        return article_data, assets
 
     def save_article(self, article_data, message):
-        """ Post data to backend server """
-        url = f'http://{self.backend_host}:{self.backend_port}{self.base_path}/article'
-        response = requests.post(url, headers=self.headers, json=article_data, timeout=3600)
+        """ Post data to backend server, unless exactly the same article was ingested before for this project """
         scraper_result = {
             'url': f'https://amsterdam.nl/@{article_data["identifier"]}/page/',
             'title': article_data['title'],
             'publication_date': article_data['publication_date'],
         }
+
+        key = f'{article_data["identifier"]}/{article_data["project_identifier"]}'
+        # Encoded once: the same bytes are hashed, buffered and posted
+        body = JsonCodec.canonical(article_data)
+        payload_hash = self.hash.make_bytes_hash(body)
+        if self.full is False and self.state_store is not None and \
+                self.state_store.is_ingested('article', key, payload_hash):
+            print(message + ' unchanged', flush=True)
+            scraper_result['ingestion'] = 'unchanged'
+            with self.lock:
+                self.scraper_report[article_data['project_identifier']]['news'].append(scraper_result)
+            return
+
+        def saved(success, result):
+            self.article_saved(article_data['project_identifier'], scraper_result, success, result, message)
+            if success and self.state_store is not None:
+                self.state_store.set_ingested('article', key, payload_hash)
+
+        url = f'http://{self.backend_host}:{self.backend_port}{self.base_path}/article'
+        if self.buffer is not None:
+            self.buffer.add(url, body, saved)
+            return
+
+        response = self.client.post(url, headers=dict(self.headers, **{'Content-Type': 'application/json'}), data=body,
+                                    timeout=3600, idempotent=article_data.get('identifier') is not None)
         if response.status_code != 200:
-            self.logger.error(response.text)
-            print(message + f" Failed ingesting {response.text}")
+            saved(False, response.text)
+        else:
+            saved(True, JsonCodec.loads(response.content)['result'])
+
+    def article_saved(self,  # pylint: disable=too-many-arguments
+                      project_identifier, scraper_result, success, result, message):
+        """ Report the outcome of an article ingestion """
+        if not success:
+            self.logger.error(result)
+            print(message + f" Failed ingesting {result}")
             scraper_result['ingestion'] = 'failed'
         else:
-            response_json = json.loads(response.text)
-            print(message + f' {response_json["result"]}', flush=True)
+            print(message + f' {result}', flush=True)
             scraper_result['ingestion'] = 'successful'
 
-        self.scraper_report[article_data['project_identifier']]['news'].append(scraper_result)
+        with self.lock:
+            self.scraper_report[project_identifier]['news'].append(scraper_result)
 
-    def run(self, scraper_report=dict):
-        """ Keep getting jobs from a queue until the queue is empty. Scrape each item from the queue """
-        self.scraper_report = scraper_report
-        while not self.queue.empty():
-            # Get queued 'article' and scrape data
-            job = self.queue.get()
+    def add(self, article, project_type):
+        """ Queue an article for scraping. An article linked from several projects is scraped once, its result is
+            saved for every project that links to it.
+        """
+        job = {'article': article, 'project_type': project_type}
+        with self.lock:
+            entry = self.articles.get(article['identifier'])
+            if entry is None:
+                self.articles[article['identifier']] = {'jobs': [job], 'done': False, 'article_data': None}
+                self.queue.put(job)
+                return
+            if entry['done'] is False:
+                # Scraping is queued or in progress, this project is saved when it is done
+                entry['jobs'].append(job)
+                return
+            # Scraped already: a worker saves it for this project. add() may run on the thread of the ingestion
+            # buffer (its callbacks queue the news of a project), saving from there would block on the buffer itself
+            self.queue.put(dict(job, article_data=entry['article_data']))
+
+    def scraped(self, job, article_data):
+        """ Mark an article as scraped and return the jobs (projects) waiting for it """
+        with self.lock:
+            entry = self.articles.setdefault(job['article']['identifier'], {'jobs': [job]})
+            entry['done'] = True
+            entry['article_data'] = article_data
+            return list(entry['jobs'])
+
+    def save_for_project(self, article_data, job):
+        """ Save a scraped article for the project of a job """
+        message = f'Parsing article (type: {job["article"]["type"]}): {job["article"]["project_title"]} ' \
+                  f'{article_data.get("publication_date", "no publication date")}'
+
+        if article_data:  # Check if article_data is not an empty dict.
+            article_data = dict(article_data)
+            article_data['project_identifier'] = job['article']['project_identifier']
+            article_data['project_type'] = job['project_type']
+            article_data['type'] = job['article']['type']
+            self.save_article(article_data, message)
+
+    def process(self, job):
+        """ Scrape a single queued 'article' and save it for each project linking to it """
+        if 'article_data' in job:
+            # Scraped before, only save it for the project of this job
+            self.save_for_project(job['article_data'], job)
+            return
+
+        article_data = {}
+        try:
             article_data = self.scraper(job['article'])
-            message = f'Parsing article (type: {job["article"]["type"]}): {job["article"]["project_title"]} ' \
-                      f'{article_data.get("publication_date", "no publication date")}'
+        finally:
+            jobs = self.scraped(job, article_data)
+
+        for project_job in jobs:
+            self.save_for_project(article_data, project_job)
+
+    def worker(self):
+        """ Keep getting jobs from the queue until a stop sentinel (None) is received """
+        while True:
+            job = self.queue.get()
+            if job is None:
+                self.queue.task_done()
+                return
 
-            if article_data:  # Check if article_data is not an empty dict.
-                article_data['project_type'] = job['project_type']
-                article_data['type'] = job['article']['type']
-                self.save_article(article_data, message)
+            try:
+                self.process(job)
+            except Exception as error:
+                self.logger.error(f'failed scraping article {job["article"].get("url")}: {error}')
+            finally:
+                self.queue.task_done()
+
+    def start(self, scraper_report=dict):
+        """ Start a pool of workers, they consume jobs as soon as they are queued """
+        self.scraper_report = scraper_report
+        self.threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """ No more jobs will be queued: let the workers drain the queue and wait for them to finish """
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.articles = {}
+
+    def run(self, scraper_report=dict):
+        """ Scrape all items currently in the queue with a pool of workers """
+        self.start(scraper_report=scraper_report)
+        self.stop()
@@ -0,0 +1,107 @@
+""" Declarative extraction of the fields of Iprox nodes, compiled once into extractor functions """
+from GenericFunctions.Hashing import Hashing
+from GenericFunctions.TextSanitizers import TextSanitizers
+
+
+class IproxFields:
+    """ A spec maps result fields to the children ('veld') of an Iprox node:
+
+            {field: (Nam, attribute[, transform[, default]]), ...}
+
+        Nam: name of the child to match ('Titel', 'Tekst', 'App categorie', ...), the last child with that name wins
+        attribute: the value to take from the child: 'Wrd', 'Txt', 'SelAka', a path like 'Src._' or None for the
+                   child itself. A missing attribute gives default (None)
+        transform: None or the name of a transform in IproxFields.transforms, applied to values that are not None
+                   (eg. 'sanitize': html -> (rewritten html, text))
+
+        Fields named in 'lists' collect the values of all matching children (in their original order) instead.
+
+        The spec is compiled once into a table Nam -> [(field, getter), ...]; calling the compiled spec with the
+        children of a node (a list or a lone dict) walks the children once and returns {field: value} for the
+        fields that were found.
+    """
+    domain = 'https://www.amsterdam.nl'
+
+    def __init__(self, spec, lists=()):
+        self.lists = set(lists)
+        self.table = {}
+        for field, rule in spec.items():
+            name, attribute, transform, default = (tuple(rule) + (None, None))[:4]
+            getter = self.compile(attribute, self.transforms[transform] if transform is not None else None, default)
+            self.table.setdefault(name, []).append((field, getter))
+
+    @staticmethod
+    def compile(attribute, transform, default):
+        """ Build the getter of a field: child -> value """
+        path = attribute.split('.') if attribute is not None else []
+
+        def getter(child):
+            value = child
+            for key in path:
+                value = value.get(key, default) if isinstance(value, dict) else default
+            if transform is not None and value is not None:
+                value = transform(value)
+            return value
+        return getter
+
+    def __call__(self, children):
+        if isinstance(children, dict):
+            children = [children]
+
+        # Keep the last child per name (and all children of list fields), so a field is only transformed once
+        last = {}
+        many = []
+        table = self.table
+        for child in children:
+            if not isinstance(child, dict):
+                continue
+            name = child.get('Nam', '')
+            if name in table:
+                last[name] = child
+                if self.lists:
+                    many.append(child)
+
+        result = {field: [] for field in self.lists}
+        for name, child in last.items():
+            for field, getter in table[name]:
+                if field not in self.lists:
+                    result[field] = getter(child)
+        for child in many:
+            for field, getter in table[child.get('Nam', '')]:
+                if field in self.lists:
+                    result[field].append(getter(child))
+        return result
+
+    @staticmethod
+    def date(value):
+        """ Iprox date (YYYYMMDD...) to YYYY-MM-DD """
+        return '{year}-{month}-{day}'.format(year=value[0:4], month=value[4:6], day=value[6:8])
+
+    @staticmethod
+    def image(data):
+        """ Image sources of an image child: 'orig' and its assets, keyed on their size (eg. '220px') """
+        url = '{domain}{location}'.format(domain=IproxFields.domain, location=data.get('Src', {}).get('_', ''))
+        sources = {'orig': {'url': url, 'image_id': Hashing.make_md5_hash(url), 'filename': data.get('FilNam', ''),
+                            'description': ''}}
+        for asset in data.get('asset') or []:
+            location = asset.get('Src', {}).get('_')
+            url = '{domain}{location}'.format(domain=IproxFields.domain, location=location)
+            sources[location.split('/')[-2]] = {'url': url,
+                                                'image_id': Hashing.make_md5_hash(url),
+                                                'filename': asset.get('FilNam', ''),
+                                                'description': ''}
+        return sources
+
+    @staticmethod
+    def sanitize_rewritten(html):
+        """ Rewritten html and the text of the rewritten html (eg. without the 'Klik op de foto om te vergroten'
+            captions)
+        """
+        return TextSanitizers.sanitize(html, strip_rewritten=True)
+
+    transforms = {
+        'sanitize': TextSanitizers.sanitize,
+        'sanitize_rewritten': sanitize_rewritten.__func__,
+        'date': date.__func__,
+        'image': image.__func__
+    }
@@ -0,0 +1,61 @@
+""" Index of an Iprox page tree """
+
+
+class IproxIndex:
+    """ Walks an Iprox tree (the 'cluster' lists/dicts of a page) once, without recursion, and indexes every node on
+        its name ('Nam'). filter() can be asked for any list of targets: it returns the leaves ('veld') of target nodes
+        that are only nested in target clusters, in tree (depth-first) order.
+
+        index: Nam -> [(order, ancestors, key, value), ...]
+            order: position of the node in a depth-first walk
+            ancestors: frozenset of the names of the clusters the node is nested in
+            key, value: the harvested result {key: value}
+    """
+
+    def __init__(self, data, root=None):
+        self.index = {}
+        self.build(data, root)
+
+    def build(self, data, root):
+        """ Depth-first walk of the tree with an explicit stack """
+        order = 0
+        # Stack entries: ('cluster', subtree, ancestors, name of its parent) or ('leaf', Nam, ancestors, key, value)
+        stack = [('cluster', data, frozenset(), root)]
+        while stack:
+            entry = stack.pop()
+            if entry[0] == 'leaf':
+                _, name, ancestors, key, value = entry
+                self.index.setdefault(name, []).append((order, ancestors, key, value))
+                order += 1
+                continue
+
+            _, subtree, ancestors, parent = entry
+            if isinstance(subtree, dict):
+                # A lone node (eg. a cluster that is a dict), a leaf is harvested as a whole under its parent's name
+                children, lone = [subtree], True
+            elif isinstance(subtree, list):
+                children, lone = [child for child in subtree if isinstance(child, dict)], False
+            else:
+                continue
+
+            # Push in reverse, so the children are popped (and numbered) in their original order
+            for child in reversed(children):
+                name = child.get('Nam')
+                if child.get('veld') is not None:
+                    if lone:
+                        stack.append(('leaf', name, ancestors, parent, child))
+                    else:
+                        stack.append(('leaf', name, ancestors, name, child['veld']))
+                elif child.get('cluster') is not None:
+                    stack.append(('cluster', child['cluster'], ancestors | {name}, name))
+
+    def filter(self, targets):
+        """ Results {Nam: veld} of the target leaves reachable through target clusters only, in tree order """
+        targets = set(targets)
+        matches = []
+        for name in targets:
+            for order, ancestors, key, value in self.index.get(name, []):
+                if ancestors <= targets:
+                    matches.append((order, key, value))
+        matches.sort(key=lambda match: match[0])
+        return [{key: value} for _, key, value in matches]
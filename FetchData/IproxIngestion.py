@@ -1,8 +1,13 @@
 """ Iprox ingestion """
 import datetime
-import json
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from GenericFunctions.Hashing import Hashing
+from GenericFunctions.HttpClient import HttpClient
+from GenericFunctions.JsonCodec import JsonCodec
 from GenericFunctions.Logger import Logger
+from GenericFunctions.PageStore import PageStore
+from GenericFunctions.TextSanitizers import TextSanitizers
 from FetchData.IproxProject import IproxProject
 from FetchData.IproxProjects import IproxProjects
 from FetchData.IproxArticle import IproxArticle
@@ -17,11 +22,20 @@ class IproxIngestion:
         stage 3: Fetch all images based on result from stage 2
 
         Ingest Projects will skip fetching records based on modification time. (eg. only fetch new records)
+        The modification_date and a hash of each listed project are kept in a StateStore. With incremental=True a
+        project whose listing entry did not change since its last successful ingestion is skipped entirely, unless
+        full=True. Fetched projects are then only posted to the backend if their payload differs from the last ingested
+        one. Both need a backend with the <BASE_PATH>/projects/seen route (see touch_seen).
+
+        The identifiers (and modification dates) of all projects known by the backend are fetched in bulk at the start
+        of a run. When the backend does not support the bulk lookup, each project is looked up separately.
 
         Garbage collecting:
 
         The garbage collector is initialized with current time. All projects with a last_seen time before current time
-        are possibly due for garbage collecting. See details in class IproxGarbageCollector.
+        are possibly due for garbage collecting. See details in class IproxGarbageCollector. Projects skipped on this
+        run, or with the same payload as last ingested, are not posted: their last_seen time is refreshed in bulk at
+        the end of the run (see touch_seen).
 
         Unique identifiers in Iprox: itmidt
         Get page via unique identifier:
@@ -33,20 +47,55 @@ class IproxIngestion:
             https://amsterdam.nl/@337520/page/?AppIdt=app-pagetype&reload=true
     """
 
-    def __init__(self, backend_host='api-server', backend_port=8000, base_path='/api/v1/ingest', headers=dict):
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 backend_host='api-server',
+                 backend_port=8000,
+                 base_path='/api/v1/ingest',
+                 headers=dict,
+                 client=None,
+                 workers=1,
+                 article_workers=1,
+                 state_store=None,
+                 full=False,
+                 buffer=None,
+                 negative_cache=None,
+                 parser_pool=None,
+                 incremental=False):
         self.logger = Logger()
         self.backend_host = backend_host
         self.backend_port = backend_port
         self.base_path = base_path
         self.headers = headers
+        self.client = client if client is not None else HttpClient()
+        self.page_store = PageStore()
         self.article = IproxArticle(backend_host=backend_host,
                                     backend_port=backend_port,
                                     base_path=base_path,
-                                    headers=headers)
+                                    headers=headers,
+                                    client=self.client,
+                                    workers=article_workers,
+                                    state_store=state_store,
+                                    full=full,
+                                    buffer=buffer,
+                                    page_store=self.page_store,
+                                    negative_cache=negative_cache,
+                                    parser_pool=parser_pool)
         self.paths = {'projects': '/projecten/alle-projecten-amsterdam-app'}
         self.scraper_report = {}
-
-    def update_scraper_report(self, data=None, existing_project=False, success=False):
+        self.workers = max(1, workers)
+        self.counters = {'new': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'dead': 0, 'failed': 0}
+        self.seen = set()
+        self.lock = threading.Lock()
+        self.state_store = state_store
+        self.full = full
+        self.incremental = incremental
+        self.known_projects = None
+        self.buffer = buffer
+        self.negative_cache = negative_cache
+        self.parser_pool = parser_pool
+        self.page_size = 1000
+
+    def update_scraper_report(self, data=None, existing_project=False, success=False, history=None):
         """ Create report for scraped page """
         project_report = {
             'url': f'https://amsterdam.nl/@{data["identifier"]}/page/',
@@ -67,120 +116,298 @@ class IproxIngestion:
             project_report['more-info'] = bool(len(data['body']['more-info']) > 0)
             project_report['timeline'] = bool(len(data['body']['timeline']) > 0)
             project_report['history'] = 'project is: updated' if existing_project else 'project is: new'
+        if history is not None:
+            project_report['history'] = history
 
-        self.scraper_report[data["identifier"]] = project_report
+        with self.lock:
+            self.scraper_report[data["identifier"]] = project_report
 
     def queue_news(self, fpd_details):
         """ add articles to the IproxArticle.queue for scraping """
         for article in fpd_details['news']:
-            self.article.queue.put({'article': article, 'project_type': fpd_details['project_type']})
+            self.article.add(article, fpd_details['project_type'])
 
     def get_set_project_details(self, item, project_type):
         """ Get and set project details """
-        fpd = IproxProject(item['source_url'], item['identifier'], item['title'])
+        fpd = IproxProject(item['source_url'], item['identifier'], item['title'], client=self.client,
+                           page_store=self.page_store, negative_cache=self.negative_cache, parser_pool=self.parser_pool)
         fpd.get_data()
 
         # Skip news items/articles etc...
         if fpd.page_type == 'subhome':
+            if self.negative_cache is not None:
+                self.negative_cache.mark_alive(item['source_url'])
             fpd.parse_data()
             fpd.details['project_type'] = project_type
-
-            # Add news items from this project to the IproxNews.queue() for fetching
-            self.queue_news(fpd.details)
-
             return fpd.details
+
+        # Remember pages that are gone or are no project page (anymore), not the ones that failed on a network error
+        if self.negative_cache is not None and (fpd.dead_reason is not None or fpd.page_type != ''):
+            self.negative_cache.mark_dead(item['source_url'], fpd.dead_reason or f'page type: {fpd.page_type}')
         return None
 
+    def is_unchanged(self, item, listing_hash):
+        """ Check if the listing entry of a project is the same as on its last successful ingestion """
+        if self.full is True or self.incremental is False or self.state_store is None:
+            return False
+        # The backend must have this project too (with the same modification date, if it tells us)
+        if self.known_projects is not None:
+            if item.get('identifier') not in self.known_projects:
+                return False
+            known_modification_date = self.known_projects[item.get('identifier')]
+            if known_modification_date is not None and known_modification_date != item.get('modification_date', ''):
+                return False
+        previous = self.state_store.get_project(item.get('identifier'))
+        return previous is not None and tuple(previous) == (item.get('modification_date', ''), listing_hash)
+
+    def get_known_projects(self, projects_url, project_type):
+        """ Fetch all projects known by the backend in (paginated) bulk requests
+
+            :return: {identifier: modification_date or None, ...} or None if the backend has no bulk lookup
+        """
+        known_projects = {}
+        page = 1
+        try:
+            while True:
+                result = self.client.get(projects_url,
+                                         headers=self.headers,
+                                         params={'project_type': project_type,
+                                                 'fields': 'identifier,modification_date',
+                                                 'page': page,
+                                                 'page_size': self.page_size},
+                                         timeout=60)
+                data = JsonCodec.loads(result.content)
+                projects = data.get('result')
+                if result.status_code != 200 or not isinstance(projects, list):
+                    return None
+
+                amount = len(known_projects)
+                for project in projects:
+                    known_projects[project['identifier']] = project.get('modification_date')
+
+                # Stop on the last page, or when the backend ignores pagination and returned nothing new
+                if len(projects) < self.page_size or len(known_projects) == amount:
+                    return known_projects
+                page += 1
+        except Exception as error:
+            self.logger.error(f'bulk lookup of known projects failed: {error}')
+            return None
+
+    def is_existing_project(self, item, projects_url):
+        """ Check if the backend knows this project, from the bulk lookup or else with a single request """
+        if self.known_projects is not None:
+            return item.get('identifier') in self.known_projects
+
+        result = self.client.get(projects_url,
+                                 headers=self.headers,
+                                 params={'identifier': item.get('identifier')},
+                                 timeout=10)
+        data = JsonCodec.loads(result.content)
+        return data.get('result') is not None
+
+    def ingest(self, kind, url, payload, callback, existing=True):  # pylint: disable=too-many-arguments
+        """ POST a payload to the backend, unless exactly the same payload was ingested before (incremental runs).
+            With an ingestion buffer the payload is posted later on in a batch.
+
+            The callback is called with 'unchanged', 'ingested' or 'failed'
+        """
+        # Encoded once: the same bytes are hashed, buffered and posted
+        body = JsonCodec.canonical(payload)
+        payload_hash = Hashing.make_bytes_hash(body)
+        identifier = payload.get('identifier')
+        if existing is True and self.full is False and self.incremental is True and self.state_store is not None and \
+                self.state_store.is_ingested(kind, identifier, payload_hash):
+            callback('unchanged')
+            return
+
+        def ingested(success, result):
+            if not success:
+                self.logger.error(result)
+                callback('failed')
+                return
+            if self.state_store is not None:
+                self.state_store.set_ingested(kind, identifier, payload_hash)
+            callback('ingested')
+
+        if self.buffer is not None:
+            self.buffer.add(url, body, ingested)
+            return
+
+        response = self.client.post(url, headers=dict(self.headers, **{'Content-Type': 'application/json'}), data=body,
+                                    timeout=10, idempotent=identifier is not None)
+        ingested(response.status_code == 200, response.text)
+
+    def project_ingested(self,  # pylint: disable=too-many-arguments
+                         item, fpd_details, existing_project, listing_hash, results):
+        """ Bookkeeping once the project and project-details payloads are handled by the backend """
+        if 'failed' in results.values():
+            self.count('failed')
+            return
+
+        # Keep track of amount of updates/new insertions. A project is unchanged when its details did not change
+        # (the listing record may still have been refreshed, eg. a new modification_date)
+        if results['project_details'] == 'unchanged':
+            self.count('unchanged')
+            history = 'project is: unchanged'
+        else:
+            self.count('updated' if existing_project is True else 'new')
+            history = None
+        if results['project'] == 'unchanged':
+            # The project itself was not posted
+            self.mark_seen(item.get('identifier'))
+
+        # update scraper report
+        self.update_scraper_report(data=fpd_details, existing_project=existing_project, success=True, history=history)
+        if self.state_store is not None:
+            self.state_store.set_project(item.get('identifier'), item.get('modification_date', ''), listing_hash)
+
+        # Add news items from this project to the IproxArticle.queue() for fetching. The article workers pick them up
+        # right away, the project is known in the backend and in the scraper report by now.
+        self.queue_news(fpd_details)
+
+    def count(self, outcome):
+        """ Keep track of amount of updates/new insertions/failures (thread-safe) """
+        with self.lock:
+            self.counters[outcome] += 1
+
+    def mark_seen(self, identifier):
+        """ Remember a project that is in the listing but is not posted on this run (thread-safe) """
+        with self.lock:
+            self.seen.add(identifier)
+
+    def touch_seen(self, projects_url, project_type):
+        """ Refresh the last_seen time of the projects that were not posted on this run, so the garbage collector
+            keeps them. The identifiers are posted in chunks of page_size to <projects_url>/seen
+
+            :return: True if the backend refreshed all of them
+        """
+        identifiers = sorted(self.seen)
+        for i in range(0, len(identifiers), self.page_size):
+            body = JsonCodec.dumps({'project_type': project_type, 'identifiers': identifiers[i:i + self.page_size]})
+            try:
+                response = self.client.post(f'{projects_url}/seen',
+                                            headers=dict(self.headers, **{'Content-Type': 'application/json'}),
+                                            data=body,
+                                            timeout=60,
+                                            idempotent=True)
+            except Exception as error:
+                self.logger.error(f'refreshing last_seen of projects failed: {error}')
+                return False
+            if response.status_code != 200:
+                self.logger.error(response.text)
+                return False
+        return True
+
+    def ingest_project(self, item, project_type, projects_url):
+        """ Fetch, parse and ingest a single project. Safe to run concurrently for different projects """
+        # DEBUG: Set title for page you'd like to debug...
+        # if item['identifier'] != '1056019':
+        #     return
+        print(f'Parsing https://amsterdam.nl/@{item["identifier"]}/page/?AppIdt=app-pagetype&reload=true '
+              f'title: {item["title"]}', flush=True)
+
+        # Skip projects which are not modified since the last run (the hash is taken before 'item' gets enriched)
+        listing_hash = Hashing.make_json_hash(item)
+        if self.is_unchanged(item, listing_hash):
+            self.update_scraper_report(data=item, history='project is: skipped (not modified since last run)')
+            self.count('skipped')
+            self.mark_seen(item.get('identifier'))
+            return
+
+        # Skip projects whose page was found dead on a previous run, until it is due for a re-probe
+        if self.negative_cache is not None and self.negative_cache.is_dead(item['source_url']):
+            self.update_scraper_report(data=item, history='project is: skipped (dead url)')
+            self.count('dead')
+            return
+
+        try:
+            existing_project = self.is_existing_project(item, projects_url)
+
+            fpd_details = self.get_set_project_details(item, project_type)
+            if fpd_details is not None:
+                # Ingest projects data into construction-work backend
+                item['images'] = fpd_details['images']
+                item['district_id'] = fpd_details['district_id']
+                item['district_name'] = fpd_details['district_name']
+
+                # Ingest projects and project-details data into construction-work backend. The bookkeeping is done
+                # once both are handled (right away, or when the ingestion buffer posted their batches)
+                results = {}
+
+                def ingested(kind, result):
+                    results[kind] = result
+                    if len(results) == 2:
+                        self.project_ingested(item, fpd_details, existing_project, listing_hash, results)
+
+                project_detail_url = f'http://{self.backend_host}:{self.backend_port}{self.base_path}/project'
+                self.ingest('project', projects_url, item, lambda result: ingested('project', result),
+                            existing=existing_project)
+                if results.get('project') == 'failed':
+                    # Do not post details for a project the backend refused
+                    ingested('project_details', 'failed')
+                    return
+                self.ingest('project_details', project_detail_url, fpd_details,
+                            lambda result: ingested('project_details', result), existing=existing_project)
+            else:
+                # Not a project page (anymore), or the page could not be fetched
+                self.update_scraper_report(data=item, existing_project=existing_project, success=False)
+                self.count('failed')
+        except Exception as error:
+            self.logger.error('failed ingesting data {project}: {error}'.format(project=item.get('title'),
+                                                                                error=error))
+            self.count('failed')
+
     def get_set_projects(self, project_type):
         """ Set the url path from where to fetch the projects """
         path = self.paths[project_type]
 
         # Fetch projects and ingest data
-        fpa = IproxProjects(path, project_type)
+        fpa = IproxProjects(path, project_type, client=self.client)
         fpa.get_data()
         fpa.parse_data()
 
         projects_url = f'http://{self.backend_host}:{self.backend_port}{self.base_path}/projects'
+        self.known_projects = self.get_known_projects(projects_url, project_type)
 
-        updated = new = failed = deleted = 0
-        for item in fpa.parsed_data:
-            # DEBUG: Set title for page you'd like to debug...
-            # if item['identifier'] != '1056019':
-            #     continue
-            print('Parsing ', end='')
-            print(f'https://amsterdam.nl/@{item["identifier"]}/page/?AppIdt=app-pagetype&reload=true ', end='')
-            print(f'title: {item["title"]}', flush=True)
-            try:
-                result = requests.get(projects_url,
-                                      headers=self.headers,
-                                      params={'identifier': item.get('identifier')},
-                                      timeout=10)
-                data = json.loads(result.text)
-
-                existing_project = False
-                if data.get('result') is not None:
-                    existing_project = True
-
-                fpd_details = self.get_set_project_details(item, project_type)
-                if result is not None:
-                    # Ingest projects data into construction-work backend
-                    item['images'] = fpd_details['images']
-                    item['district_id'] = fpd_details['district_id']
-                    item['district_name'] = fpd_details['district_name']
-                    response = requests.post(projects_url, headers=self.headers, json=item, timeout=10)
-                    if response.status_code != 200:
-                        self.logger.error(response.text)
-                        continue
-
-                    # Ingest project-details data into construction-work backend
-                    project_detail_url = f'http://{self.backend_host}:{self.backend_port}{self.base_path}/project'
-                    result = requests.post(project_detail_url, headers=self.headers, json=fpd_details, timeout=10)
-                    if result.status_code != 200:
-                        self.logger.error(result.text)
-                        continue
-
-                    # Keep track of amount of updates/new insertions
-                    if existing_project is True:
-                        updated += 1
-                    else:
-                        new += 1
-
-                    # update scraper report
-                    self.update_scraper_report(data=fpd_details, existing_project=existing_project, success=True)
-                else:
-                    self.update_scraper_report(data=item, existing_project=existing_project, success=False)
-                    payload = {'identifier': item.get('identifier')}
-                    result = requests.delete(projects_url, headers=self.headers, json=payload, timeout=10)
-                    if result.status_code != 200:
-                        self.logger.error(result.text)
-                    else:
-                        self.logger.info('Project {identifier} deleted'.format(identifier=item.get('identifier')))
-                        deleted += 1
-            except Exception as error:
-                self.logger.error('failed ingesting data {project}: {error}'.format(project=item.get('title'),
-                                                                                    error=error))
-                failed += 1
-
-        # Fetch news
+        # Article workers consume news items while projects are still being scraped
         print('Fetching articles', flush=True)
-        self.article.run(scraper_report=self.scraper_report)
+        self.article.start(scraper_report=self.scraper_report)
+
+        # Projects are independent, run them on a bounded pool of workers (workers=1 is a sequential run)
+        self.counters = {'new': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'dead': 0, 'failed': 0}
+        self.seen = set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for item in fpa.parsed_data:
+                    executor.submit(self.ingest_project, item, project_type, projects_url)
+        finally:
+            # All projects are done, once their buffered payloads are posted no more news will be queued. Wait for the
+            # article queue to drain and post the buffered articles.
+            if self.buffer is not None:
+                self.buffer.flush()
+            self.article.stop()
+            if self.buffer is not None:
+                self.buffer.flush()
+            # Pages of articles that were never scraped (eg. their project failed)
+            self.page_store.clear()
+
+        # Projects that were not posted are still on Iprox: keep them from being garbage collected
+        seen = self.touch_seen(projects_url, project_type)
 
         # Return scraper report
-        report = {
-            'new': new,
-            'updated': updated,
-            'failed': failed,
-            'deleted': deleted,
-            'total': new + updated - deleted,
-            'date': str(datetime.datetime.now())
-        }
+        report = dict(self.counters)
+        report['total'] = sum(report[key] for key in ['new', 'updated', 'unchanged', 'skipped'])
+        report['seen'] = {'projects': len(self.seen), 'status': seen}
+        report['date'] = str(datetime.datetime.now())
         return report
 
     def get_stads_loketten(self):
         """ Scrape StadsLoketten """
         stads_loketten = IproxStadslokettenScraper(backend_host=self.backend_host,
                                                    backend_port=self.backend_port,
-                                                   headers=self.headers)
+                                                   base_path=self.base_path,
+                                                   headers=self.headers,
+                                                   client=self.client)
         stads_loketten.run()
         return {'status': True, 'result': 'scraped stads-loketten'}
 
@@ -198,4 +425,14 @@ class IproxIngestion:
         if project_type in ['stadsloket']:
             report_stads_loketten = self.get_stads_loketten()
 
-        return {'projects': report_projects, 'stadsloket': report_stads_loketten}
+        report = {'projects': report_projects, 'stadsloket': report_stads_loketten}
+        report['http_client'] = self.client.stats()
+        if self.client.cache is not None:
+            report['http_cache'] = self.client.cache.stats()
+        if self.negative_cache is not None:
+            report['dead_urls'] = self.negative_cache.stats()
+        if TextSanitizers.memo is not None:
+            report['sanitizer'] = TextSanitizers.memo.stats()
+        if self.parser_pool is not None:
+            report['parser_pool'] = self.parser_pool.stats()
+        return report
@@ -3,9 +3,11 @@
 """
 import copy
 import json
-import requests
-from FetchData.IproxRecursion import IproxRecursion
+from FetchData.IproxFields import IproxFields
+from FetchData.IproxIndex import IproxIndex
 from GenericFunctions.Hashing import Hashing
+from GenericFunctions.HttpClient import HttpClient
+from GenericFunctions.JsonCodec import JsonCodec
 from GenericFunctions.Logger import Logger
 from GenericFunctions.TextSanitizers import TextSanitizers
 
@@ -20,15 +22,49 @@ class IproxProject:
             https://amsterdam.nl/@{itmidt}/page/?new_json=true&pager_rows=1000      (list of pages)
             https://amsterdam.nl/@{itmidt}/page/?AppIdt=app-pagetype&reload=true    (single page)
     """
-
-    def __init__(self, url, identifier, title):
+    # Fields of the page nodes, compiled once (see FetchData.IproxFields). Text items are keyed on their text field
+    text_fields = {
+        text_field: IproxFields({
+            'title': ('Titel', 'Wrd', None, ''),
+            'body': (text_field, 'Txt', 'sanitize', ''),
+            'app_category': ('App categorie', 'SelAka')
+        }) for text_field in ['Tekst', 'Toelichting']
+    }
+    link_fields = IproxFields({
+        'categories': ('App categorie', 'SelAka', None, ''),
+        'url': ('Link', 'link.Url', None, '')
+    }, lists=['categories'])
+    coordinate_fields = IproxFields({'geo': ('Coordinaten', 'Txt.geo.json')}, lists=['geo'])
+    contact_fields = IproxFields({
+        'name': ('Naam', 'Wrd'),
+        'position': ('Functie', 'Wrd'),
+        'email': ('E-mail', 'Src'),
+        'phone': ('Telefoon', 'Wrd'),
+        'address': ('Adres', 'Wrd')
+    })
+
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 url,
+                 identifier,
+                 title,
+                 client=None,
+                 page_store=None,
+                 negative_cache=None,
+                 parser_pool=None):
         self.logger = Logger()
+        self.client = client if client is not None else HttpClient()
+        self.page_store = page_store
+        self.negative_cache = negative_cache
+        self.parser_pool = parser_pool
+        self.dead_reason = None  # Set when the page is definitely not there (404, not json, no item)
         self.identifier = identifier
+        self.source_url = url
         self.url = '{url}?AppIdt=app-pagetype&reload=true'.format(url=url)
         self.project_title = title
         self.raw_data = {}
         self.page = {}
         self.page_type = ''
+        self.links = []  # [(kind, url), ...] of the timeline and articles, fetched by follow_links()
 
         # Data model
         self.details = {
@@ -72,6 +108,17 @@ class IproxProject:
             'url': ''
         }
 
+        # Handlers of the nodes of a page, parse_page() routes each node to the handler of its key
+        self.page_handlers = {
+            'Afbeelding': self.parse_images,
+            'Omschrijving': lambda value: self.parse_text(value, 'Tekst'),
+            'Koppeling': self.parse_links,
+            'Coordinaten': self.parse_coordinates,
+            'Kenmerken': self.parse_district,
+            'Titel': lambda value: self.parse_text(value, 'Toelichting'),
+            'Contact': self.set_contact
+        }
+
         # A list for matching interesting data in retrieved json (used in the recursive_filter)
         self.page_targets = [
             'Afbeelding',
@@ -118,11 +165,19 @@ class IproxProject:
         :return: void
         """
         try:
-            result = requests.get(self.url, timeout=10)
-            self.raw_data = result.json()
+            result = self.client.get(self.url, timeout=10)
+            if result.status_code in (404, 410):
+                self.dead_reason = f'status {result.status_code}'
+                return
+            if result.status_code != 200:
+                # Eg. 429 or 5xx: the page may be back on the next run, it is not remembered as dead
+                self.logger.error(f'failed fetching data from {self.url}: status {result.status_code}')
+                return
+            self.raw_data = JsonCodec.loads(result.content)
             item = self.raw_data.get('item', None)
             if item is None:
                 # Should not happen! It means an erroneous feed from IPROX
+                self.dead_reason = 'no item'
                 return
 
             # Get 'blok' element (part of json with content/images/etc...)
@@ -130,10 +185,63 @@ class IproxProject:
 
             # Set page type (used to answer the question: Do we need to parse this page?)
             self.page_type = self.page.get('pagetype', '')
+        except json.JSONDecodeError as error:
+            self.dead_reason = 'not json'
+            self.logger.error('failed fetching data from {url}: {error}'.format(url=self.url, error=error))
         except Exception as error:
             self.logger.error('failed fetching data from {url}: {error}'.format(url=self.url, error=error))
 
+    def get_json(self, url):
+        """ Request json from url, None for a dead url (known dead, or 404/not json now: remembered as dead) or when
+            the server failed (eg. 429 or 5xx: not remembered)
+        """
+        if self.negative_cache is not None and self.negative_cache.is_dead(url):
+            return None
+
+        result = self.client.get(url, timeout=10)
+        if result.status_code not in (200, 404, 410):
+            self.logger.error(f'\tfailed fetching {url}: status {result.status_code}')
+            return None
+        reason = f'status {result.status_code}' if result.status_code in (404, 410) else None
+        raw_data = None
+        if reason is None:
+            try:
+                raw_data = JsonCodec.loads(result.content)
+            except json.JSONDecodeError:
+                reason = 'not json'
+
+        if reason is not None:
+            self.logger.error(f'\tdead url {url}: {reason}')
+            if self.negative_cache is not None:
+                self.negative_cache.mark_dead(url, reason)
+            return None
+
+        if self.negative_cache is not None:
+            self.negative_cache.mark_alive(url)
+        return raw_data
+
     def parse_data(self):
+        """ Parse the iprox json data (in a worker process if there is a parser pool), then fetch the timeline and
+            articles the page links to
+        """
+        if self.parser_pool is not None:
+            self.details, self.links = self.parser_pool.run(IproxProject.parse, self.raw_data, self.source_url,
+                                                            self.identifier, self.project_title)
+        else:
+            self.parse_details()
+        self.follow_links()
+
+    @staticmethod
+    def parse(raw_data, url, identifier, title):
+        """ Details and links of a project page, without any network calls (run by the workers of a parser pool) """
+        project = IproxProject(url, identifier, title)
+        project.raw_data = raw_data
+        project.page = raw_data.get('item', {}).get('page', {})
+        project.page_type = project.page.get('pagetype', '')
+        project.parse_details()
+        return project.details, project.links
+
+    def parse_details(self):
         """ Call different methods to parse the iprox json data """
 
         # Based on page-type the data is parsed differently (e.g. news, normal page, ...)
@@ -159,128 +267,76 @@ class IproxProject:
         self.details['subtitle'] = subtitle
 
     def parse_page(self, dicts):
-        """ Parse the iprox data """
-        iprox = IproxRecursion()
-        filtered_dicts = iprox.filter(dicts, [], targets=self.page_targets)
-
-        # Walk through each item in filtered_dict for setting data in self.details
-        for i in range(0, len(filtered_dicts), 1):
-            # Set images
-            if filtered_dicts[i].get('Afbeelding', None) is not None:
-                self.details['images'] += self.set_images(filtered_dicts[i])
-
-            # Set text items
-            if filtered_dicts[i].get('Omschrijving', None) is not None:
-                result = {'title': '', 'html': '', 'text': ''}
-                app_category = None
-                for j in range(0, len(filtered_dicts[i]['Omschrijving']), 1):
-                    # Get App category
-                    if filtered_dicts[i]['Omschrijving'][j].get('Nam', '') == 'App categorie':
-                        app_category = filtered_dicts[i]['Omschrijving'][j].get('SelAka', None)
-
-                    # Get Title
-                    if filtered_dicts[i]['Omschrijving'][j].get('Nam', '') == 'Titel':
-                        result['title'] = filtered_dicts[i]['Omschrijving'][j].get('Wrd', '')
-
-                    # Get Text
-                    if filtered_dicts[i]['Omschrijving'][j].get('Nam', '') == 'Tekst':
-                        html = filtered_dicts[i]['Omschrijving'][j].get('Txt', '')
-                        result['html'] = TextSanitizers.rewrite_html(html)
-                        result['text'] = TextSanitizers.strip_html(html)
-
-                # Only set text items if there is an app_category (eg. omit bogus items!)
-                if app_category is not None:
-                    self.set_text_result(result, app_category)
-
-            # Get timeline (if available)
-            if filtered_dicts[i].get('Koppeling', None) is not None:
-                set_timeline = False
-                set_news = False
-                set_work = False
-                url = ''
-                for j in range(0, len(filtered_dicts[i]['Koppeling']), 1):
-                    if filtered_dicts[i]['Koppeling'][j].get('Nam', '') == 'App categorie':
-                        if filtered_dicts[i]['Koppeling'][j].get('SelAka', '') in ['when-timeline', 'when']:
-                            set_timeline = True
-
-                        if filtered_dicts[i]['Koppeling'][j].get('SelAka', '') == 'news':
-                            set_news = True
-
-                        if filtered_dicts[i]['Koppeling'][j].get('SelAka', '') == 'work':
-                            set_work = True
-
-                        # print(filtered_dicts[i]['Koppeling'][j].get('SelAka'), flush=True)
-
-                    if filtered_dicts[i]['Koppeling'][j].get('Nam', '') == 'Link':
-                        url = filtered_dicts[i]['Koppeling'][j].get('link', {}).get('Url', '')
-
-                if set_timeline is True and url != '':
-                    self.get_timeline(url)
-
-                if set_news is True and url != '':
-                    self.get_article_item(url, _type='news')
-
-                if set_work is True and url != '':
-                    self.get_article_item(url, _type='work')
-
-            # Set Coordinates (if available).
-            # Note: EPSG:4326 is an identifier of WGS84. WGS84 comprises a standard coordinate frame for the Earth
-            if filtered_dicts[i].get('Coordinaten', None) is not None:
-                if isinstance(filtered_dicts[i].get('Coordinaten'), list):
-                    for j in range(0, len(filtered_dicts[i].get('Coordinaten')), 1):
-                        if filtered_dicts[i]['Coordinaten'][j].get('Nam') == 'Coordinaten':
-                            self.set_geo_data(filtered_dicts[i]['Coordinaten'][j]['Txt']['geo']['json'])
-                else:
-                    self.set_geo_data(filtered_dicts[i]['Coordinaten']['Txt']['geo']['json'])
-
-            # Get district name and identifier
-            if filtered_dicts[i].get('Kenmerken', None) is not None:
-                if filtered_dicts[i].get('Kenmerken').get('Src') == 'Stadsdeel':
-                    self.details['district_id'] = int(filtered_dicts[i].get('Kenmerken').get('item').get('SelItmIdt'))
-                    self.details['district_name'] = filtered_dicts[i].get('Kenmerken').get('Wrd')
-
-            if filtered_dicts[i].get('Titel', None) is not None and isinstance(filtered_dicts[i]['Titel'], list):
-                result = {'title': '', 'html': '', 'text': ''}
-                app_category = None
-                for j in range(len(filtered_dicts[i]['Titel'])):
-                    # Get App category
-                    if filtered_dicts[i]['Titel'][j].get('Nam', '') == 'App categorie':
-                        app_category = filtered_dicts[i]['Titel'][j].get('SelAka', None)
-
-                    # Get Title
-                    if filtered_dicts[i]['Titel'][j].get('Nam', '') == 'Titel':
-                        result['title'] = filtered_dicts[i]['Titel'][j].get('Wrd', '')
-
-                    # Get Text
-                    if filtered_dicts[i]['Titel'][j].get('Nam', '') == 'Toelichting':
-                        html = filtered_dicts[i]['Titel'][j].get('Txt', '')
-                        result['html'] = TextSanitizers.rewrite_html(html)
-                        result['text'] = TextSanitizers.strip_html(html)
-
-                # Only set text items is there is an app_category (eg. omit bogus items!)
-                if app_category is not None:
-                    self.set_text_result(result, app_category)
-
-            if filtered_dicts[i].get('Contact', None) is not None:
-                self.set_contact(filtered_dicts[i]['Contact'])
+        """ Parse the iprox data, each node is routed to its handler on its key """
+        for node in IproxIndex(dicts).filter(self.page_targets):
+            for key, value in node.items():
+                handler = self.page_handlers.get(key)
+                if handler is not None and value is not None:
+                    handler(value)
+
+    def parse_images(self, value):
+        """ Set images """
+        self.details['images'] += self.set_images({'Afbeelding': value})
+
+    def parse_text(self, children, text_field):
+        """ Set a text item, the last 'Titel', text field and 'App categorie' of the node win """
+        if not isinstance(children, list):
+            return
+        fields = self.text_fields[text_field](children)
+
+        # Only set text items if there is an app_category (eg. omit bogus items!)
+        if fields.get('app_category') is None:
+            return
+        html, text = fields.get('body', ('', ''))
+        result = {'title': fields.get('title', ''), 'html': html, 'text': text}
+        self.set_text_result(result, fields['app_category'])
+
+    def parse_links(self, children):
+        """ Remember the timeline, news and work articles (if available), they are fetched by follow_links() """
+        fields = self.link_fields(children)
+        categories = set(fields['categories'])
+        url = fields.get('url', '')
+        if url == '':
+            return
+
+        if categories & {'when-timeline', 'when'}:
+            self.links.append(('timeline', url))
+
+        if 'news' in categories:
+            self.links.append(('news', url))
+
+        if 'work' in categories:
+            self.links.append(('work', url))
+
+    def follow_links(self):
+        """ Get the timeline, news and work articles found on the page, in the order they were found """
+        links, self.links = self.links, []
+        for kind, url in links:
+            if kind == 'timeline':
+                self.get_timeline(url)
+            else:
+                self.get_article_item(url, _type=kind)
+
+    def parse_coordinates(self, value):
+        """ Set Coordinates (if available).
+            Note: EPSG:4326 is an identifier of WGS84. WGS84 comprises a standard coordinate frame for the Earth
+        """
+        if isinstance(value, list):
+            for geo in self.coordinate_fields(value)['geo']:
+                self.set_geo_data(geo)
+        else:
+            self.set_geo_data(value['Txt']['geo']['json'])
+
+    def parse_district(self, value):
+        """ Get district name and identifier """
+        if isinstance(value, dict) and value.get('Src') == 'Stadsdeel':
+            self.details['district_id'] = int(value.get('item').get('SelItmIdt'))
+            self.details['district_name'] = value.get('Wrd')
 
     def set_contact(self, data):
         """ Set contact data """
         contact = {'name': None, 'position': None, 'email': None, 'phone': None, 'address': None}
-        if isinstance(data, dict):
-            data = [data]
-
-        for i in range(0, len(data), 1):
-            if data[i].get('Nam') == 'Naam':
-                contact['name'] = data[i].get('Wrd', None)
-            if data[i].get('Nam') == 'Functie':
-                contact['position'] = data[i].get('Wrd', None)
-            if data[i].get('Nam') == 'E-mail':
-                contact['email'] = data[i].get('Src', None)
-            if data[i].get('Nam') == 'Telefoon':
-                contact['phone'] = data[i].get('Wrd', None)
-            if data[i].get('Nam') == 'Adres':
-                contact['address'] = data[i].get('Wrd', None)
+        contact.update(self.contact_fields(data))
         self.details['contacts'].append(contact)
 
     def set_text_result(self, data, app_category):
@@ -297,8 +353,7 @@ class IproxProject:
 
     def filter_timeline(self, data):
         """ Filter timeline data """
-        iprox = IproxRecursion()
-        filtered_results = iprox.filter(data, [], targets=self.timeline_targets)
+        filtered_results = IproxIndex(data).filter(self.timeline_targets)
 
         timeline_items = []
         gegevens = {}
@@ -359,9 +414,8 @@ class IproxProject:
                                         print(error, flush=True)
                                 if _sub_items[j].get('Nam', '') in ['Beschrijving', 'Inleiding']:
                                     try:
-                                        html = _sub_items[j].get('Txt', '')
-                                        content_item['body']['html'] = TextSanitizers.rewrite_html(html)
-                                        content_item['body']['text'] = TextSanitizers.strip_html(html)
+                                        html, text = TextSanitizers.sanitize(_sub_items[j].get('Txt', ''))
+                                        content_item['body'] = {'text': text, 'html': html}
                                     except Exception as error:
                                         print(error, flush=True)
                             content.append(content_item)
@@ -372,9 +426,8 @@ class IproxProject:
                     try:
                         for j in range(0, len(subitem['Eigenschappen'])):
                             if subitem['Eigenschappen'][j].get('Nam', '') in ['Beschrijving', 'Inleiding']:
-                                html = subitem['Eigenschappen'][j].get('Txt', '')
-                                content_item['body']['html'] = TextSanitizers.rewrite_html(html)
-                                content_item['body']['text'] = TextSanitizers.strip_html(html)
+                                html, text = TextSanitizers.sanitize(subitem['Eigenschappen'][j].get('Txt', ''))
+                                content_item['body'] = {'text': text, 'html': html}
                         content.append(content_item)
                     except Exception as error:
                         print(error, flush=True)
@@ -395,15 +448,11 @@ class IproxProject:
                     result['collapsed'] = bool(int(_item.get('Wrd', '1')))
             return result
 
+        title_html, title_text = TextSanitizers.sanitize(gegevens.get('Txt', ''))
+        intro_html, intro_text = TextSanitizers.sanitize(inhoud.get('Txt', ''))
         timeline = {
-            'title': {
-                'html': TextSanitizers.rewrite_html(gegevens.get('Txt', '')),
-                'text': TextSanitizers.strip_html(gegevens.get('Txt', ''))
-            },
-            'intro': {
-                'html': TextSanitizers.rewrite_html(inhoud.get('Txt', '')),
-                'text': TextSanitizers.strip_html(inhoud.get('Txt', ''))
-            },
+            'title': {'html': title_html, 'text': title_text},
+            'intro': {'html': intro_html, 'text': intro_text},
             'items': []
         }
 
@@ -439,14 +488,25 @@ class IproxProject:
             timeline['items'].append(item)
         self.details['body']['timeline'] = timeline
 
+    @staticmethod
+    def parse_timeline(clusters):
+        """ Timeline of the clusters of a timeline page (run by the workers of a parser pool) """
+        project = IproxProject('', None, None)
+        project.filter_timeline(clusters)
+        return project.details['body']['timeline']
+
     def get_timeline(self, url):
         """ Retrieve timeline data """
         try:
             self.logger.info(f'\tFound Time-line: {url}')
-            result = requests.get(f'{url}?AppIdt=app-pagetype&reload=true', timeout=10)
-            raw_data = result.json()
+            raw_data = self.get_json(f'{url}?AppIdt=app-pagetype&reload=true')
+            if raw_data is None:
+                return
             clusters = raw_data.get('item', {}).get('page', {}).get('cluster', [])
-            self.filter_timeline(clusters)
+            if self.parser_pool is not None:
+                self.details['body']['timeline'] = self.parser_pool.run(IproxProject.parse_timeline, clusters)
+            else:
+                self.filter_timeline(clusters)
         except Exception as error:
             self.logger.error(f'\tfailed fetching timeline from data: {error} {self.identifier}')
 
@@ -468,15 +528,20 @@ class IproxProject:
             'project_title': self.project_title,
             'type': _type
         }
-        result = requests.get(url, timeout=10)
-        if result.status_code == 200:
+        if self.page_store is not None:
+            # Hand the page to the article scraper, so it is downloaded once (also when other projects link to it)
+            found = self.page_store.discover(url, lambda: self.client.get(url, timeout=10))
+        else:
+            found = self.client.get(url, timeout=10).status_code == 200
+        if found:
             self.details['news'].append(item)
 
     def get_article_item(self, url, _type=None):
         """ Get news item from iprox """
         try:
-            result = requests.get('{url}?new_json=true'.format(url=url), timeout=10)
-            raw_data = result.json()
+            raw_data = self.get_json('{url}?new_json=true'.format(url=url))
+            if raw_data is None:
+                return
             self.logger.info(f'\tFound article {len(raw_data)} item(s): {url}?new_json=true')
             if isinstance(raw_data, list) and len(raw_data) > 0:
                 for i in range(0, len(raw_data), 1):
@@ -492,7 +557,7 @@ class IproxProject:
         """ Add gps data to project and news data """
         try:
             geo_data = [x for x in json_data if x['type'] == 'EPSG:4326'][0]
-            data = json.loads(geo_data['_'])
+            data = JsonCodec.loads(geo_data['_'])
             coordinates = data['features'][0]['geometry']['coordinates']
             self.details['coordinates'] = {'lon': float(coordinates[0]), 'lat': float(coordinates[1])}
         except Exception as error:
@@ -1,5 +1,6 @@
 """ Fetch iprox projects """
-import requests
+from GenericFunctions.HttpClient import HttpClient
+from GenericFunctions.JsonCodec import JsonCodec
 from GenericFunctions.Logger import Logger
 from GenericFunctions.TextSanitizers import TextSanitizers
 
@@ -14,8 +15,9 @@ class IproxProjects:
             https://amsterdam.nl/@{itmidt}/page/?new_json=true&pager_rows=1000      (list of pages)
             https://amsterdam.nl/@{itmidt}/page/?AppIdt=app-pagetype&reload=true    (single page)
     """
-    def __init__(self, path, project_type):
+    def __init__(self, path, project_type, client=None):
         self.logger = Logger()
+        self.client = client if client is not None else HttpClient()
         self.protocol = 'https://'
         self.domain = 'www.amsterdam.nl'
         self.path = path
@@ -35,8 +37,8 @@ class IproxProjects:
         :return: void
         """
         try:
-            result = requests.get(self.url, timeout=10)
-            self.raw_data = result.json()
+            result = self.client.get(self.url, timeout=10)
+            self.raw_data = JsonCodec.loads(result.content)
         except Exception as error:
             self.logger.error('failed fetching data from {url}: {error}'.format(url=self.url, error=error))
 
@@ -56,6 +58,7 @@ class IproxProjects:
                 else:
                     subtitle = None
 
+                content_html, content_text = TextSanitizers.sanitize(self.raw_data[i].get('content', ''))
                 self.parsed_data.append(
                     {
                         'project_type': self.project_type,
@@ -64,8 +67,8 @@ class IproxProjects:
                         'district_name': '',  # this will be fetched on a successive call...
                         'title': title[0],
                         'subtitle': subtitle,
-                        'content_html': TextSanitizers.rewrite_html(self.raw_data[i].get('content', '')),
-                        'content_text': TextSanitizers.strip_html(self.raw_data[i].get('content', '')),
+                        'content_html': content_html,
+                        'content_text': content_text,
                         'images': [],         # these will be fetched on a successive call...
                         'publication_date': self.raw_data[i].get('publication_date', ''),
                         'modification_date': self.raw_data[i].get('modification_date', ''),
@@ -1,17 +1,31 @@
 """ Fetch stadsloket data from iprox """
-import requests
-from FetchData.IproxRecursion import IproxRecursion
+from FetchData.IproxFields import IproxFields
+from FetchData.IproxIndex import IproxIndex
 from GenericFunctions.Hashing import Hashing
+from GenericFunctions.HttpClient import HttpClient
+from GenericFunctions.JsonCodec import JsonCodec
 from GenericFunctions.Logger import Logger
-from GenericFunctions.TextSanitizers import TextSanitizers
 
 
 class IproxStadsloketten:
     """ Fetch all Stadsloket details from IPROX-endpoint and convert the data into a suitable format. The format is
         described in: amsterdam_app_api.models.Stadsloket
     """
-    def __init__(self, backend_host='api-server', backend_port=8000, base_path='/api/v1/ingest', headers=dict):
+    # Fields of the page nodes, compiled once (see FetchData.IproxFields)
+    contact_fields = IproxFields({
+        'title': ('Titel', 'Wrd'),
+        'body': ('Tekst', 'Txt', 'sanitize_rewritten')
+    })
+    link_fields = IproxFields({'links': ('Link', None)}, lists=['links'])
+
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 backend_host='api-server',
+                 backend_port=8000,
+                 base_path='/api/v1/ingest',
+                 headers=dict,
+                 client=None):
         self.logger = Logger()
+        self.client = client if client is not None else HttpClient()
         self.host = backend_host
         self.port = backend_port
         self.base_path = base_path
@@ -47,8 +61,8 @@ class IproxStadsloketten:
         :return: void
         """
         try:
-            result = requests.get(self.url, timeout=10)
-            self.raw_data = result.json()
+            result = self.client.get(self.url, timeout=10)
+            self.raw_data = JsonCodec.loads(result.content)
             item = self.raw_data.get('item', None)
             if item is None:
                 # Should not happen! It means an erroneous feed from IPROX
@@ -69,8 +83,7 @@ class IproxStadsloketten:
 
     def parse_page(self, dicts):
         """ Parse page """
-        iprox = IproxRecursion()
-        filtered_dicts = iprox.filter(dicts, [], targets=self.page_targets)
+        filtered_dicts = IproxIndex(dicts).filter(self.page_targets)
 
         # Walk through each item in filtered_dict for setting data in self.details
         for i in range(0, len(filtered_dicts), 1):
@@ -78,24 +91,18 @@ class IproxStadsloketten:
 
             # Set contact options
             if 'Omschrijving' in _dict:
-                title = html = text = None
-                for item in _dict['Omschrijving']:
-                    if item.get('Nam') == 'Titel':
-                        title = item.get('Wrd')
-                    if item.get('Nam') == 'Tekst':
-                        html = TextSanitizers.rewrite_html(item.get('Txt'))
-                        text = TextSanitizers.strip_html(html)
-                if None not in (title, html):
-                    self.sections.append({'title': title, 'html': html, 'text': text})
+                fields = self.contact_fields(_dict['Omschrijving'])
+                if None not in (fields.get('title'), fields.get('body')):
+                    html, text = fields['body']
+                    self.sections.append({'title': fields['title'], 'html': html, 'text': text})
 
             # Get stadsloket locations
             if 'Verwijzing' in _dict:
-                for item in _dict['Verwijzing'].get('veld', []):
-                    if item.get('Nam') == 'Link':
-                        title = item.get('Wrd')
-                        url = item.get('link', {}).get('Url')
-                        identifier = Hashing.make_md5_hash(url)
-                        self.stadsloketten.append({'title': title, 'url': url, 'identifier': identifier})
+                for item in self.link_fields(_dict['Verwijzing'].get('veld', []))['links']:
+                    title = item.get('Wrd')
+                    url = item.get('link', {}).get('Url')
+                    identifier = Hashing.make_md5_hash(url)
+                    self.stadsloketten.append({'title': title, 'url': url, 'identifier': identifier})
 
         # Store contact info in db  (save method is overridden to allow only 1 single record)
         print('self.save() disabled in IproxStadsLoketten.py Line: ~101', flush=True)
@@ -106,27 +113,41 @@ class IproxStadsloketten:
 
         # Save city contact
         url = f'http://{self.host}:{self.port}{self.base_path}/citycontact'
-        result = requests.post(url, headers=self.header, json=self.sections, timeout=10)
+        result = self.client.post(url, headers=dict(self.header, **{'Content-Type': 'application/json'}),
+                                  data=JsonCodec.dumps(self.sections), timeout=10)
         if result.status_code != 200:
             self.logger.error(result.text)
 
         # Save city offices
         url = f'http://{self.host}:{self.port}{self.base_path}/cityoffices'
-        result = requests.post(url, headers=self.header, json=self.stadsloketten, timeout=10)
+        result = self.client.post(url, headers=dict(self.header, **{'Content-Type': 'application/json'}),
+                                  data=JsonCodec.dumps(self.stadsloketten), timeout=10)
         if result.status_code != 200:
             self.logger.error(result.text)
 
 
 class IproxStadsloket:
     """ Class for fetching iprox stadsloket data """
+    # Fields of the page nodes, compiled once (see FetchData.IproxFields)
+    info_fields = IproxFields({
+        'body': ('Samenvatting', 'Txt', 'sanitize')
+    })
+    text_fields = IproxFields({
+        'title': ('Titel', 'Wrd'),
+        'body': ('Tekst', 'Txt', 'sanitize')
+    })
+    image_fields = IproxFields({'image': ('Afbeelding', None)})
+
     def __init__(self,  # pylint: disable=too-many-arguments
                  url,
                  identifier,
                  backend_host='api-server',
                  backend_port=8000,
                  base_path='/api/v1/ingest',
-                 headers=dict):
+                 headers=dict,
+                 client=None):
         self.logger = Logger()
+        self.client = client if client is not None else HttpClient()
         self.host = backend_host
         self.port = backend_port
         self.base_path = base_path
@@ -152,8 +173,8 @@ class IproxStadsloket:
     def get_data(self):
         """ request data from IPROX-end-point """
         try:
-            result = requests.get(self.url, timeout=10)
-            self.raw_data = result.json()
+            result = self.client.get(self.url, timeout=10)
+            self.raw_data = JsonCodec.loads(result.content)
             item = self.raw_data.get('item', None)
             if item is None:
                 # Should not happen! It means an erroneous feed from IPROX
@@ -174,8 +195,7 @@ class IproxStadsloket:
 
     def parse_page(self, dicts):
         """ Parse page """
-        iprox = IproxRecursion()
-        filtered_dicts = iprox.filter(dicts, [], targets=self.page_targets)
+        filtered_dicts = IproxIndex(dicts).filter(self.page_targets)
 
         # Walk through each item in filtered_dict for setting data in self.details
         for i in range(0, len(filtered_dicts), 1):  # pylint: disable=too-many-nested-blocks
@@ -183,66 +203,57 @@ class IproxStadsloket:
 
             # Info (generic) text
             if 'Gegevens' in _dict:
-                for item in _dict['Gegevens']:
-                    if item.get('Nam') == 'Samenvatting':
-                        self.details['info'] = {
-                            'html': TextSanitizers.rewrite_html(item.get('Txt')),
-                            'text': TextSanitizers.strip_html(item.get('Txt'))
-                        }
+                fields = self.info_fields(_dict['Gegevens'])
+                if fields.get('body') is not None:
+                    html, text = fields['body']
+                    self.details['info'] = {'html': html, 'text': text}
 
             # Full text
             if 'Leestekst' in _dict:
-                for item in _dict['Leestekst']:
-                    if item.get('Nam') == 'Titel':
-                        self.details['title'] = item.get('Wrd')
-                    if item.get('Nam') == 'Tekst':
-                        self.details['address'] = {
-                            'html': TextSanitizers.rewrite_html(item.get('Txt')),
-                            'text': TextSanitizers.strip_html(item.get('Txt'))
-                        }
+                fields = self.text_fields(_dict['Leestekst'])
+                if 'title' in fields:
+                    self.details['title'] = fields['title']
+                if fields.get('body') is not None:
+                    html, text = fields['body']
+                    self.details['address'] = {'html': html, 'text': text}
 
             # Opening hours and contact
             if 'Omschrijving' in _dict:
-                title = text = html = None
-                for item in _dict['Omschrijving']:
-                    if item.get('Nam') == 'Titel':
-                        title = item.get('Wrd')
-                    if item.get('Nam') == 'Tekst':
-                        text = TextSanitizers.strip_html(item.get('Txt'))
-                        html = TextSanitizers.rewrite_html(item.get('Txt'))
-                if None not in (title, text, html):
-                    self.details['contact'][title] = {'text': text, 'html': html}
+                fields = self.text_fields(_dict['Omschrijving'])
+                if None not in (fields.get('title'), fields.get('body')):
+                    html, text = fields['body']
+                    self.details['contact'][fields['title']] = {'text': text, 'html': html}
 
             # Get Image(s)
             if 'Afbeelding' in _dict:
                 domain = 'https://www.amsterdam.nl'
-                for item in _dict['Afbeelding']:
-                    if item.get('Nam') == 'Afbeelding':
-                        url = "{domain}{image}".format(domain=domain, image=item.get('Src', {}).get('_'))
-                        sources = {
-                            'orig': {
+                item = self.image_fields(_dict['Afbeelding']).get('image')
+                if item is not None:
+                    url = "{domain}{image}".format(domain=domain, image=item.get('Src', {}).get('_'))
+                    sources = {
+                        'orig': {
+                            "url": url,
+                            "filename": item.get('FilNam'),
+                            "image_id": Hashing.make_md5_hash(url),
+                            "description": ""
+                        }
+                    }
+                    assets = item.get('asset')
+                    for asset in assets:
+                        try:
+                            url = "{domain}{image}".format(domain=domain,
+                                                           image=asset.get('Src', {}).get('_'))
+                            size = asset.get('Src', {}).get('_', '').split('/')[4]
+                            sources[size] = {
                                 "url": url,
-                                "filename": item.get('FilNam'),
+                                "filename": asset.get('Src', {}).get('_', '').split('/')[-1],
                                 "image_id": Hashing.make_md5_hash(url),
                                 "description": ""
                             }
-                        }
-                        assets = item.get('asset')
-                        for asset in assets:
-                            try:
-                                url = "{domain}{image}".format(domain=domain,
-                                                               image=asset.get('Src', {}).get('_'))
-                                size = asset.get('Src', {}).get('_', '').split('/')[4]
-                                sources[size] = {
-                                    "url": url,
-                                    "filename": asset.get('Src', {}).get('_', '').split('/')[-1],
-                                    "image_id": Hashing.make_md5_hash(url),
-                                    "description": ""
-                                }
-                            except Exception as error:
-                                self.logger.error(error)
-
-                        self.details['images'] = {'type': '', 'sources': sources}
+                        except Exception as error:
+                            self.logger.error(error)
+
+                    self.details['images'] = {'type': '', 'sources': sources}
 
         print('self.save() disabled in IproxStadsLoketten.py Line: ~237', flush=True)
         # self.save()
@@ -250,25 +261,33 @@ class IproxStadsloket:
     def save(self):
         """ Save data to iprox ingestion routes on (backend) server """
         url = f'http://{self.host}:{self.port}{self.base_path}/cityoffice'
-        result = requests.post(url, headers=self.headers, json=self.details, timeout=10)
+        result = self.client.post(url, headers=dict(self.headers, **{'Content-Type': 'application/json'}),
+                                  data=JsonCodec.dumps(self.details), timeout=10)
         if result.status_code != 200:
             self.logger.error(result.text)
 
 
 class Scraper:
     """ Main scraper class """
-    def __init__(self, backend_host='api-server', backend_port=8000, base_path='/api/v1/ingest', headers=dict):
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 backend_host='api-server',
+                 backend_port=8000,
+                 base_path='/api/v1/ingest',
+                 headers=dict,
+                 client=None):
         self.backend_host = backend_host
         self.backend_port = backend_port
         self.base_path = base_path
         self.headers = headers
+        self.client = client if client is not None else HttpClient()
 
     def run(self):
         """ Get main stadsloket info (contact info and sub_pages urls) """
         isl = IproxStadsloketten(backend_host=self.backend_host,
                                  backend_port=self.backend_port,
                                  base_path=self.base_path,
-                                 headers=self.headers)
+                                 headers=self.headers,
+                                 client=self.client)
         isl.get_data()
         isl.parse_data()
 
@@ -281,6 +300,7 @@ class Scraper:
                                       backend_host=self.backend_host,
                                       backend_port=self.backend_port,
                                       base_path=self.base_path,
-                                      headers=self.headers)
+                                      headers=self.headers,
+                                      client=self.client)
             isl_sub.get_data()
             isl_sub.parse_data()
@@ -0,0 +1,75 @@
+""" Per-host circuit breaker: fail fast while a host is down instead of waiting for its timeouts """
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """ Raised without sending the request while the circuit of its host is open """
+
+
+class CircuitBreaker:
+    """ A host is 'closed' (requests pass), 'open' after 'failures' consecutive failures (connection errors and
+        timeouts): requests fail right away with a CircuitOpenError, or 'half-open' once 'reset_timeout' seconds have
+        passed: a single probe request is let through, its success closes the circuit, its failure opens it again.
+
+        A host that answers is up, whatever the status code: a 5xx is an error of that page, not of the host.
+    """
+    def __init__(self, failures=5, reset_timeout=30.0):
+        self.failures = max(1, failures)
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def host(self, hostname):
+        """ State of a host, call with the lock held """
+        if hostname not in self.hosts:
+            self.hosts[hostname] = {'state': 'closed', 'failures': 0, 'opened_at': 0.0, 'probing': False,
+                                    'opened': 0, 'rejected': 0}
+        return self.hosts[hostname]
+
+    def call(self, url, function):
+        """ Run a request function for url unless the circuit of its host is open """
+        hostname = urlsplit(url).hostname or ''
+        with self.lock:
+            host = self.host(hostname)
+            if host['state'] == 'open' and time.monotonic() - host['opened_at'] >= self.reset_timeout:
+                host['state'] = 'half-open'
+            if host['state'] == 'open' or (host['state'] == 'half-open' and host['probing'] is True):
+                host['rejected'] += 1
+                raise CircuitOpenError(f'circuit open for {hostname}')
+            host['probing'] = host['state'] == 'half-open'
+
+        success = None
+        try:
+            response = function()
+            success = True
+            return response
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            success = False
+            raise
+        finally:
+            self.record(hostname, success)
+
+    def record(self, hostname, success):
+        """ Update the state of a host with the outcome of a request (None: no outcome, eg. an unrelated error) """
+        with self.lock:
+            host = self.host(hostname)
+            host['probing'] = False
+            if success is True:
+                host['state'] = 'closed'
+                host['failures'] = 0
+            elif success is False:
+                host['failures'] += 1
+                if host['state'] == 'half-open' or host['failures'] >= self.failures:
+                    if host['state'] != 'open':
+                        host['opened'] += 1
+                    host['state'] = 'open'
+                    host['opened_at'] = time.monotonic()
+
+    def stats(self):
+        """ State, times opened and number of requests failed fast per host """
+        with self.lock:
+            return {hostname: {'state': host['state'], 'opened': host['opened'], 'rejected': host['rejected']}
+                    for hostname, host in self.hosts.items()}
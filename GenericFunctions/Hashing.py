@@ -1,6 +1,7 @@
 """ Convenience class for calling several hashing libraries (md5, sha1, ...)
 """
 import hashlib
+from GenericFunctions.JsonCodec import JsonCodec
 
 
 class Hashing:
@@ -12,6 +13,19 @@ class Hashing:
         """
         return hashlib.md5(string.encode()).hexdigest()
 
+    @staticmethod
+    def make_json_hash(data):
+        """ Static HASH of the canonical json form of data (sorted keys, compact separators). Equal payloads yield the
+            same output regardless of key order
+        """
+        return Hashing.make_bytes_hash(JsonCodec.canonical(data))
+
+    @staticmethod
+    def make_bytes_hash(data):
+        """ Static HASH of bytes, eg. a payload already encoded with JsonCodec.canonical() (same as make_json_hash)
+        """
+        return hashlib.md5(data).hexdigest()
+
     @staticmethod
     def make_sha1_hash(string):
         """ Non-Static HASH. eg. multiple iterations of the same input yields different output
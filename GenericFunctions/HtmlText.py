@@ -0,0 +1,129 @@
+""" Streaming html to text conversion, a fast stand-in for BeautifulSoup(html, 'html.parser').get_text(sep, strip=True)
+"""
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+
+
+def named_entities():
+    """ Entity name (without ';') -> characters, the first name in sorted order wins (as BeautifulSoup does) """
+    entities = {}
+    for name, characters in sorted(html5.items()):
+        entities.setdefault(name[:-1] if name.endswith(';') else name, characters)
+    return entities
+
+
+class HtmlText(HTMLParser):
+    """ Collect the text of a html fragment while it is parsed, without building a tree. The events of the stdlib
+        HTMLParser are handled the way BeautifulSoup's html.parser tree builder handles them, so get_text() gives the
+        same result as BeautifulSoup(html, features='html.parser').get_text(separator=separator, strip=True):
+
+            - text is split into strings at every tag, comment, declaration and processing instruction
+            - strings are stripped, empty strings are dropped
+            - text in <script>, <style>, <template>, <rt> and <rp> is not content, CDATA sections are
+            - an end tag closes all elements opened after its start tag, unknown end tags are ignored
+    """
+    entities = named_entities()
+    hidden = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+    void = frozenset(['area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image',
+                      'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source',
+                      'spacer', 'track', 'wbr'])
+    decimal = re.compile('^([0-9]+)(.*)')
+    hexadecimal = re.compile('^([0-9a-f]+)(.*)')
+    # Windows-1252 characters for the C1 control references (0x80 - 0x9f) that have one
+    windows_1252 = {number: bytes([number]).decode('cp1252') for number in range(0x80, 0xa0)
+                    if number not in (0x81, 0x8d, 0x8f, 0x90, 0x9d)}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.strings = []
+        self.data = []
+        self.stack = []  # Open elements
+        self.hiding = 0  # Number of open hidden elements
+        self.closed_void = []  # Void elements that may still get a (redundant) end tag
+
+    @staticmethod
+    def get_text(html, separator='\n\n'):
+        """ Text of html, stripped strings joined with separator """
+        parser = HtmlText()
+        parser.feed(html)
+        parser.close()
+        parser.flush()
+        return separator.join(parser.strings)
+
+    def flush(self):
+        """ End the current string """
+        if self.data:
+            text = ''.join(self.data).strip()
+            self.data = []
+            if text != '' and self.hiding == 0:
+                self.strings.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self.flush()
+        if tag in self.void:
+            self.closed_void.append(tag)
+            return
+        self.stack.append(tag)
+        if tag in self.hidden:
+            self.hiding += 1
+
+    def handle_startendtag(self, tag, attrs):
+        # <tag/> is opened and closed right away
+        self.flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.closed_void:
+            self.closed_void.remove(tag)
+            return
+        self.flush()
+        if tag not in self.stack:
+            return
+        while self.stack:
+            name = self.stack.pop()
+            if name in self.hidden:
+                self.hiding -= 1
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_charref(self, name):
+        base, pattern = 10, self.decimal
+        if name.startswith(('x', 'X')):
+            name, base, pattern = name[1:], 16, self.hexadecimal
+        try:
+            number, extra = int(name, base), ''
+        except ValueError:
+            match = pattern.search(name)
+            if match is None:
+                self.data.append(name)
+                return
+            number, extra = int(match.group(1), base), match.group(2)
+        self.data.append(self.character(number) + extra)
+
+    def character(self, number):
+        """ Character of a numeric reference (the 'numeric character reference end state' of the html spec) """
+        if number == 0 or number > 0x10ffff or 0xd800 <= number <= 0xdfff:
+            return '\ufffd'
+        return self.windows_1252.get(number) or chr(number)
+
+    def handle_entityref(self, name):
+        self.data.append(self.entities.get(name, '&' + name))
+
+    def handle_comment(self, data):
+        self.flush()
+
+    def handle_decl(self, decl):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def unknown_decl(self, data):
+        self.flush()
+        if data.upper().startswith('CDATA['):
+            text = data[len('CDATA['):].strip()
+            if text != '':
+                self.strings.append(text)
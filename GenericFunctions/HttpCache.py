@@ -0,0 +1,200 @@
+""" On-disk HTTP cache for Iprox page fetches, revalidated with conditional GETs (ETag / Last-Modified) """
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class HttpCache:
+    """ Store the body and validators (ETag, Last-Modified) of each fetched url in cache_dir.
+
+        - Within 'ttl' seconds after it was fetched a url is served from the local copy without any request.
+        - After that the url is revalidated: the GET sends If-None-Match / If-Modified-Since and a
+          '304 Not Modified' answer is served from the local copy.
+        - bypass=True always fetches the url (reload=true semantics) and refreshes the local copy.
+
+        Urls are normalized (lowercase scheme and host, sorted query, no fragment) and only urls on one of the given
+        hosts are cached (the Iprox site), backend calls always go over the wire. Bodies are stored zlib compressed and
+        content addressed (pages with the same body share a blob). When the blobs exceed max_bytes on disk the least
+        recently used urls are evicted.
+
+        stats(): fresh (served without a request), hits (served from a 304), misses (full download), evicted and
+        bytes_saved (size of the bodies not downloaded)
+    """
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 cache_dir,
+                 hosts=('amsterdam.nl', 'www.amsterdam.nl'),
+                 ttl=0,
+                 max_bytes=1073741824,
+                 bypass=False):
+        self.blob_dir = os.path.join(cache_dir, 'blobs')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.hosts = set(hosts)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.lock = threading.Lock()
+        self.counters = {'fresh': 0, 'hits': 0, 'misses': 0, 'evicted': 0, 'bytes_saved': 0}
+        self.connection = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                                    '  url TEXT PRIMARY KEY,'
+                                    '  etag TEXT,'
+                                    '  last_modified TEXT,'
+                                    '  content_type TEXT,'
+                                    '  encoding TEXT,'
+                                    '  digest TEXT,'
+                                    '  size INTEGER,'
+                                    '  stored_at REAL,'
+                                    '  accessed_at REAL'
+                                    ')')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER)')
+
+    def accepts(self, url):
+        """ Check if the url is on a cached host """
+        return urlsplit(url).hostname in self.hosts
+
+    @staticmethod
+    def normalize(url):
+        """ Cache key of a url: lowercase scheme and host, sorted query parameters, no fragment """
+        parts = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+    def get(self, get, url, **kwargs):
+        """ GET of url with the given get function (eg. requests.Session.get), served from the local copy when
+            possible
+        """
+        key = self.normalize(url)
+        entry = None if self.bypass is True else self.load(key)
+        if entry is not None and time.time() - entry['stored_at'] < self.ttl:
+            self.count('fresh', entry['size'])
+            return self.response(url, entry)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if entry['etag'] is not None:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified'] is not None:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.count('hits', entry['size'])
+            self.touch(key, stored=True)
+            return self.response(url, entry)
+
+        self.count('misses')
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code == 200 and (self.ttl > 0 or etag is not None or last_modified is not None):
+            self.store(key, etag, last_modified, response)
+        return response
+
+    def count(self, counter, bytes_saved=0, amount=1):
+        """ Update the counters """
+        with self.lock:
+            self.counters[counter] += amount
+            self.counters['bytes_saved'] += bytes_saved
+
+    def stats(self):
+        """ Copy of the counters """
+        with self.lock:
+            return dict(self.counters)
+
+    @staticmethod
+    def response(url, entry):
+        """ Build a '200 OK' requests.Response from a cache entry """
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict({'Content-Type': entry['content_type']})
+        response.encoding = entry['encoding']
+        response._content = entry['body']  # pylint: disable=protected-access
+        return response
+
+    def blob_path(self, digest):
+        """ Path of a compressed body """
+        return os.path.join(self.blob_dir, f'{digest}.z')
+
+    def load(self, key):
+        """ Read a cache entry (validators + body) or None """
+        with self.lock:
+            row = self.connection.execute('SELECT etag, last_modified, content_type, encoding, digest, size, stored_at '
+                                          'FROM entries WHERE url=?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        try:
+            with open(self.blob_path(row[4]), 'rb') as f:
+                body = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+        self.touch(key)
+        return {'etag': row[0], 'last_modified': row[1], 'content_type': row[2], 'encoding': row[3], 'size': row[5],
+                'stored_at': row[6], 'body': body}
+
+    def touch(self, key, stored=False):
+        """ Mark an entry as recently used (and as freshly validated) """
+        now = time.time()
+        with self.lock, self.connection:
+            if stored is True:
+                self.connection.execute('UPDATE entries SET accessed_at=?, stored_at=? WHERE url=?', (now, now, key))
+            else:
+                self.connection.execute('UPDATE entries SET accessed_at=? WHERE url=?', (now, key))
+
+    def store(self, key, etag, last_modified, response):
+        """ Write the body as a content addressed blob and (re)point the url entry to it """
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        now = time.time()
+        with self.lock, self.connection:
+            if not os.path.exists(path):
+                with open(f'{path}.tmp', 'wb') as f:
+                    f.write(zlib.compress(body))
+                os.replace(f'{path}.tmp', path)
+            self.connection.execute('INSERT OR IGNORE INTO blobs (digest, size) VALUES (?, ?)',
+                                    (digest, os.path.getsize(path)))
+            self.connection.execute('INSERT OR REPLACE INTO entries (url, etag, last_modified, content_type, encoding, '
+                                    'digest, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                    (key, etag, last_modified, response.headers.get('Content-Type', ''),
+                                     response.encoding, digest, len(body), now, now))
+            self.remove_orphans()
+        self.evict()
+
+    def remove_orphans(self):
+        """ Remove the blobs no entry points to anymore, call with the lock held """
+        for digest, in self.connection.execute('SELECT digest FROM blobs WHERE digest NOT IN '
+                                               '(SELECT digest FROM entries)').fetchall():
+            self.connection.execute('DELETE FROM blobs WHERE digest=?', (digest,))
+            try:
+                os.remove(self.blob_path(digest))
+            except OSError:
+                pass
+
+    def evict(self):
+        """ Remove the least recently used entries while the blobs exceed max_bytes """
+        evicted = 0
+        with self.lock, self.connection:
+            while self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0] > self.max_bytes:
+                row = self.connection.execute('SELECT url FROM entries ORDER BY accessed_at LIMIT 1').fetchone()
+                if row is None:
+                    break
+                self.connection.execute('DELETE FROM entries WHERE url=?', row)
+                self.remove_orphans()
+                evicted += 1
+        if evicted > 0:
+            self.count('evicted', amount=evicted)
+
+    def close(self):
+        """ Close the index """
+        with self.lock:
+            self.connection.close()
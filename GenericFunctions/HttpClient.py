@@ -0,0 +1,106 @@
+""" Shared HTTP client for all Iprox and backend calls. A single instance owns keep-alive connection pools per host so a
+    scraper run reuses a small number of warm connections instead of doing a TCP+TLS handshake for every request.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from GenericFunctions.HttpCache import HttpCache
+from GenericFunctions.SingleFlight import SingleFlight
+
+
+class HttpClient:
+    """ Thin wrapper around a requests.Session with pooled adapters for http:// and https://
+
+        pool_connections: number of per-host connection pools to keep (eg. amsterdam.nl, www.amsterdam.nl, backend)
+        pool_maxsize: number of keep-alive connections kept per host pool
+        cache: optional HttpCache, GETs on the cached hosts are revalidated with conditional requests
+        limiter: optional RateLimiter, all requests that go over the wire are rate limited per host
+        retry: optional Retry policy for idempotent requests
+        breaker: optional CircuitBreaker, requests to a host that is down fail fast
+
+        Concurrent GETs of the same (normalized) url, params and headers are coalesced into one request, all callers
+        get the same response.
+    """
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 pool_connections=10,
+                 pool_maxsize=10,
+                 cache=None,
+                 limiter=None,
+                 retry=None,
+                 breaker=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.cache = cache
+        self.limiter = limiter
+        self.retry = retry
+        self.breaker = breaker
+        self.single_flight = SingleFlight()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, **kwargs):
+        """ GET request on a pooled connection """
+        if kwargs.get('stream') is True:
+            return self.fetch(url, **kwargs)
+        key = (HttpCache.normalize(url),
+               repr(sorted(dict(kwargs.get('params') or {}).items())),
+               repr(sorted(dict(kwargs.get('headers') or {}).items())))
+        return self.single_flight.do(key, lambda: self.fetch(url, **kwargs))
+
+    def fetch(self, url, **kwargs):
+        """ GET request, through the cache for cached hosts """
+        if self.cache is not None and self.cache.accepts(url):
+            return self.cache.get(self.send_get, url, **kwargs)
+        return self.send_get(url, **kwargs)
+
+    def send_get(self, url, **kwargs):
+        """ GET request over the wire """
+        return self.request('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """ POST request on a pooled connection """
+        return self.request('post', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        """ DELETE request on a pooled connection """
+        return self.request('delete', url, **kwargs)
+
+    def request(self, method, url, idempotent=None, **kwargs):
+        """ Send a request (retried when idempotent) through the circuit breaker and within the rate limits of its host.
+            The circuit breaker sees the outcome of the request once all its attempts are done
+
+            :param idempotent: may the request be sent again, default: GETs, POSTs with an identifier in their payload
+        """
+        def send():
+            function = getattr(self.session, method)
+            if self.limiter is not None:
+                return self.limiter.call(url, lambda: function(url, **kwargs))
+            return function(url, **kwargs)
+
+        if self.retry is not None and idempotent is None:
+            idempotent = self.retry.is_idempotent(method, kwargs)
+
+        def attempts():
+            if self.retry is None:
+                return send()
+            return self.retry.call(send, idempotent)
+
+        if self.breaker is not None:
+            return self.breaker.call(url, attempts)
+        return attempts()
+
+    def stats(self):
+        """ Number of coalesced requests and retries, state of the rate limiter and circuit breaker per host """
+        stats = {'coalesced': self.single_flight.coalesced}
+        if self.limiter is not None:
+            stats['rate_limiter'] = self.limiter.stats()
+        if self.retry is not None:
+            stats['retries'] = self.retry.retries
+        if self.breaker is not None:
+            stats['circuit_breaker'] = self.breaker.stats()
+        return stats
+
+    def close(self):
+        """ Close all pooled connections """
+        self.session.close()
@@ -0,0 +1,127 @@
+""" Write-behind buffer for the ingestion routes on the backend """
+import threading
+from queue import Queue, Empty
+from GenericFunctions.JsonCodec import JsonCodec
+from GenericFunctions.Logger import Logger
+
+
+class IngestionBuffer:
+    """ Collect payloads for the backend and post them in batches to the bulk endpoint of each route (<route>/batch).
+
+        A batch is a json list of payloads and is flushed when it reaches batch_size items or batch_bytes bytes, when
+        the buffer is idle for 'linger' seconds or when flush() is called. The backend answers with one result per
+        payload: {'status': True, 'result': [{'status': bool, 'result': ...}, ...]}. Each payload has a callback which
+        is called with (success, result) once its batch has been posted.
+
+        Payloads of different routes in the same flush are posted in the order in which their route was first seen
+        (eg. projects before project details). The buffer holds at most max_pending payloads, add() blocks when the
+        backend falls behind (backpressure).
+    """
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 client,
+                 headers=dict,
+                 batch_size=50,
+                 batch_bytes=1048576,
+                 max_pending=100,
+                 linger=1.0,
+                 timeout=600):
+        self.logger = Logger()
+        self.client = client
+        self.headers = dict(headers, **{'Content-Type': 'application/json'})
+        self.batch_size = max(1, batch_size)
+        self.batch_bytes = batch_bytes
+        self.linger = linger
+        self.timeout = timeout
+        self.queue = Queue(maxsize=max(1, max_pending))
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add(self, url, payload, callback):
+        """ Queue a payload (data, or json bytes when it is encoded already) for the given route, blocks while the
+            buffer is full
+        """
+        body = payload if isinstance(payload, bytes) else JsonCodec.dumps(payload)
+        self.queue.put((url, body, callback))
+
+    def flush(self):
+        """ Post everything that was added so far and wait until all callbacks are done """
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        """ Flush and stop the buffer """
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        """ Collect queued payloads and post them in batches """
+        pending = []
+        pending_bytes = 0
+        while True:
+            try:
+                entry = self.queue.get(timeout=self.linger)
+            except Empty:
+                self.post_batches(pending)
+                pending, pending_bytes = [], 0
+                continue
+
+            if entry is None:
+                return
+
+            if isinstance(entry, threading.Event):
+                self.post_batches(pending)
+                pending, pending_bytes = [], 0
+                entry.set()
+                continue
+
+            pending.append(entry)
+            pending_bytes += len(entry[1])
+            if len(pending) >= self.batch_size or pending_bytes >= self.batch_bytes:
+                self.post_batches(pending)
+                pending, pending_bytes = [], 0
+
+    def post_batches(self, pending):
+        """ Group pending payloads per route and post them in batches of at most batch_size items/batch_bytes """
+        routes = {}
+        for entry in pending:
+            routes.setdefault(entry[0], []).append(entry)
+
+        for url, entries in routes.items():
+            batch = []
+            batch_bytes = 0
+            for entry in entries:
+                if batch and (len(batch) >= self.batch_size or batch_bytes + len(entry[1]) > self.batch_bytes):
+                    self.post_batch(url, batch)
+                    batch, batch_bytes = [], 0
+                batch.append(entry)
+                batch_bytes += len(entry[1])
+            if batch:
+                self.post_batch(url, batch)
+
+    def post_batch(self, url, batch):
+        """ Post one batch and map the results back onto the callback of each payload """
+        body = b'[' + b','.join([entry[1] for entry in batch]) + b']'
+        try:
+            # Every payload carries an identifier, posting a batch again is safe
+            response = self.client.post(f'{url}/batch', headers=self.headers, data=body, timeout=self.timeout,
+                                        idempotent=True)
+            if response.status_code != 200:
+                self.logger.error(response.text)
+                results = [{'status': False, 'result': response.text}] * len(batch)
+            else:
+                results = JsonCodec.loads(response.content).get('result')
+                if not isinstance(results, list) or len(results) != len(batch):
+                    results = [{'status': True, 'result': results}] * len(batch)
+        except Exception as error:
+            self.logger.error(f'failed posting batch to {url}/batch: {error}')
+            results = [{'status': False, 'result': str(error)}] * len(batch)
+
+        for entry, result in zip(batch, results):
+            if not isinstance(result, dict):
+                result = {'status': bool(result), 'result': result}
+            try:
+                entry[2](result.get('status', False) is True, result.get('result'))
+            except Exception as error:
+                self.logger.error(f'failed handling ingestion result for {url}: {error}')
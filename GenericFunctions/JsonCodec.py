@@ -0,0 +1,51 @@
+""" JSON codec for Iprox pages and ingestion payloads: orjson when it is installed, the json module otherwise """
+import codecs
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class JsonCodec:
+    """ Decode and encode json with the fastest codec available
+
+        loads(): bytes or str -> data, raises json.JSONDecodeError (orjson's error is a subclass of it)
+        dumps(): data -> compact utf-8 bytes
+        canonical(): data -> compact utf-8 bytes with sorted keys. Equal payloads give equal bytes, so one encoding is
+                     used for the payload hash and for the POST body
+
+        Both codecs give the same bytes for the payloads of this scraper (str keys, finite floats). Data orjson cannot
+        encode (eg. int keys, ints over 64 bits) is encoded by the json module.
+    """
+    backend = 'orjson' if orjson is not None else 'json'
+
+    @staticmethod
+    def loads(data):
+        """ Decode json (bytes may start with a UTF-8 BOM, like requests' Response.json() accepts) """
+        if isinstance(data, bytes) and data.startswith(codecs.BOM_UTF8):
+            data = data[len(codecs.BOM_UTF8):]
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(data):
+        """ Encode to compact json """
+        if orjson is not None:
+            try:
+                return orjson.dumps(data)
+            except TypeError:
+                pass
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def canonical(data):
+        """ Encode to compact json with sorted keys """
+        if orjson is not None:
+            try:
+                return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+            except TypeError:
+                pass
+        return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
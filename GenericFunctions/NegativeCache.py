@@ -0,0 +1,78 @@
+""" Persistent negative cache: Iprox urls known to be dead (404, not json, not a project page) are skipped cheaply """
+import os
+import sqlite3
+import threading
+import time
+
+
+class NegativeCache:
+    """ Local SQLite store of dead urls: url -> (failures, retry_at, reason)
+
+        A dead url is skipped until retry_at. Each time it is found dead again the re-probe interval doubles, from
+        base_interval up to max_interval seconds. A url that works again is forgotten.
+
+        stats(): skipped (dead urls not fetched), marked (urls found dead), revived (dead urls that work again) and
+        dead (urls currently skipped)
+    """
+    def __init__(self, path, base_interval=3600, max_interval=604800):
+        if os.path.dirname(path) != '':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.lock = threading.Lock()
+        self.counters = {'skipped': 0, 'marked': 0, 'revived': 0}
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS dead_urls ('
+                                    '  url TEXT PRIMARY KEY,'
+                                    '  failures INTEGER,'
+                                    '  retry_at REAL,'
+                                    '  reason TEXT'
+                                    ')')
+            # Urls in the store, so urls that work do not cost a database write
+            self.urls = {row[0] for row in self.connection.execute('SELECT url FROM dead_urls')}
+
+    def is_dead(self, url):
+        """ Check if url is dead and not due for a re-probe """
+        with self.lock:
+            if url not in self.urls:
+                return False
+            row = self.connection.execute('SELECT retry_at FROM dead_urls WHERE url=?', (url,)).fetchone()
+            dead = row is not None and row[0] > time.time()
+            if dead:
+                self.counters['skipped'] += 1
+            return dead
+
+    def mark_dead(self, url, reason):
+        """ Store (or extend) a dead url, the re-probe interval doubles with every failure """
+        with self.lock, self.connection:
+            row = self.connection.execute('SELECT failures FROM dead_urls WHERE url=?', (url,)).fetchone()
+            failures = 1 if row is None else row[0] + 1
+            interval = min(self.max_interval, self.base_interval * 2 ** (failures - 1))
+            self.connection.execute('INSERT OR REPLACE INTO dead_urls (url, failures, retry_at, reason) '
+                                    'VALUES (?, ?, ?, ?)', (url, failures, time.time() + interval, reason))
+            self.urls.add(url)
+            self.counters['marked'] += 1
+
+    def mark_alive(self, url):
+        """ Forget a url that works (again) """
+        with self.lock:
+            if url not in self.urls:
+                return
+            with self.connection:
+                self.connection.execute('DELETE FROM dead_urls WHERE url=?', (url,))
+            self.urls.discard(url)
+            self.counters['revived'] += 1
+
+    def stats(self):
+        """ Copy of the counters and the number of urls currently skipped """
+        with self.lock:
+            stats = dict(self.counters)
+            stats['dead'] = self.connection.execute('SELECT COUNT(*) FROM dead_urls WHERE retry_at > ?',
+                                                    (time.time(),)).fetchone()[0]
+            return stats
+
+    def close(self):
+        """ Close the database """
+        with self.lock:
+            self.connection.close()
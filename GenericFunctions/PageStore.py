@@ -0,0 +1,49 @@
+""" Run-scoped store of fetched Iprox pages, hands a page body from the discovery step to the scraper of that page """
+import threading
+
+
+class PageStore:
+    """ Thread-safe url -> body map. A body is handed out once (pop), so the store only holds the pages that are
+        discovered but not yet scraped. A page is discovered (fetched and kept) once per run, also when it is linked
+        from several places. Clear it at the end of a run.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = {}
+        self.discovered = {}  # url -> {'lock': Lock, 'found': None (not fetched yet) or bool}
+
+    def put(self, url, body):
+        """ Keep the body of a fetched page """
+        with self.lock:
+            self.pages[url] = body
+
+    def discover(self, url, fetch):
+        """ Fetch a page and keep its body, unless it was discovered before in this run. fetch() returns the response
+            of the page, concurrent discoveries of the same url wait for the first one
+
+            :return: True if the page was found (status 200)
+        """
+        with self.lock:
+            entry = self.discovered.setdefault(url, {'lock': threading.Lock(), 'found': None})
+        with entry['lock']:
+            if entry['found'] is None:
+                result = fetch()
+                entry['found'] = result.status_code == 200
+                if entry['found'] is True:
+                    self.put(url, result.content)
+            return entry['found']
+
+    def pop(self, url):
+        """ Take the body of a page out of the store, None when it was not fetched (or already handed out) """
+        with self.lock:
+            return self.pages.pop(url, None)
+
+    def clear(self):
+        """ Drop all pages, and forget which pages were discovered """
+        with self.lock:
+            self.pages.clear()
+            self.discovered.clear()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pages)
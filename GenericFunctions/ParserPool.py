@@ -0,0 +1,168 @@
+""" Process pool for the CPU-bound parsing of Iprox pages, so it is not serialized on the GIL of the network threads """
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from GenericFunctions.SanitizerMemo import SanitizerMemo
+from GenericFunctions.TextSanitizers import TextSanitizers
+
+
+def run_chunk(jobs):
+    """ Run a chunk of jobs in a worker process: [(function, args), ...] -> [(success, result or error), ...] """
+    results = []
+    for function, args in jobs:
+        try:
+            results.append((True, function(*args)))
+        except Exception as error:
+            results.append((False, error))
+    return results
+
+
+def worker_init():
+    """ Worker processes are forked: give them their own (in memory) sanitizer memo instead of the parent's """
+    if TextSanitizers.memo is not None:
+        TextSanitizers.memo = SanitizerMemo(max_entries=TextSanitizers.memo.max_entries)
+
+
+class ParserPool:
+    """ Runs parse functions (raw page json in, parsed data out) in a pool of worker processes
+
+        workers: number of worker processes, 0 runs the functions in the calling thread
+        chunk_size: jobs are sent to the workers in chunks of up to chunk_size jobs, a chunk that is not full is sent
+                    after linger seconds
+
+        submit() returns a Future right away, so network threads keep fetching while their pages are parsed. Functions
+        must be module level functions or static methods (they are pickled by name), their arguments and results are
+        pickled too. When the pool breaks (eg. a worker got killed) the functions are run in the calling thread.
+
+        The workers are forked when the pool is created: create it before the network threads are started.
+    """
+    def __init__(self, workers=0, chunk_size=1, linger=0.005):
+        self.workers = max(0, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.linger = linger
+        self.lock = threading.Lock()
+        self.pending = []
+        self.timer = None
+        self.counters = {'jobs': 0, 'chunks': 0, 'inline': 0, 'broken': 0}
+        self.executor = None
+        if self.workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context('fork'),
+                                                initializer=worker_init)
+            # Fork all workers now (before any other threads exist)
+            self.executor.submit(run_chunk, []).result()
+
+    def submit(self, function, *args):
+        """ Parse in a worker process, returns a Future of the result """
+        future = Future()
+        chunk = None
+        with self.lock:
+            self.counters['jobs'] += 1
+            executor = self.executor
+            if executor is not None:
+                self.pending.append((future, function, args))
+                if len(self.pending) >= self.chunk_size:
+                    chunk = self.take()
+                elif self.timer is None:
+                    self.timer = threading.Timer(self.linger, self.dispatch_pending)
+                    self.timer.daemon = True
+                    self.timer.start()
+        if executor is None:
+            self.run_inline(future, function, args)
+        elif chunk is not None:
+            self.dispatch(executor, chunk)
+        return future
+
+    def run(self, function, *args):
+        """ Parse in a worker process and wait for the result (other threads go on meanwhile) """
+        return self.submit(function, *args).result()
+
+    def take(self):
+        """ Take the pending jobs (lock held) """
+        chunk = self.pending
+        self.pending = []
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return chunk
+
+    def dispatch_pending(self):
+        """ Send a chunk that did not fill up within linger seconds """
+        with self.lock:
+            self.timer = None
+            chunk = self.take()
+            executor = self.executor
+        if len(chunk) > 0:
+            self.dispatch(executor, chunk)
+
+    def dispatch(self, executor, chunk):
+        """ Send a chunk of jobs to the workers, their futures are resolved when the chunk is done """
+        if executor is None:
+            for future, function, args in chunk:
+                self.run_inline(future, function, args)
+            return
+        with self.lock:
+            self.counters['chunks'] += 1
+
+        def done(chunk_future):
+            try:
+                results = chunk_future.result()
+            except BrokenProcessPool:
+                # A worker died: parse these here, and the next ones too
+                self.broken()
+                for future, function, args in chunk:
+                    self.run_inline(future, function, args)
+                return
+            except Exception as error:
+                # Eg. the arguments or a result could not be pickled
+                for future, _, _ in chunk:
+                    future.set_exception(error)
+                return
+            for (future, _, _), (success, result) in zip(chunk, results):
+                if success:
+                    future.set_result(result)
+                else:
+                    future.set_exception(result)
+
+        try:
+            executor.submit(run_chunk, [(function, args) for _, function, args in chunk]).add_done_callback(done)
+        except RuntimeError:
+            # Broken (BrokenProcessPool) or shut down
+            self.broken()
+            for future, function, args in chunk:
+                self.run_inline(future, function, args)
+
+    def run_inline(self, future, function, args):
+        """ Run a job in the calling thread """
+        with self.lock:
+            self.counters['inline'] += 1
+        try:
+            future.set_result(function(*args))
+        except Exception as error:
+            future.set_exception(error)
+
+    def broken(self):
+        """ Stop using the worker processes """
+        with self.lock:
+            if self.executor is not None:
+                self.counters['broken'] += 1
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+    def stats(self):
+        """ Copy of the counters """
+        with self.lock:
+            stats = dict(self.counters)
+            stats['workers'] = self.workers if self.executor is not None else 0
+            return stats
+
+    def close(self):
+        """ Send the pending jobs and stop the worker processes once they are done """
+        with self.lock:
+            chunk = self.take()
+            executor = self.executor
+        if len(chunk) > 0:
+            self.dispatch(executor, chunk)
+        if executor is not None:
+            executor.shutdown(wait=True)
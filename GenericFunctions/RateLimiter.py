@@ -0,0 +1,135 @@
+""" Per-host rate limiting: a token bucket for the request rate and an AIMD controller for the concurrency """
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+
+
+class TokenBucket:
+    """ Allow 'rate' requests per second with bursts of up to 'burst' requests, rate=0 disables the bucket """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ Take a token, blocks until one is available. Returns the time waited """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """ Hand out no tokens for the given number of seconds (eg. a Retry-After header) """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class AimdLimiter:
+    """ Adaptive concurrency limit: grows additively (+1 per 'limit' healthy responses) and is cut multiplicatively on
+        overload (429, 5xx, timeouts). Responses of requests started before the last cut do not cut it again.
+    """
+    def __init__(self, max_limit, min_limit=1, decrease=0.5):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.decrease = decrease
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.decreased_at = 0.0
+        self.backoffs = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """ Wait for a free slot, returns the start time of the request """
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, overloaded, healthy):
+        """ Free the slot of a request and adjust the limit """
+        with self.condition:
+            self.in_flight -= 1
+            if overloaded:
+                if started >= self.decreased_at:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self.decreased_at = time.monotonic()
+                    self.backoffs += 1
+            elif healthy:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+class RateLimiter:
+    """ Token bucket + AIMD concurrency per host. Settings: {host: {'rate': .., 'burst': .., 'concurrency': ..}}
+        hosts without their own settings use the defaults. A response slower than 'latency' seconds is not healthy: the
+        concurrency limit does not grow on it.
+    """
+    def __init__(self, rate=10, burst=10, concurrency=10, latency=2.0, hosts=None):  # pylint: disable=too-many-arguments
+        self.defaults = {'rate': rate, 'burst': burst, 'concurrency': concurrency}
+        self.settings = hosts or {}
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def host(self, url):
+        """ Bucket and concurrency limiter of the host of url """
+        hostname = urlsplit(url).hostname or ''
+        with self.lock:
+            if hostname not in self.hosts:
+                settings = dict(self.defaults, **self.settings.get(hostname, {}))
+                self.hosts[hostname] = {'bucket': TokenBucket(settings['rate'], settings['burst']),
+                                        'aimd': AimdLimiter(settings['concurrency']),
+                                        'waited': 0.0}
+            return self.hosts[hostname]
+
+    def call(self, url, function):
+        """ Run a request function for url within the limits of its host """
+        host = self.host(url)
+        waited = host['bucket'].acquire()
+        started = host['aimd'].acquire()
+        overloaded, healthy = False, False
+        try:
+            response = function()
+            overloaded = response.status_code == 429 or response.status_code >= 500
+            healthy = not overloaded and time.monotonic() - started <= self.latency
+            if response.status_code == 429:
+                host['bucket'].pause(self.retry_after(response))
+            return response
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            overloaded = True
+            raise
+        finally:
+            host['aimd'].release(started, overloaded, healthy)
+            with self.lock:
+                host['waited'] += waited
+
+    @staticmethod
+    def retry_after(response):
+        """ Seconds from a Retry-After header (default 1) """
+        try:
+            return float(response.headers.get('Retry-After', 1))
+        except (TypeError, ValueError):
+            return 1.0
+
+    def stats(self):
+        """ Current concurrency limit, number of back-offs and seconds waited for a token per host """
+        with self.lock:
+            return {hostname: {'limit': int(host['aimd'].limit),
+                               'backoffs': host['aimd'].backoffs,
+                               'waited': round(host['waited'], 3)}
+                    for hostname, host in self.hosts.items()}
@@ -0,0 +1,59 @@
+""" Bounded retries with decorrelated jitter for idempotent requests """
+import random
+import threading
+import time
+import requests
+
+
+class Retry:
+    """ Retry a request on connection errors, timeouts and 'retry' statuses (429, 5xx) at most attempts - 1 times.
+
+        Only idempotent requests are retried: GETs and POSTs whose payload carries an identifier (the backend upserts
+        on it). The delay between attempts is 'decorrelated jitter': random between base_delay and 3x the previous
+        delay, capped at max_delay (and at least the Retry-After of a 429).
+    """
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=10.0, statuses=(429, 500, 502, 503, 504)):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = set(statuses)
+        self.lock = threading.Lock()
+        self.retries = 0
+
+    @staticmethod
+    def is_idempotent(method, kwargs):
+        """ GETs and POSTs with an identifier in their json payload """
+        if method == 'get':
+            return True
+        payload = kwargs.get('json')
+        return method == 'post' and isinstance(payload, dict) and payload.get('identifier') is not None
+
+    def call(self, function, idempotent):
+        """ Run a request function, retried when idempotent """
+        delay = self.base_delay
+        for attempt in range(1, self.attempts + 1):
+            last_attempt = attempt == self.attempts or not idempotent
+            retry_after = 0.0
+            try:
+                response = function()
+                if last_attempt or response.status_code not in self.statuses:
+                    return response
+                if response.status_code == 429:
+                    retry_after = self.retry_after(response)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                if last_attempt:
+                    raise
+
+            delay = min(self.max_delay, random.uniform(self.base_delay, delay * 3))
+            with self.lock:
+                self.retries += 1
+            time.sleep(max(delay, retry_after))
+        return None
+
+    @staticmethod
+    def retry_after(response):
+        """ Seconds from a Retry-After header (default 0) """
+        try:
+            return float(response.headers.get('Retry-After', 0))
+        except (TypeError, ValueError):
+            return 0.0
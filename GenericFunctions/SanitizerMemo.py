@@ -0,0 +1,114 @@
+""" Memo of sanitized html fragments: the same fragments recur within a run and between runs """
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class SanitizerMemo:
+    """ Bounded LRU memo: digest of (sanitizer, fragment) -> (result, cpu seconds it took)
+
+        Optionally kept in a local SQLite file between runs (path), it is loaded on start and written by save(). Results
+        are strings or tuples of strings (eg. TextSanitizers.sanitize()), they are stored as json. A stored memo of an
+        other version (eg. TextSanitizers.version(), changes with the sanitizer code) is cleared on load.
+
+        stats(): hits, misses, hit_rate, evicted, entries and saved (cpu seconds the hits would have cost)
+    """
+    def __init__(self, max_entries=10000, path=None, version=''):
+        self.max_entries = max(1, max_entries)
+        self.version = version
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.counters = {'hits': 0, 'misses': 0, 'evicted': 0, 'saved': 0.0}
+        self.connection = None
+        if path is not None:
+            if os.path.dirname(path) != '':
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            with self.lock, self.connection:
+                self.connection.execute('CREATE TABLE IF NOT EXISTS memo ('
+                                        '  digest BLOB PRIMARY KEY,'
+                                        '  result_json TEXT,'
+                                        '  cost REAL,'
+                                        '  position INTEGER'
+                                        ')')
+                self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+                row = self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                if row is None or row[0] != version:
+                    # Results of other sanitizer code are stale
+                    self.connection.execute('DELETE FROM memo')
+                    self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                                            (version,))
+                # Least recently used first, only the most recent max_entries
+                rows = self.connection.execute('SELECT digest, result_json, cost FROM memo ORDER BY position DESC '
+                                               'LIMIT ?', (self.max_entries,)).fetchall()
+                for digest, result_json, cost in reversed(rows):
+                    result = json.loads(result_json)
+                    self.entries[digest] = (tuple(result) if isinstance(result, list) else result, cost)
+
+    @staticmethod
+    def digest(name, fragment):
+        """ Key of a fragment for a sanitizer """
+        data = name.encode() + b'\0' + fragment.encode('utf-8', 'surrogatepass')
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(self, name, fragment, function):
+        """ Result of function(fragment), computed once per distinct fragment. Fragments that are not a string are not
+            memoized
+        """
+        if not isinstance(fragment, str):
+            return function(fragment)
+
+        key = self.digest(name, fragment)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                self.counters['saved'] += entry[1]
+                return entry[0]
+
+        started = time.thread_time()
+        result = function(fragment)
+        cost = time.thread_time() - started
+
+        with self.lock:
+            self.counters['misses'] += 1
+            self.entries[key] = (result, cost)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters['evicted'] += 1
+        return result
+
+    def stats(self):
+        """ Copy of the counters, the hit rate and the number of entries """
+        with self.lock:
+            stats = dict(self.counters)
+            stats['saved'] = round(stats['saved'], 3)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups > 0 else 0.0
+            stats['entries'] = len(self.entries)
+            return stats
+
+    def save(self):
+        """ Replace the stored memo with the current entries """
+        if self.connection is None:
+            return
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM memo')
+            self.connection.executemany('INSERT INTO memo (digest, result_json, cost, position) VALUES (?, ?, ?, ?)',
+                                        ((digest, json.dumps(result), cost, position)
+                                         for position, (digest, (result, cost)) in enumerate(self.entries.items())))
+
+    def close(self):
+        """ Save and close the database """
+        if self.connection is None:
+            return
+        self.save()
+        with self.lock:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,41 @@
+""" Request coalescing: concurrent callers for the same key share one call """
+import threading
+
+
+class SingleFlight:
+    """ The first caller for a key runs the call, callers arriving while it is in flight wait for it and get the same
+        result (or exception). Keys are only kept while their call is in flight.
+
+        coalesced: number of callers that did not run a call of their own
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key, function):
+        """ Run function() once for all concurrent callers of key """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = function()
+            return call['result']
+        except Exception as error:
+            call['error'] = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
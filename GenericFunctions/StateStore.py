@@ -0,0 +1,62 @@
+""" Persistent state of previous scraper runs, used for incremental scraping """
+import os
+import sqlite3
+import threading
+
+
+class StateStore:
+    """ Local SQLite store of the projects ingested on previous runs: identifier -> (modification_date, content_hash)
+        and of the hash of each payload posted to the backend: (kind, identifier) -> payload_hash
+
+        The store is shared by the project workers, all access is serialized with a lock.
+    """
+    def __init__(self, path):
+        if os.path.dirname(path) != '':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS projects ('
+                                    '  identifier TEXT PRIMARY KEY,'
+                                    '  modification_date TEXT,'
+                                    '  content_hash TEXT'
+                                    ')')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS payloads ('
+                                    '  kind TEXT,'
+                                    '  identifier TEXT,'
+                                    '  payload_hash TEXT,'
+                                    '  PRIMARY KEY (kind, identifier)'
+                                    ')')
+
+    def get_project(self, identifier):
+        """ Return (modification_date, content_hash) of the previous run or None """
+        with self.lock:
+            cursor = self.connection.execute('SELECT modification_date, content_hash FROM projects WHERE identifier=?',
+                                             (identifier,))
+            return cursor.fetchone()
+
+    def set_project(self, identifier, modification_date, content_hash):
+        """ Store modification_date and content_hash of a successfully ingested project """
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO projects (identifier, modification_date, content_hash) '
+                                    'VALUES (?, ?, ?)', (identifier, modification_date, content_hash))
+
+    def is_ingested(self, kind, identifier, payload_hash):
+        """ Check if exactly this payload (kind: project, project_details, article) was ingested before """
+        with self.lock:
+            cursor = self.connection.execute('SELECT payload_hash FROM payloads WHERE kind=? AND identifier=?',
+                                             (kind, identifier))
+            row = cursor.fetchone()
+        return row is not None and row[0] == payload_hash
+
+    def set_ingested(self, kind, identifier, payload_hash):
+        """ Store the hash of a payload the backend accepted """
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO payloads (kind, identifier, payload_hash) VALUES (?, ?, ?)',
+                                    (kind, identifier, payload_hash))
+
+    def close(self):
+        """ Close the database """
+        with self.lock:
+            self.connection.close()
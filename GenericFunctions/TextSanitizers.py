@@ -1,49 +1,138 @@
 """ Simple class file for stripping HTML tags from strings, with some magic for the Iprox web-pages """
+import hashlib
 import re
-from bs4 import BeautifulSoup
+import sys
+from GenericFunctions.HtmlText import HtmlText
 
 
 class TextSanitizers:
     """ Reformat text (eg. strip html, capitalize, etc...)
+
+        memo: optional SanitizerMemo, strip_html(), rewrite_html() and sanitize() results are then computed once per
+              fragment
     """
+    memo = None
+    # Image captions: '<...>Klik op de <word> om te vergroten...>' on one line, removed from the html. The part after
+    # the '>' can not backtrack much (the character classes do not overlap what follows them), the opening '<' is
+    # tracked by remove_captions()
+    caption_marker = '>Klik op de '
+    caption_tail = re.compile(r'Klik op de \S+ om te vergroten.[^\n>]*>')
+
+    @staticmethod
+    def version():
+        """ Digest of the sanitizer code (this module, HtmlText and the Python version, html.parser is part of it).
+            Memoized results of an other version are stale
+        """
+        digest = hashlib.blake2b(sys.version.encode(), digest_size=16)
+        for path in [__file__, sys.modules[HtmlText.__module__].__file__]:
+            with open(path, 'rb') as source:
+                digest.update(source.read())
+        return digest.hexdigest()
+
     @staticmethod
     def strip_html(html):
         """
-        Strip all html tags from given string
+        Strip all html tags from given string (memoized if TextSanitizers.memo is set)
 
         :param html: string
         :return: string
         """
+        if TextSanitizers.memo is not None:
+            return TextSanitizers.memo.get('strip_html', html, TextSanitizers.strip_html_uncached)
+        return TextSanitizers.strip_html_uncached(html)
 
-        # Use BeautifulSoup to strip any html tags
-        soup = BeautifulSoup(html, features='html.parser')
-        text = soup.get_text(separator='\n\n', strip=True)
+    @staticmethod
+    def strip_html_uncached(html):
+        """ Strip all html tags from given string """
+        # Strip any html tags (same text as BeautifulSoup's get_text(separator='\n\n', strip=True), without a tree)
+        text = HtmlText.get_text(html, separator='\n\n')
 
-        # Cleanup text a bit
-        regex_1 = re.compile('\.Zie ook')
-        regex_2 = re.compile('â')
-        regex_3 = re.compile('\b\.\b')
-        text = re.sub(regex_1, '. Zie ook: ', text)
-        text = re.sub(regex_2, '\'', text)
-        text = re.sub(regex_3, '. ', text)
+        # Cleanup text a bit (note: '\b' is a backspace character here, not a word boundary)
+        text = text.replace('.Zie ook', '. Zie ook: ')
+        text = text.replace('\u00e2\x80\x99', '\'')  # A right single quote (UTF-8) read as latin-1
+        text = text.replace('\b.\b', '. ')
         return text
 
     @staticmethod
     def rewrite_html(html):
         """
-        Rewrite specific strings in html
+        Rewrite specific strings in html (memoized if TextSanitizers.memo is set)
 
         :param html: string
         :return: string (html)
         """
-        regex_1 = re.compile('"/publish/pages/')
-        regex_2 = re.compile('<(?:(?!<).)*?>Klik op de \S+ om te vergroten.+?>')
-        # regex_2 = re.compile('<figcapture>.+?>')
+        if TextSanitizers.memo is not None:
+            return TextSanitizers.memo.get('rewrite_html', html, TextSanitizers.rewrite_html_uncached)
+        return TextSanitizers.rewrite_html_uncached(html)
 
-        html = re.sub(regex_1, '"https://www.amsterdam.nl/publish/pages/', html)
-        html = re.sub(regex_2, '', html)
+    @staticmethod
+    def rewrite_html_uncached(html):
+        """ Rewrite specific strings in html """
+        html = html.replace('"/publish/pages/', '"https://www.amsterdam.nl/publish/pages/')
+        if 'Klik op de ' in html:
+            html = TextSanitizers.remove_captions(html)
         return html
 
+    @staticmethod
+    def remove_captions(html):
+        """
+        Remove the image captions from html in linear time. Same result as re.sub() with the (backtracking) pattern
+        '<(?:(?!<).)*?>Klik op de \\S+ om te vergroten.+?>': a caption starts at the last '<' before its marker, with
+        no newline in between, and ends at the first '>' after 'om te vergroten' and at least one more character.
+
+        :param html: string
+        :return: string (html)
+        """
+        parts = []
+        start = 0  # End of the last removed caption
+        scanned = 0  # html[start:scanned] has been searched for '<' and newlines
+        opening = newline = -1
+        marker = html.find(TextSanitizers.caption_marker)
+        while marker != -1:
+            position = html.rfind('<', scanned, marker)
+            opening = position if position != -1 else opening
+            position = html.rfind('\n', scanned, marker)
+            newline = position if position != -1 else newline
+            scanned = marker
+
+            tail = TextSanitizers.caption_tail.match(html, marker + 1)
+            if tail is not None and opening >= start and opening > newline:
+                parts.append(html[start:opening])
+                start = scanned = tail.end()
+                opening = newline = -1
+                marker = html.find(TextSanitizers.caption_marker, start)
+            elif opening >= start and opening > newline:
+                marker = html.find(TextSanitizers.caption_marker, marker + 1)
+            else:
+                # No '<' to start a caption at: skip the markers up to the next one
+                position = html.find('<', marker)
+                marker = html.find(TextSanitizers.caption_marker, position) if position != -1 else -1
+        parts.append(html[start:])
+        return ''.join(parts)
+
+    @staticmethod
+    def sanitize(html, strip_rewritten=False):
+        """
+        Rewritten html and its text from a single parse: (rewrite_html(html), strip_html(html)). With strip_rewritten
+        the text is that of the rewritten html (eg. without the 'Klik op de foto om te vergroten' captions).
+        Memoized if TextSanitizers.memo is set.
+
+        :param html: string
+        :param strip_rewritten: boolean
+        :return: (string (html), string)
+        """
+        if TextSanitizers.memo is not None:
+            name = 'sanitize_rewritten' if strip_rewritten is True else 'sanitize'
+            return TextSanitizers.memo.get(name, html, lambda fragment: TextSanitizers.sanitize_uncached(fragment,
+                                                                                                       strip_rewritten))
+        return TextSanitizers.sanitize_uncached(html, strip_rewritten)
+
+    @staticmethod
+    def sanitize_uncached(html, strip_rewritten=False):
+        """ Rewritten html and its text """
+        rewritten = TextSanitizers.rewrite_html_uncached(html)
+        return rewritten, TextSanitizers.strip_html_uncached(rewritten if strip_rewritten is True else html)
+
     @staticmethod
     def sentence_case(text, strip_spaces=True):
         """ Sentence case refers to titles in which only the first word has a capital letter, the same way a sentence
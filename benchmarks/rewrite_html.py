@@ -0,0 +1,46 @@
+""" Benchmark the caption removal of rewrite_html against the backtracking regex it replaces, on pathological input
+
+    PYTHONPATH=`pwd` python3 benchmarks/rewrite_html.py
+
+    The time per KB should stay flat while the input grows 16 times
+"""
+import re
+import timeit
+from GenericFunctions.TextSanitizers import TextSanitizers
+from benchmarks.strip_html import PAGE
+
+CAPTION = re.compile(r'<(?:(?!<).)*?>Klik op de \S+ om te vergroten.+?>')
+
+# name: (prefix, repeated unit), each aimed at a part of the pattern: the tempered lazy dot, the \S+ word and the
+# lazy tail
+SHAPES = {
+    'page': ('', PAGE),
+    'tags': ('', '<a><x><a><a>'),
+    'open tag': ('<a', ' >'),
+    'long word': ('<a>Klik op de ', 'foto'),
+    'no tail': ('<a', '>Klik op de foto om te vergroten'),
+    'markers': ('<a>>', '>Klik op de Klik op de  >'),
+    'captions': ('a<>Klik op de ', '<a>Klik op de x><'),
+    'lines': ('<', '>Klik op de foto om te vergroten\n'),
+}
+
+
+def regex(html):
+    """ The caption removal remove_captions replaces """
+    return CAPTION.sub('', html)
+
+
+def main(size=16384, number=20):
+    """ Print the time per KB of both for each shape, at 1, 4 and 16 times size """
+    for name, (prefix, unit) in SHAPES.items():
+        for factor in [1, 4, 16]:
+            html = prefix + unit * max(1, size * factor // len(unit))
+            assert regex(html) == TextSanitizers.remove_captions(html)
+            for function in [regex, TextSanitizers.remove_captions]:
+                seconds = timeit.timeit(lambda: function(html), number=number)  # pylint: disable=cell-var-from-loop
+                per_kb = seconds / number / len(html) * 1024 * 1000000
+                print(f'{name:10} {len(html):8} {function.__name__:16} {per_kb:8.2f} us/KB', flush=True)
+
+
+if __name__ == '__main__':
+    main()
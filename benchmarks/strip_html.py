@@ -0,0 +1,33 @@
+""" Benchmark the streaming html to text conversion against BeautifulSoup
+
+    PYTHONPATH=`pwd` python3 benchmarks/strip_html.py
+"""
+import timeit
+from bs4 import BeautifulSoup
+from GenericFunctions.HtmlText import HtmlText
+from unittests.test_html_text import CORPUS
+
+# A typical Iprox text block: paragraphs, links, a list and an image with a caption
+PAGE = ''.join(['<p>De brug wordt vernieuwd. <a href="/publish/pages/1/mock.pdf">Lees meer</a> over de '
+                '<b>werkzaamheden</b> &amp; de omleidingen.</p>',
+                '<ul>', ''.join(f'<li>Fase {i}: werk aan kade {i}</li>' for i in range(10)), '</ul>',
+                '<figure><img src="/publish/pages/1/220px/mock.jpg"><figcaption>Klik op de foto om te vergroten'
+                '</figcaption></figure>'] * 10)
+
+
+def beautiful_soup(html):
+    """ The conversion HtmlText replaces """
+    return BeautifulSoup(html, features='html.parser').get_text(separator='\n\n', strip=True)
+
+
+def main(number=200):
+    """ Print the time per conversion of the corpus and of a typical page """
+    for name, fragments in [('corpus', CORPUS), ('page', [PAGE])]:
+        assert [beautiful_soup(html) for html in fragments] == [HtmlText.get_text(html) for html in fragments]
+        for function in [beautiful_soup, HtmlText.get_text]:
+            seconds = timeit.timeit(lambda: [function(html) for html in fragments], number=number)  # pylint: disable=cell-var-from-loop
+            print(f'{name:8} {function.__name__:16} {seconds / number * 1000:8.3f} ms', flush=True)
+
+
+if __name__ == '__main__':
+    main()
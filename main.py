@@ -1,15 +1,27 @@
 """ This is the main entry point for the Iprox scraper. It will try to scrape the web-pages from
     amsterdam.nl
 """
+import argparse
 import sys
 import os
 import datetime
 from uuid import uuid4
-import requests
 from FetchData.IproxIngestion import IproxIngestion
 from GenericFunctions.AESCipher import AESCipher
+from GenericFunctions.CircuitBreaker import CircuitBreaker
+from GenericFunctions.HttpCache import HttpCache
+from GenericFunctions.HttpClient import HttpClient
+from GenericFunctions.IngestionBuffer import IngestionBuffer
 from GenericFunctions.IsReachable import IsReachable
+from GenericFunctions.JsonCodec import JsonCodec
 from GenericFunctions.Logger import Logger
+from GenericFunctions.NegativeCache import NegativeCache
+from GenericFunctions.ParserPool import ParserPool
+from GenericFunctions.RateLimiter import RateLimiter
+from GenericFunctions.Retry import Retry
+from GenericFunctions.SanitizerMemo import SanitizerMemo
+from GenericFunctions.StateStore import StateStore
+from GenericFunctions.TextSanitizers import TextSanitizers
 
 # Get environment parameters: BACKEND host and port
 aes_secret = os.getenv('AES_SECRET')
@@ -17,8 +29,65 @@ backend_host = os.getenv('TARGET', 'construction-work')
 backend_port = int(os.getenv('TARGET_PORT', '8000'))
 base_path = os.getenv('BASE_PATH', '/api/v1/ingest')
 garbage_collect = bool(os.getenv('GARBAGE_COLLECT', 'true') == 'true')
+http_pool_connections = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+http_pool_maxsize = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+scraper_workers = int(os.getenv('SCRAPER_WORKERS', '1'))
+article_workers = int(os.getenv('ARTICLE_WORKERS', '1'))
+state_dir = os.getenv('STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state'))
+full_scrape = bool(os.getenv('FULL_SCRAPE', 'false') == 'true')
+incremental_scrape = bool(os.getenv('INCREMENTAL_SCRAPE', 'false') == 'true')
+http_cache = bool(os.getenv('HTTP_CACHE', 'true') == 'true')
+http_cache_ttl = int(os.getenv('HTTP_CACHE_TTL', '0'))
+http_cache_max_bytes = int(os.getenv('HTTP_CACHE_MAX_BYTES', '1073741824'))
+http_cache_bypass = bool(os.getenv('HTTP_CACHE_BYPASS', 'false') == 'true')
+rate_limit_rps = float(os.getenv('RATE_LIMIT_RPS', '10'))
+rate_limit_backend_rps = float(os.getenv('RATE_LIMIT_BACKEND_RPS', '50'))
+rate_limit_burst = int(os.getenv('RATE_LIMIT_BURST', '10'))
+rate_limit_concurrency = int(os.getenv('RATE_LIMIT_CONCURRENCY', str(http_pool_maxsize)))
+rate_limit_latency = float(os.getenv('RATE_LIMIT_LATENCY', '2.0'))
+retry_attempts = int(os.getenv('RETRY_ATTEMPTS', '3'))
+retry_base_delay = float(os.getenv('RETRY_BASE_DELAY', '0.5'))
+retry_max_delay = float(os.getenv('RETRY_MAX_DELAY', '10'))
+circuit_failures = int(os.getenv('CIRCUIT_FAILURES', '5'))
+circuit_reset = float(os.getenv('CIRCUIT_RESET', '30'))
+dead_url_interval = int(os.getenv('DEAD_URL_INTERVAL', '3600'))
+dead_url_max_interval = int(os.getenv('DEAD_URL_MAX_INTERVAL', '604800'))
+ingest_batch_size = int(os.getenv('INGEST_BATCH_SIZE', '1'))
+ingest_batch_bytes = int(os.getenv('INGEST_BATCH_BYTES', '1048576'))
+ingest_max_pending = int(os.getenv('INGEST_MAX_PENDING', '100'))
+sanitizer_cache_size = int(os.getenv('SANITIZER_CACHE_SIZE', '10000'))
+sanitizer_cache_persist = bool(os.getenv('SANITIZER_CACHE_PERSIST', 'true') == 'true')
+parser_workers = int(os.getenv('PARSER_WORKERS', '0'))
+parser_chunk_size = int(os.getenv('PARSER_CHUNK_SIZE', '1'))
 logger = Logger()
 
+# Shared keep-alive connection pools for all Iprox and backend calls, Iprox pages are cached in STATE_DIR
+cache = None
+if http_cache is True:
+    cache = HttpCache(os.path.join(state_dir, 'http_cache'), ttl=http_cache_ttl, max_bytes=http_cache_max_bytes)
+
+# Per-host rate limits (the backend has its own request rate), concurrency adapts to 429/5xx/timeouts and latency
+limiter = RateLimiter(rate=rate_limit_rps,
+                      burst=rate_limit_burst,
+                      concurrency=rate_limit_concurrency,
+                      latency=rate_limit_latency,
+                      hosts={backend_host: {'rate': rate_limit_backend_rps}})
+
+# Idempotent requests are retried, a host that keeps failing is not asked again for a while (fail fast)
+client = HttpClient(pool_connections=http_pool_connections,
+                    pool_maxsize=http_pool_maxsize,
+                    cache=cache,
+                    limiter=limiter,
+                    retry=Retry(attempts=retry_attempts, base_delay=retry_base_delay, max_delay=retry_max_delay),
+                    breaker=CircuitBreaker(failures=circuit_failures, reset_timeout=circuit_reset))
+
+# Sanitized html fragments are memoized, and kept in STATE_DIR between runs
+if sanitizer_cache_size > 0:
+    sanitizer_cache_path = os.path.join(state_dir, 'sanitizer.sqlite') if sanitizer_cache_persist is True else None
+    TextSanitizers.memo = SanitizerMemo(max_entries=sanitizer_cache_size,
+                                        path=sanitizer_cache_path,
+                                        version=TextSanitizers.version())
+
 # Set header
 token = AESCipher(str(uuid4()), aes_secret).encrypt()
 headers = {'Accept': 'application/json', 'IngestAuthorization': token}
@@ -34,7 +103,7 @@ def garbage_collector(project_type, scraper_started):
 
     # Setup UserAuthorization Header
     url = 'http://{host}:{port}/api/v1/ingest/garbagecollector'.format(host=backend_host, port=backend_port)
-    response = requests.get(
+    response = client.get(
         url,
         headers=headers,
         params={'project_type': project_type, 'date': scraper_started},
@@ -46,13 +115,22 @@ def garbage_collector(project_type, scraper_started):
         return {}
 
     # Return scraper result
-    data = response.json()
+    data = JsonCodec.loads(response.content)
     return data['result']
 
 
 def main():
     """ Main entry point for the scraper
     """
+    parser = argparse.ArgumentParser(description='Iprox scraper')
+    parser.add_argument('--full', action='store_true', default=full_scrape,
+                        help='scrape and ingest all projects, also those not modified since the last run')
+    parser.add_argument('--reload', action='store_true', default=http_cache_bypass,
+                        help='fetch all Iprox pages again instead of serving them from the local cache')
+    args = parser.parse_args()
+    if cache is not None:
+        cache.bypass = args.reload
+
     # Check if API-server is alive
     if not IsReachable(backend_host=backend_host, backend_port=backend_port).check():
         print('API-server unreachable: Iprox scraper aborted', flush=True)
@@ -61,19 +139,49 @@ def main():
     # Set data/time stamp when scraper started, used for garbage collection
     scraper_started = str(datetime.datetime.now())
 
+    # Parse project and article pages in worker processes, started before any network threads (0: parse in the threads)
+    parser_pool = None
+    if parser_workers > 0:
+        parser_pool = ParserPool(workers=parser_workers, chunk_size=parser_chunk_size)
+
+    # Post projects, project details and articles in batches (a batch size of 1 posts every payload on its own)
+    buffer = None
+    if ingest_batch_size > 1:
+        buffer = IngestionBuffer(client,
+                                 headers=headers,
+                                 batch_size=ingest_batch_size,
+                                 batch_bytes=ingest_batch_bytes,
+                                 max_pending=ingest_max_pending)
+
     # Initialize scraper
     iprox_ingestion = IproxIngestion(
         backend_host=backend_host,
         backend_port=backend_port,
         base_path=base_path,
-        headers=headers
+        headers=headers,
+        client=client,
+        workers=scraper_workers,
+        article_workers=article_workers,
+        state_store=StateStore(os.path.join(state_dir, 'state.sqlite')),
+        full=args.full,
+        buffer=buffer,
+        negative_cache=NegativeCache(os.path.join(state_dir, 'dead_urls.sqlite'),
+                                     base_interval=dead_url_interval,
+                                     max_interval=dead_url_max_interval),
+        parser_pool=parser_pool,
+        incremental=incremental_scrape
     )
 
     for project_type in ['test_pages', 'stadsloket', 'projects']:
         scraper_report = iprox_ingestion.start(project_type)
 
-        # Call Garbage collector
-        if garbage_collect is True:
+        # Call Garbage collector. Projects that were skipped or unchanged are 'seen' by the backend once their
+        # last_seen time is refreshed, if that failed the garbage collector would remove them
+        seen = scraper_report['projects'].get('seen', {}).get('status', True)
+        if garbage_collect is True and seen is False:
+            logger.error(f'garbage collector skipped for {project_type}: refreshing last_seen of the projects that '
+                         f'were not posted failed (does {base_path}/projects/seen exist?)')
+        elif garbage_collect is True:
             scraper_report['garbage_collector'] = garbage_collector(project_type, scraper_started)
 
         # TO IMPLEMENT...
@@ -81,6 +189,15 @@ def main():
         #     # Send scraper report to backend for processing
         #     print(json.dumps(scraper_report, indent=2))
 
+    if buffer is not None:
+        buffer.close()
+
+    if parser_pool is not None:
+        parser_pool.close()
+
+    if TextSanitizers.memo is not None:
+        TextSanitizers.memo.close()
+
 
 
 if __name__ == '__main__':
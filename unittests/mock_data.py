@@ -287,6 +287,23 @@ class TestData:
             {'Koppeling': [{'Nam': 'Titel', 'Wrd': 'Nieuws'},{'Nam': 'Link', 'Wrd': 'Meer nieuws', 'link': {'pagetype': 'index', 'Url': 'https://mock_nieuws/'}},{'Nam': 'App categorie', 'SelWrd': 'Nieuws', 'SelAka': 'news','item': {'SelItmIdt': '7058', 'Wrd': 'Nieuws', 'Aka': 'news'}}]}
         ]
 
+        # Iprox nodes of a page that take the less common paths of IproxProject.parse_page()
+        self.iprox_project_detail_extended = [
+            {'Kenmerken': {'Nam': 'Kenmerk', 'Wrd': 'Zuid', 'Src': 'Stadsdeel', 'SelWrd': 'Zuid', 'item': {'SelItmIdt': '5399', 'Wrd': 'Zuid'}}},
+            {'Kenmerken': {'Nam': 'Kenmerk', 'Wrd': 'Brug', 'Src': 'Thema', 'SelWrd': 'Brug', 'item': {'SelItmIdt': '6000', 'Wrd': 'Brug'}}},
+            {'Omschrijving': [{'Nam': 'Titel', 'Wrd': 'Zonder categorie'}, {'Nam': 'Tekst', 'Txt': '<div>bogus</div>'}]},
+            {'Omschrijving': [{'Nam': 'Titel', 'Wrd': 'Leeg'}, {'Nam': 'App categorie', 'SelAka': 'what'}]},
+            {'Omschrijving': [{'Nam': 'Titel', 'Wrd': 'Eerste titel'}, {'Nam': 'Titel', 'Wrd': 'Waar'}, {'Nam': 'Tekst', 'Txt': '<p>eerste</p>'}, {'Nam': 'Tekst', 'Txt': '<p>Op de <b>brug</b></p>'}, {'Nam': 'App categorie', 'SelAka': 'what'}, {'Nam': 'App categorie', 'SelAka': 'where'}]},
+            {'Omschrijving': [{'Nam': 'Titel', 'Wrd': 'Nieuw'}, {'Nam': 'Tekst', 'Txt': '<div>nieuwe categorie</div>'}, {'Nam': 'App categorie', 'SelAka': 'bereikbaarheid'}]},
+            {'Titel': 'Alleen een titel'},
+            {'Titel': [{'Nam': 'Titel', 'Wrd': 'Wanneer'}, {'Nam': 'Toelichting', 'Txt': '<div>Eind 2022</div>'}, {'Nam': 'App categorie', 'SelAka': 'when'}]},
+            {'Coordinaten': [{'Nam': 'Coordinaten', 'Txt': {'geo': {'json': [{'type': 'EPSG:4326', '_': '{"type":"FeatureCollection","features":[{"geometry":{"coordinates":[4.9,52.3]}}]}'}]}}}, {'Nam': 'Anders', 'Txt': {}}]},
+            {'Contact': [{'Nam': 'Naam', 'Wrd': 'Mock'}, {'Nam': 'Functie', 'Wrd': 'Omgevingsmanager'}, {'Nam': 'E-mail', 'Src': 'mock@amsterdam.nl'}, {'Nam': 'Telefoon', 'Wrd': '14020'}, {'Nam': 'Adres', 'Wrd': 'Amstel 1'}]},
+            {'Contact': {'Nam': 'Naam', 'Wrd': 'Alleen naam'}},
+            {'Koppeling': [{'Nam': 'App categorie', 'SelAka': 'when-timeline'}, {'Nam': 'App categorie', 'SelAka': 'work'}, {'Nam': 'Link', 'link': {'Url': 'https://mock_oud/'}}, {'Nam': 'Link', 'link': {'Url': 'https://mock_tijdlijn/'}}]},
+            {'Koppeling': [{'Nam': 'App categorie', 'SelAka': 'news'}]}
+        ]
+
         self.iprox_project_details = {
             'identifier': 'identifier',
             'body': {'contact': [{'title': 'Contact', 'html': '<div>mock</div', 'text': 'mock</div'}],
@@ -318,6 +335,27 @@ class TestData:
             'rel_url': 'mock/mock', 'url': 'https://mock/mock/mock/'
         }
 
+        self.iprox_project_details_extended = {
+            'identifier': 'identifier',
+            'body': {'contact': [],
+                     'what': [],
+                     'when': [{'title': 'Wanneer', 'html': '<div>Eind 2022</div>', 'text': 'Eind 2022'}],
+                     'where': [{'title': 'Waar', 'html': '<p>Op de <b>brug</b></p>', 'text': 'Op de\n\nbrug'}],
+                     'work': [],
+                     'more-info': [],
+                     'timeline': {},
+                     'bereikbaarheid': [{'title': 'Nieuw', 'html': '<div>nieuwe categorie</div>', 'text': 'nieuwe categorie'}]},
+            'coordinates': {'lon': 4.9, 'lat': 52.3},
+            'contacts': [{'name': 'Mock', 'position': 'Omgevingsmanager', 'email': 'mock@amsterdam.nl', 'phone': '14020', 'address': 'Amstel 1'},
+                         {'name': 'Alleen naam', 'position': None, 'email': None, 'phone': None, 'address': None}],
+            'district_id': 5399, 'district_name': 'Zuid',
+            'images': [],
+            'news': [],
+            'page_id': -1,
+            'title': '', 'subtitle': '',
+            'rel_url': '', 'url': ''
+        }
+
         self.iprox_projects = [{
             "category": "Mock",
             "itmidt": '000000-projects',
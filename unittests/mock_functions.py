@@ -1,9 +1,18 @@
 """ Mock functions """
+import json
 import threading
 from queue import Queue
 from unittests.mock_data import TestData
 
 
+class JsonContent:  # pylint: disable=too-few-public-methods
+    """ Mock response body: the json of a mock response as bytes """
+    @property
+    def content(self):
+        """ Mock content """
+        return json.dumps(self.json()).encode()
+
+
 def mocked_socket_connect_ok(*args):
     """ Mock socket connect ok """
     return
@@ -16,7 +25,7 @@ def mocked_socket_connect_fail(*args):
 
 def mocked_requests_post(*args, **kwargs):
     """ Mock post request """
-    class MockResponse:
+    class MockResponse(JsonContent):
         """ Mock response """
         def __init__(self, status_code, text=None, json_data=None):
             self.status_code = status_code
@@ -34,7 +43,7 @@ def mocked_requests_post(*args, **kwargs):
             return self.json_data
 
     if kwargs['headers']['test'] == 'test_fetch_image':
-        data = kwargs['json']
+        data = json.loads(kwargs['data']) if 'data' in kwargs else kwargs['json']
         if data.get('filename', None) == 'mock0.jpg':
             return MockResponse(200, json_data={'status': True, 'result': True})
         if data.get('filename', None) == 'fail_saving.jpg':
@@ -58,7 +67,7 @@ def mocked_requests_post(*args, **kwargs):
 
 def mocked_requests_get(*args, **kwargs):
     """ Mock request """
-    class MockResponse:
+    class MockResponse(JsonContent):
         """ Mock response """
         def __init__(self, status_code, json_data=None):
             self.status_code = status_code
@@ -141,7 +150,7 @@ class MockThread(threading.Thread):
 
 def iprox_stadsloketten_valid(*args, **kwargs):
     """ Mock request """
-    class Response:
+    class Response(JsonContent):
         """ Mock response """
         def __init__(self, *args, **kwargs):
             self.test_data = TestData()
@@ -154,7 +163,7 @@ def iprox_stadsloketten_valid(*args, **kwargs):
 
 def iprox_stadsloketten_invalid(*args, **kwargs):
     """ Mock request """
-    class Response:
+    class Response(JsonContent):
         """ Mock response """
         def __init__(self, *args, **kwargs):
             self.test_data = TestData()
@@ -167,7 +176,7 @@ def iprox_stadsloketten_invalid(*args, **kwargs):
 
 def iprox_stadsloketten_exception(*args, **kwargs):
     """ Mock request """
-    class Response:
+    class Response(JsonContent):
         """ Mock response """
         def __init__(self, *args, **kwargs):
             self.test_data = TestData()
@@ -180,7 +189,7 @@ def iprox_stadsloketten_exception(*args, **kwargs):
 
 def iprox_stadsloketten_ingest_fail(*args, **kwargs):
     """ Mock request """
-    class Response:
+    class Response(JsonContent):
         """ Mock reponse """
         def __init__(self, *args, **kwargs):
             self.test_data = TestData()
@@ -193,7 +202,7 @@ def iprox_stadsloketten_ingest_fail(*args, **kwargs):
 
 def iprox_stadsloket_valid(*args, **kwargs):
     """ Mock request """
-    class Response:
+    class Response(JsonContent):
         """ Mock response """
         def __init__(self, *args, **kwargs):
             self.test_data = TestData()
@@ -206,7 +215,7 @@ def iprox_stadsloket_valid(*args, **kwargs):
 
 def iprox_stadsloket_invalid(*args, **kwargs):
     """ Mock request """
-    class Response:
+    class Response(JsonContent):
         """ Mock response """
         def __init__(self, *args, **kwargs):
             self.test_data = TestData()
@@ -219,7 +228,7 @@ def iprox_stadsloket_invalid(*args, **kwargs):
 
 def iprox_stadsloket_exception(*args, **kwargs):
     """ Mock request """
-    class Response:
+    class Response(JsonContent):
         """ Mock response """
         def __init__(self, *args, **kwargs):
             self.test_data = TestData()
@@ -232,7 +241,7 @@ def iprox_stadsloket_exception(*args, **kwargs):
 
 def iprox_stadsloket_scraper(url, **kwargs):
     """ Mock request """
-    class Response:
+    class Response(JsonContent):
         """ Mock response """
         def __init__(self, url, **kwargs):
             self.url = url
@@ -259,3 +268,67 @@ def iprox_filter(*args, **kwargs):
     """ Mock filter """
     mock_data = TestData()
     return mock_data.iprox_project_detail
+
+
+class MockIngestionClient:
+    """ Mock HttpClient for the construction-work backend ingestion routes """
+    class Response:
+        """ Mock response """
+        def __init__(self, status_code, text):
+            self.status_code = status_code
+            self.text = text
+            self.content = text.encode()
+
+    def __init__(self, existing=(), failing=(), bulk=False):
+        self.existing = set(existing)
+        self.failing = set(failing)
+        self.bulk = bulk
+        self.cache = None
+        self.lock = threading.Lock()
+        self.posted = []
+        self.seen = []
+        self.gets = []
+
+    @staticmethod
+    def stats():
+        """ Mock stats """
+        return {'coalesced': 0}
+
+    def get(self, url, **kwargs):
+        """ Mock get: answer the (bulk) existence lookup of a project """
+        params = kwargs.get('params', {})
+        with self.lock:
+            self.gets.append(params)
+        if self.bulk is True and 'page' in params:
+            page, page_size = params['page'], params['page_size']
+            known = sorted(self.existing)[(page - 1) * page_size:page * page_size]
+            result = [{'identifier': identifier, 'modification_date': '1970-01-01'} for identifier in known]
+            return self.Response(200, json.dumps({'status': True, 'result': result}))
+        identifier = params.get('identifier')
+        if identifier in self.existing:
+            return self.Response(200, '{"status": true, "result": {"identifier": "%s"}}' % identifier)
+        return self.Response(200, '{"status": true, "result": null}')
+
+    def post(self, url, **kwargs):
+        """ Mock post: fail on the project-details route for failing identifiers (payloads are posted as json bytes),
+            projects posted to the seen route are kept apart
+        """
+        payload = json.loads(kwargs['data']) if 'data' in kwargs else kwargs.get('json', {})
+        if url.endswith('/projects/seen'):
+            with self.lock:
+                self.seen.extend(payload['identifiers'])
+            return self.Response(200, '{"status": true, "result": true}')
+        identifier = payload.get('identifier')
+        with self.lock:
+            self.posted.append((url, identifier))
+        if url.endswith('/project') and identifier in self.failing:
+            raise Exception('Mock exception')  # pylint: disable=broad-exception-raised
+        return self.Response(200, '{"status": true, "result": true}')
+
+
+def iprox_project_details(item, project_type):
+    """ Mock IproxIngestion.get_set_project_details """
+    details = TestData().iprox_project_details
+    details['identifier'] = item['identifier']
+    details['project_type'] = project_type
+    return details
@@ -22,3 +22,12 @@ class Unittests(unittest.TestCase):
         result = hashing.make_sha1_hash(data)
 
         assert len(result) == 40
+
+    @staticmethod
+    def test_make_json_hash():
+        """ Test canonical json hash does not depend on key order """
+        hashing = Hashing()
+        result = hashing.make_json_hash({'a': 1, 'b': [1, 'ë']})
+
+        assert result == hashing.make_json_hash({'b': [1, 'ë'], 'a': 1})
+        assert result != hashing.make_json_hash({'a': 1, 'b': [1, 'e']})
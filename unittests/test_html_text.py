@@ -0,0 +1,59 @@
+""" UNITTESTS """
+import unittest
+from bs4 import BeautifulSoup
+from GenericFunctions.HtmlText import HtmlText
+from GenericFunctions.TextSanitizers import TextSanitizers
+
+# Fragments as found in Iprox pages, plus the html.parser corner cases BeautifulSoup has its own rules for
+CORPUS = [
+    '',
+    'plain text',
+    '<div>mock</div>',
+    '<div>mock</div',
+    '<p>Op de <b>brug</b> komt een <a href="/publish/pages/1/mock.pdf">fietspad</a>.</p>',
+    '<ul><li>  een </li><li>\n\ttwee\n</li><li> </li></ul>',
+    '<p>regel<br>regel<br/>regel</br>regel</p>',
+    '<figure><img src="/publish/pages/1/220px/mock.jpg" alt="mock"><figcaption>Klik op de foto om te vergroten'
+    '</figcaption></figure>',
+    '<p>caf&eacute; &amp; bar&nbsp;&lt;3 &eacute &copy2022 &foo; &#65;&#x42;&#128;&#0; &#xD800; &#1114112; &#x</p>',
+    '<script>var a = "<p>not text</p>";</script>tekst<style>p { color: red; }</style>',
+    '<template><p>hidden</p></template>visible',
+    '<ruby>Amsterdam<rp>(</rp><rt>A\'dam</rt><rp>)</rp></ruby>',
+    '<p><rt>ruby text</p>normal again',
+    '<!DOCTYPE html><!-- comment --><?php echo 1; ?><![CDATA[ cdata ]]><!weird>text',
+    'a < b > c & d',
+    '<table><tr><td>1</td><td>2</td></tr></table>',
+    '<div class="a>b">attribute with a &gt;</div>',
+    '<P>HOOFDLETTERS</P>',
+    '<p>niet gesloten <b>vet <i>cursief',
+    'tekst <p',
+    '<div>   unicode spaties 　</div>',
+]
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_equivalence():
+        """ Test the streaming text equals BeautifulSoup's get_text(separator, strip=True) for the corpus """
+        for html in CORPUS:
+            expected = BeautifulSoup(html, features='html.parser').get_text(separator='\n\n', strip=True)
+            assert HtmlText.get_text(html, separator='\n\n') == expected, html
+
+    @staticmethod
+    def test_get_text():
+        """ Test strings are split on tags, stripped and joined """
+        assert HtmlText.get_text('<p>Op de <b>brug</b></p><script>x</script>') == 'Op de\n\nbrug'
+        assert HtmlText.get_text('a<br>b</br>c', separator='|') == 'a|bc'
+        assert TextSanitizers.strip_html('<p>Zie ook.Zie ook</p>') == 'Zie ook. Zie ook: '
+
+    @staticmethod
+    def test_sanitize():
+        """ Test sanitize gives the rewritten html and the text in one go """
+        for html in CORPUS:
+            assert TextSanitizers.sanitize(html) == (TextSanitizers.rewrite_html(html), TextSanitizers.strip_html(html))
+
+        html = '<p>tekst</p><figure><figcaption>Klik op de foto om te vergroten</figcaption></figure>'
+        rewritten = '<p>tekst</p><figure></figure>'
+        assert TextSanitizers.sanitize(html) == (rewritten, 'tekst\n\nKlik op de foto om te vergroten')
+        assert TextSanitizers.sanitize(html, strip_rewritten=True) == (rewritten, 'tekst')
@@ -0,0 +1,138 @@
+""" UNITTESTS """
+import json
+import os
+import tempfile
+import threading
+import unittest
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from unittests.mock_functions import mocked_requests_get
+from GenericFunctions.HttpCache import HttpCache
+from GenericFunctions.HttpClient import HttpClient
+
+
+class MockIprox:
+    """ Local stand-in for the Iprox site: answers with an ETag and a 304 when the If-None-Match matches """
+    def __init__(self):
+        self.body = json.dumps({'item': {'page': {'pagetype': 'mock', 'text': 'x' * 1000}}}).encode()
+        self.etag = '"v1"'
+        self.requests = []
+        iprox = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """ Conditional GET handler """
+            def do_GET(self):  # pylint: disable=invalid-name
+                """ Mock page """
+                iprox.requests.append(self.headers.get('If-None-Match'))
+                if self.headers.get('If-None-Match') == iprox.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', iprox.etag)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(iprox.body)))
+                self.end_headers()
+                self.wfile.write(iprox.body)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                """ Keep the test output clean """
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.root = f'http://127.0.0.1:{self.server.server_port}'
+        self.url = f'{self.root}/@1/page/?AppIdt=app-pagetype&reload=true'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        """ Stop the server """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_conditional_get():
+        """ Test a 304 is served from the local copy and counted as a hit """
+        iprox = MockIprox()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = HttpClient(cache=HttpCache(cache_dir, hosts=['127.0.0.1']))
+            first = client.get(iprox.url, timeout=10)
+            second = client.get(iprox.url, timeout=10)
+
+            # Changed page: full download and the new copy is stored
+            iprox.etag = '"v2"'
+            iprox.body = json.dumps({'item': {'page': {'pagetype': 'changed'}}}).encode()
+            third = client.get(iprox.url, timeout=10)
+            fourth = HttpClient(cache=HttpCache(cache_dir, hosts=['127.0.0.1'])).get(iprox.url, timeout=10)
+            stats = client.cache.stats()
+        iprox.close()
+
+        assert iprox.requests == [None, '"v1"', '"v1"', '"v2"']
+        assert first.json() == second.json()
+        assert second.status_code == 200
+        assert second.headers['Content-Type'] == 'application/json'
+        assert third.json() == fourth.json() == {'item': {'page': {'pagetype': 'changed'}}}
+        assert stats == {'fresh': 0, 'hits': 1, 'misses': 2, 'evicted': 0, 'bytes_saved': len(first.content)}
+
+    @staticmethod
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_uncached_hosts(_mocked_requests_get):
+        """ Test urls on other hosts (eg. the backend) are not cached """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = HttpClient(cache=HttpCache(cache_dir))
+            client.get('http://api-server:8000/api/v1/ingest/image', timeout=10)
+
+            _mocked_requests_get.assert_called_with('http://api-server:8000/api/v1/ingest/image', timeout=10)
+            assert client.cache.stats()['misses'] == 0
+
+    @staticmethod
+    def test_ttl_and_bypass():
+        """ Test pages within the ttl are served without a request, bypass always fetches the page """
+        iprox = MockIprox()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = HttpCache(cache_dir, hosts=['127.0.0.1'], ttl=3600)
+            client = HttpClient(cache=cache)
+            client.get(iprox.url, timeout=10)
+            fresh = client.get(f'{iprox.root.upper()}/@1/page/?reload=true&AppIdt=app-pagetype', timeout=10)
+            cache.bypass = True
+            client.get(iprox.url, timeout=10)
+            stats = cache.stats()
+        iprox.close()
+
+        assert iprox.requests == [None, None]
+        assert fresh.json()['item']['page']['pagetype'] == 'mock'
+        assert stats['fresh'] == 1
+        assert stats['misses'] == 2
+
+    @staticmethod
+    def test_content_addressed_lru():
+        """ Test equal bodies share one compressed blob and the least recently used pages are evicted """
+        iprox = MockIprox()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = HttpCache(cache_dir, hosts=['127.0.0.1'])
+            client = HttpClient(cache=cache)
+            for i in range(3):
+                client.get(f'{iprox.root}/@{i}/page/', timeout=10)
+            blobs = os.listdir(os.path.join(cache_dir, 'blobs'))
+            assert len(blobs) == 1
+            assert os.path.getsize(os.path.join(cache_dir, 'blobs', blobs[0])) < len(iprox.body)
+
+        # A different body for each page, only the two most recently used pages fit
+        with tempfile.TemporaryDirectory() as cache_dir:
+            bodies = [json.dumps({'item': {'page': {'text': str(i) * 1000}}}).encode() for i in range(3)]
+            cache = HttpCache(cache_dir, hosts=['127.0.0.1'],
+                              max_bytes=max(len(zlib.compress(body)) for body in bodies) * 2)
+            client = HttpClient(cache=cache)
+            for i, body in enumerate(bodies):
+                iprox.body, iprox.etag = body, f'"{i}"'
+                client.get(f'{iprox.root}/@{i}/page/', timeout=10)
+            blobs = os.listdir(os.path.join(cache_dir, 'blobs'))
+            urls = [row[0] for row in cache.connection.execute('SELECT url FROM entries ORDER BY url')]
+            stats = cache.stats()
+        iprox.close()
+
+        assert len(blobs) == 2
+        assert urls == [f'{iprox.root}/@1/page/', f'{iprox.root}/@2/page/']
+        assert stats['evicted'] == 1
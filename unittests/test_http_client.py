@@ -0,0 +1,60 @@
+""" UNITTESTS """
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from unittests.mock_functions import mocked_requests_get
+from GenericFunctions.HttpClient import HttpClient
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_pool_sizes():
+        """ Test pooled adapters are mounted with the configured sizes """
+        client = HttpClient(pool_connections=3, pool_maxsize=7)
+        for prefix in ['http://', 'https://']:
+            adapter = client.session.get_adapter(prefix + 'www.amsterdam.nl')
+            assert adapter._pool_connections == 3
+            assert adapter._pool_maxsize == 7
+
+    @staticmethod
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_get_uses_session(_mocked_requests_get):
+        """ Test all calls on the same client share one session """
+        client = HttpClient()
+        client.get('valid_url', timeout=10)
+        client.get('invalid_url', timeout=10)
+
+        assert _mocked_requests_get.call_count == 2
+        _mocked_requests_get.assert_called_with('invalid_url', timeout=10)
+
+    @staticmethod
+    def test_coalesce_concurrent_gets():
+        """ Test concurrent GETs of the same url share one request """
+        release = threading.Event()
+        client = HttpClient()
+
+        def slow_get(url, **kwargs):
+            release.wait(timeout=5)
+            return mocked_requests_get(url, **kwargs)
+
+        responses = []
+        with patch('requests.Session.get', side_effect=slow_get) as _mocked_requests_get:
+            threads = [threading.Thread(target=lambda: responses.append(client.get('valid_url', timeout=10)))
+                       for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for _ in range(500):
+                if client.stats()['coalesced'] == 4:
+                    break
+                time.sleep(0.01)
+            release.set()
+            for thread in threads:
+                thread.join()
+            client.get('valid_url', timeout=10)
+
+        assert _mocked_requests_get.call_count == 2
+        assert client.stats() == {'coalesced': 4}
+        assert len(responses) == 5
+        assert all(response is responses[0] for response in responses)
@@ -0,0 +1,145 @@
+""" UNITTESTS """
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from unittests.mock_functions import iprox_project_details
+from FetchData.IproxIngestion import IproxIngestion
+from FetchData.IproxProjects import IproxProjects
+from GenericFunctions.HttpClient import HttpClient
+from GenericFunctions.IngestionBuffer import IngestionBuffer
+from GenericFunctions.JsonCodec import JsonCodec
+from GenericFunctions.Logger import Logger
+
+
+class MockBackend:
+    """ Local stand-in for the construction-work backend: records each batch and fails chosen identifiers """
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.batches = []
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """ Answer batch posts with one result per payload and existence lookups with 'not found' """
+            def do_POST(self):  # pylint: disable=invalid-name
+                """ Mock batch route """
+                payloads = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                backend.batches.append((self.path, [payload['identifier'] for payload in payloads]))
+                result = [{'status': payload['identifier'] not in backend.failing, 'result': payload['identifier']}
+                          for payload in payloads]
+                self.reply({'status': True, 'result': result})
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """ Mock project lookup """
+                self.reply({'status': True, 'result': [] if 'page=' in self.path else None})
+
+            def reply(self, data):
+                """ Send a json response """
+                body = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                """ Keep the test output clean """
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        """ Stop the server """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_batch_size():
+        """ Test payloads are posted in batches of batch_size and each callback gets its own result """
+        backend = MockBackend(failing=['3'])
+        buffer = IngestionBuffer(HttpClient(), headers={}, batch_size=4, linger=10)
+        results = {}
+        for i in range(10):
+            buffer.add(f'{backend.url}/project', {'identifier': str(i)},
+                       lambda success, result, i=i: results.update({str(i): (success, result)}))
+        buffer.close()
+        backend.close()
+
+        assert backend.batches == [('/project/batch', ['0', '1', '2', '3']),
+                                   ('/project/batch', ['4', '5', '6', '7']),
+                                   ('/project/batch', ['8', '9'])]
+        assert results['3'] == (False, '3')
+        assert results['9'] == (True, '9')
+        assert len(results) == 10
+
+    @staticmethod
+    def test_batch_bytes():
+        """ Test a batch is split when it would exceed batch_bytes """
+        backend = MockBackend()
+        payload_bytes = len(JsonCodec.dumps({'identifier': '0', 'body': 'x' * 100}))
+        buffer = IngestionBuffer(HttpClient(), headers={}, batch_size=100, batch_bytes=payload_bytes * 2, linger=10)
+        for i in range(5):
+            buffer.add(f'{backend.url}/article', {'identifier': str(i), 'body': 'x' * 100}, lambda *args: None)
+        buffer.flush()
+        buffer.close()
+        backend.close()
+
+        assert [len(batch[1]) for batch in backend.batches] == [2, 2, 1]
+
+    @staticmethod
+    def test_routes_in_order():
+        """ Test payloads of different routes in one flush are posted per route in first-seen order """
+        backend = MockBackend()
+        buffer = IngestionBuffer(HttpClient(), headers={}, batch_size=10, linger=10)
+        for i in range(2):
+            buffer.add(f'{backend.url}/projects', {'identifier': str(i)}, lambda *args: None)
+            buffer.add(f'{backend.url}/project', {'identifier': str(i)}, lambda *args: None)
+        buffer.flush()
+        backend.close()
+
+        assert backend.batches == [('/projects/batch', ['0', '1']), ('/project/batch', ['0', '1'])]
+
+    @staticmethod
+    @patch.object(Logger, 'error')
+    def test_backend_down(_error):
+        """ Test every callback of a batch reports a failure when the backend can not be reached """
+        backend = MockBackend()
+        backend.close()
+        buffer = IngestionBuffer(HttpClient(), headers={}, batch_size=10, linger=10)
+        results = []
+        for i in range(3):
+            buffer.add(f'{backend.url}/project', {'identifier': str(i)},
+                       lambda success, result: results.append(success))
+        buffer.close()
+
+        assert results == [False, False, False]
+
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(Logger, 'error')
+    @patch.object(IproxIngestion, 'get_set_project_details', side_effect=iprox_project_details)
+    @patch.object(IproxProjects, 'get_data')
+    def test_get_set_projects_buffered(_get_data, _details, _error, _print):
+        """ Test projects and project details are posted in batches and counted per project """
+        backend = MockBackend(failing=['2'])
+        host, port = backend.url[len('http://'):].split(':')
+        buffer = IngestionBuffer(HttpClient(), headers={}, batch_size=3, linger=10)
+        iprox_ingestion = IproxIngestion(backend_host=host, backend_port=port, headers={}, client=HttpClient(),
+                                         workers=1, buffer=buffer)
+        listing = [{'identifier': str(i), 'title': f'mock {i}', 'project_type': 'projects'} for i in range(6)]
+        with patch.object(IproxProjects, 'parse_data', autospec=True,
+                          side_effect=lambda self: self.parsed_data.extend(listing)):
+            report = iprox_ingestion.get_set_projects('projects')
+        buffer.close()
+        backend.close()
+
+        assert report['new'] == 5
+        assert report['failed'] == 1
+        assert '2' not in iprox_ingestion.scraper_report
+        assert all(len(batch[1]) <= 3 for batch in backend.batches)
+        assert {batch[0] for batch in backend.batches} == {'/api/v1/ingest/projects/batch',
+                                                         '/api/v1/ingest/project/batch'}
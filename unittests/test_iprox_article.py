@@ -0,0 +1,188 @@
+""" UNITTESTS """
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from unittests.mock_functions import MockIngestionClient
+from FetchData.IproxArticle import IproxArticle
+from FetchData.IproxProject import IproxProject
+from GenericFunctions.Logger import Logger
+from GenericFunctions.NegativeCache import NegativeCache
+from GenericFunctions.PageStore import PageStore
+
+
+def scraped_article(article):
+    """ Mock IproxArticle.scraper """
+    if article['identifier'] == 'broken':
+        raise Exception('Mock exception')  # pylint: disable=broad-exception-raised
+    article_data = IproxArticle.skeleton()
+    article_data['identifier'] = article['identifier']
+    article_data['project_identifier'] = article['project_identifier']
+    article_data['title'] = article['identifier']
+    return article_data
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(Logger, 'error')
+    @patch.object(IproxArticle, 'scraper', side_effect=scraped_article)
+    def test_run_workers(_scraper, _error, _print):
+        """ Test a pool of workers drains the queue and reports every article on its project """
+        iprox_article = IproxArticle(headers={}, client=MockIngestionClient(), workers=4)
+        scraper_report = {str(i): {'news': []} for i in range(3)}
+        for i in range(30):
+            article = {'identifier': f'article-{i}', 'project_identifier': str(i % 3), 'project_title': '',
+                       'url': '', 'type': 'news'}
+            iprox_article.queue.put({'article': article, 'project_type': 'projects'})
+        iprox_article.queue.put({'article': {'identifier': 'broken', 'url': 'broken'}, 'project_type': 'projects'})
+
+        iprox_article.run(scraper_report=scraper_report)
+
+        assert iprox_article.queue.empty()
+        assert _scraper.call_count == 31
+        assert [len(scraper_report[str(i)]['news']) for i in range(3)] == [10, 10, 10]
+        assert all(item['ingestion'] == 'successful' for i in range(3) for item in scraper_report[str(i)]['news'])
+        _error.assert_called_once_with('failed scraping article broken: Mock exception')
+
+    @staticmethod
+    def test_get_set_asset():
+        """ Test an asset is downloaded from Iprox and posted to the backend asset route """
+        client = MagicMock()
+        client.get.side_effect = [MagicMock(status_code=200, content=b'{"status": false, "result": null}'),
+                                  MagicMock(status_code=200, content=b'%PDF')]
+        client.post.return_value.status_code = 200
+        iprox_article = IproxArticle(headers={}, client=client)
+        iprox_article.get_set_asset('0000', 'application/pdf', 'https://www.amsterdam.nl/mock.pdf')
+
+        assert client.get.call_args_list[1][0][0] == 'https://www.amsterdam.nl/mock.pdf'
+        assert client.post.call_args[0][0] == 'http://api-server:8000/api/v1/ingest/asset'
+        payload = json.loads(client.post.call_args[1]['data'])
+        assert payload['url'] == 'https://www.amsterdam.nl/mock.pdf'
+        assert payload['data'] == 'JVBERg=='
+
+    @staticmethod
+    def test_discovered_page_is_reused():
+        """ Test the article page fetched during discovery is handed to the article scraper without a new download """
+        page_store = PageStore()
+        project_client = MagicMock()
+        project_client.get.return_value.status_code = 200
+        project_client.get.return_value.content = b'{"item": {"page": {"title": "mock"}}}'
+        iprox_project = IproxProject('https://amsterdam.nl/@0/page/', '0', 'mock', client=project_client,
+                                     page_store=page_store)
+        iprox_project.set_article_item({'itmidt': '1'}, _type='news')
+
+        article_client = MagicMock()
+        iprox_article = IproxArticle(headers={}, client=article_client, page_store=page_store)
+        raw_data = iprox_article.get_data(iprox_project.details['news'][0]['url'])
+
+        assert raw_data == {'item': {'page': {'title': 'mock'}}}
+        assert article_client.get.call_count == 0
+        assert len(page_store) == 0
+
+    @staticmethod
+    def test_shared_page_discovered_once():
+        """ Test an article page linked from several projects is fetched and kept once per run """
+        page_store = PageStore()
+        client = MagicMock()
+        client.get.return_value.status_code = 200
+        client.get.return_value.content = b'{"item": {"page": {"title": "mock"}}}'
+        projects = [IproxProject(f'https://amsterdam.nl/@{i}/page/', str(i), 'mock', client=client,
+                                 page_store=page_store) for i in range(3)]
+        for iprox_project in projects:
+            iprox_project.set_article_item({'itmidt': '1'}, _type='news')
+
+        assert client.get.call_count == 1
+        assert [len(iprox_project.details['news']) for iprox_project in projects] == [1, 1, 1]
+        assert len(page_store) == 1
+
+        page_store.clear()
+        projects[0].set_article_item({'itmidt': '1'}, _type='news')
+        assert client.get.call_count == 2
+
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(IproxArticle, 'scraper', side_effect=scraped_article)
+    def test_shared_articles(_scraper, _print):
+        """ Test an article linked from several projects is scraped once and saved for every project """
+        client = MockIngestionClient()
+        iprox_article = IproxArticle(headers={}, client=client, workers=2)
+        scraper_report = {str(i): {'news': []} for i in range(3)}
+        iprox_article.start(scraper_report=scraper_report)
+        for i in range(2):
+            iprox_article.add({'identifier': 'shared', 'project_identifier': str(i), 'project_title': '', 'url': '',
+                               'type': 'news'}, 'projects')
+        iprox_article.queue.join()
+
+        # Linked from another project after it was scraped
+        iprox_article.add({'identifier': 'shared', 'project_identifier': '2', 'project_title': '', 'url': '',
+                           'type': 'work'}, 'projects')
+        iprox_article.stop()
+
+        assert _scraper.call_count == 1
+        assert client.posted == [('http://api-server:8000/api/v1/ingest/article', 'shared')] * 3
+        assert [len(scraper_report[str(i)]['news']) for i in range(3)] == [1, 1, 1]
+
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(IproxArticle, 'scraper', side_effect=scraped_article)
+    def test_shared_article_saved_by_worker(_scraper, _print):
+        """ Test an article linked again after it was scraped is saved by a worker, not by the thread linking it """
+        client = MockIngestionClient()
+        iprox_article = IproxArticle(headers={}, client=client)
+        scraper_report = {str(i): {'news': []} for i in range(2)}
+        article = {'identifier': 'shared', 'project_identifier': '0', 'project_title': '', 'url': '', 'type': 'news'}
+        save_article = iprox_article.save_article
+        saving_threads = []
+
+        def save_in_thread(article_data, message):
+            saving_threads.append(threading.current_thread())
+            save_article(article_data, message)
+
+        iprox_article.save_article = save_in_thread
+        iprox_article.start(scraper_report=scraper_report)
+        iprox_article.add(article, 'projects')
+        iprox_article.queue.join()
+        iprox_article.add(dict(article, project_identifier='1'), 'projects')
+        iprox_article.stop()
+
+        assert len(saving_threads) == 2 and threading.current_thread() not in saving_threads
+        assert _scraper.call_count == 1
+        assert len(client.posted) == 2
+        assert [len(scraper_report[str(i)]['news']) for i in range(2)] == [1, 1]
+
+    @staticmethod
+    @patch.object(Logger, 'error')
+    def test_dead_article_skipped(_error):
+        """ Test an article page that is not json is remembered as dead and not fetched again """
+        client = MagicMock()
+        client.get.return_value.status_code = 200
+        client.get.return_value.content = b'<html>'
+        with tempfile.TemporaryDirectory() as directory:
+            negative_cache = NegativeCache(os.path.join(directory, 'dead_urls.sqlite'))
+            iprox_article = IproxArticle(headers={}, client=client, negative_cache=negative_cache)
+            assert iprox_article.get_data('https://amsterdam.nl/@1/page/') is None
+            assert iprox_article.get_data('https://amsterdam.nl/@1/page/') is None
+            negative_cache.close()
+
+        assert client.get.call_count == 1
+        _error.assert_called_once_with('failed fetching data from https://amsterdam.nl/@1/page/: this is not json!')
+
+    @staticmethod
+    @patch.object(Logger, 'error')
+    def test_failing_article_not_dead(_error):
+        """ Test a 404 article page is remembered as dead, a 429 or 5xx is fetched again """
+        client = MagicMock()
+        with tempfile.TemporaryDirectory() as directory:
+            negative_cache = NegativeCache(os.path.join(directory, 'dead_urls.sqlite'))
+            iprox_article = IproxArticle(headers={}, client=client, negative_cache=negative_cache)
+            for status_code in [503, 429, 404, 404]:
+                client.get.return_value.status_code = status_code
+                assert iprox_article.get_data('https://amsterdam.nl/@1/page/') is None
+            negative_cache.close()
+
+        assert client.get.call_count == 3
+        assert _error.call_count == 3
@@ -0,0 +1,55 @@
+""" UNITTESTS """
+import unittest
+from FetchData.IproxFields import IproxFields
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_extract():
+        """ Test the last matching child wins, attributes follow paths, transforms and defaults are applied """
+        fields = IproxFields({
+            'title': ('Titel', 'Wrd', None, ''),
+            'body': ('Tekst', 'Txt', 'sanitize'),
+            'date': ('Brondatum', 'Dtm', 'date'),
+            'url': ('Link', 'link.Url', None, ''),
+            'missing': ('Onbekend', 'Wrd')
+        })
+        children = [{'Nam': 'Titel', 'Wrd': 'first'},
+                    {'Nam': 'Titel'},
+                    {'Nam': 'Tekst', 'Txt': '<p><a href="/publish/pages/1/mock.pdf">mock</a></p>'},
+                    {'Nam': 'Brondatum', 'Dtm': '20220131120000'},
+                    {'Nam': 'Link', 'link': 'not a dict'},
+                    'not a child']
+
+        assert fields(children) == {
+            'title': '',
+            'body': ('<p><a href="https://www.amsterdam.nl/publish/pages/1/mock.pdf">mock</a></p>', 'mock'),
+            'date': '2022-01-31',
+            'url': ''
+        }
+        assert fields({'Nam': 'Titel', 'Wrd': 'lone'}) == {'title': 'lone'}
+
+    @staticmethod
+    def test_lists():
+        """ Test list fields collect all matching children in their original order """
+        fields = IproxFields({'categories': ('App categorie', 'SelAka'), 'url': ('Link', 'link.Url')},
+                             lists=['categories'])
+        children = [{'Nam': 'App categorie', 'SelAka': 'news'},
+                    {'Nam': 'Link', 'link': {'Url': 'https://mock/'}},
+                    {'Nam': 'App categorie', 'SelAka': 'work'}]
+
+        assert fields(children) == {'categories': ['news', 'work'], 'url': 'https://mock/'}
+        assert fields([]) == {'categories': []}
+
+    @staticmethod
+    def test_image():
+        """ Test image sources are keyed on their size """
+        fields = IproxFields({'image': ('Hero afbeelding', None, 'image')})
+        child = {'Nam': 'Hero afbeelding', 'FilNam': 'mock.jpg', 'Src': {'_': '/publish/pages/0/mock.jpg'},
+                 'asset': [{'FilNam': 'mock.jpg', 'Src': {'_': '/publish/pages/0/220px/mock.jpg'}}]}
+
+        sources = fields([child])['image']
+        assert list(sources) == ['orig', '220px']
+        assert sources['220px']['url'] == 'https://www.amsterdam.nl/publish/pages/0/220px/mock.jpg'
+        assert sources['orig']['filename'] == 'mock.jpg'
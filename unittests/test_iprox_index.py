@@ -0,0 +1,44 @@
+""" UNITTESTS """
+import unittest
+from unittests.mock_data import TestData
+from FetchData.IproxIndex import IproxIndex
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_filter():
+        """ Test only leaves nested in target clusters are returned, in tree order """
+        tree = [
+            {'Nam': 'Blok', 'cluster': [
+                {'Nam': 'Titel', 'veld': 'first'},
+                {'Nam': 'Lijst', 'cluster': [{'Nam': 'Titel', 'veld': 'hidden unless Lijst is a target'}]},
+                {'Nam': 'Meta', 'cluster': {'Nam': 'Gegevens', 'veld': ['lone']}},
+                {'Nam': 'Titel', 'veld': 'last'}
+            ]},
+            {'Nam': 'Other', 'veld': 'not a target'}
+        ]
+        index = IproxIndex(tree)
+
+        assert index.filter(['Blok', 'Titel']) == [{'Titel': 'first'}, {'Titel': 'last'}]
+        assert index.filter(['Blok', 'Titel', 'Lijst']) == [{'Titel': 'first'},
+                                                            {'Titel': 'hidden unless Lijst is a target'},
+                                                            {'Titel': 'last'}]
+        assert index.filter(['Blok', 'Meta', 'Gegevens']) == [{'Meta': {'Nam': 'Gegevens', 'veld': ['lone']}}]
+        assert not index.filter(['Titel'])
+
+    @staticmethod
+    def test_same_as_recursion():
+        """ Test the results of the recursive implementation on its test data """
+        data = TestData()
+        assert IproxIndex(data.iprox_recursion).filter(['Target']) == [{'Target': []},
+                                                                       {'Target': {'Nam': 'Target', 'veld': {}}}]
+
+    @staticmethod
+    def test_deep_tree():
+        """ Test trees deeper than the recursion limit """
+        tree = {'Nam': 'Target', 'veld': 'leaf'}
+        for _ in range(5000):
+            tree = {'Nam': 'Target', 'cluster': [tree]}
+
+        assert IproxIndex([tree]).filter(['Target']) == [{'Target': 'leaf'}]
@@ -0,0 +1,255 @@
+""" UNITTESTS """
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from unittests.mock_functions import MockIngestionClient, iprox_project_details
+from FetchData.IproxArticle import IproxArticle
+from FetchData.IproxIngestion import IproxIngestion
+from FetchData.IproxProject import IproxProject
+from FetchData.IproxProjects import IproxProjects
+from GenericFunctions.Hashing import Hashing
+from GenericFunctions.Logger import Logger
+from GenericFunctions.NegativeCache import NegativeCache
+from GenericFunctions.StateStore import StateStore
+
+
+def listing(amount):
+    """ Parsed project listing as produced by IproxProjects.parse_data """
+    return [{'identifier': str(i), 'title': f'mock {i}', 'project_type': 'projects', 'modification_date': '1970-01-01'}
+            for i in range(amount)]
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(Logger, 'error')
+    @patch.object(IproxIngestion, 'get_set_project_details', side_effect=iprox_project_details)
+    @patch.object(IproxProjects, 'get_data')
+    def test_get_set_projects_concurrent(_get_data, _details, _error, _print):
+        """ Test counters and scraper report are correct when projects are scraped concurrently """
+        client = MockIngestionClient(existing=[str(i) for i in range(0, 40, 2)], failing=['1', '3'])
+        iprox_ingestion = IproxIngestion(headers={}, client=client, workers=8)
+        with patch.object(IproxProjects, 'parse_data', autospec=True,
+                          side_effect=lambda self: self.parsed_data.extend(listing(40))):
+            report = iprox_ingestion.get_set_projects('projects')
+
+        assert report['new'] == 18
+        assert report['updated'] == 20
+        assert report['failed'] == 2
+        assert report['total'] == 38
+        assert len(iprox_ingestion.scraper_report) == 38
+        assert iprox_ingestion.scraper_report['2']['history'] == 'project is: updated'
+        assert iprox_ingestion.scraper_report['5']['history'] == 'project is: new'
+        assert '1' not in iprox_ingestion.scraper_report
+
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(IproxProjects, 'get_data')
+    def test_articles_overlap_projects(_get_data, _print):
+        """ Test articles are scraped while the project loop is still running """
+        article_scraped = threading.Event()
+        overlapped = []
+
+        def details(item, project_type):
+            # The second project waits until the news of the first project has been scraped
+            if item['identifier'] == '1':
+                overlapped.append(article_scraped.wait(timeout=5))
+            result = iprox_project_details(item, project_type)
+            result['news'] = [{'identifier': f'news-{item["identifier"]}', 'project_identifier': item['identifier'],
+                               'project_title': item['title'], 'url': '', 'type': 'news'}]
+            return result
+
+        def scraper(article):
+            article_data = IproxArticle.skeleton()
+            article_data['identifier'] = article['identifier']
+            article_data['project_identifier'] = article['project_identifier']
+            article_scraped.set()
+            return article_data
+
+        iprox_ingestion = IproxIngestion(headers={}, client=MockIngestionClient(), workers=1, article_workers=2)
+        with patch.object(IproxProjects, 'parse_data', autospec=True,
+                          side_effect=lambda self: self.parsed_data.extend(listing(2))), \
+                patch.object(IproxIngestion, 'get_set_project_details', side_effect=details), \
+                patch.object(IproxArticle, 'scraper', side_effect=scraper):
+            report = iprox_ingestion.get_set_projects('projects')
+
+        assert overlapped == [True]
+        assert report['new'] == 2
+        assert [len(iprox_ingestion.scraper_report[i]['news']) for i in ['0', '1']] == [1, 1]
+        assert not iprox_ingestion.article.threads
+
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(IproxIngestion, 'get_set_project_details', side_effect=iprox_project_details)
+    @patch.object(IproxProjects, 'get_data')
+    def test_incremental_skip(_get_data, _details, _print):
+        """ Test unmodified projects are skipped on a next incremental run, unless full=True """
+        def run(state_store, full=False, modified=None, incremental=True):
+            items = listing(4)
+            if modified is not None:
+                items[modified]['modification_date'] = '1970-01-02'
+            client = MockIngestionClient()
+            iprox_ingestion = IproxIngestion(headers={}, client=client, state_store=state_store, full=full,
+                                             incremental=incremental)
+            with patch.object(IproxProjects, 'parse_data', autospec=True,
+                              side_effect=lambda self: self.parsed_data.extend(items)):
+                return iprox_ingestion.get_set_projects('projects'), client
+
+        with tempfile.TemporaryDirectory() as directory:
+            state_store = StateStore(os.path.join(directory, 'state.sqlite'))
+            report, client = run(state_store)
+            assert (report['new'], report['skipped'], len(client.posted), client.seen) == (4, 0, 8, [])
+
+            # Skipped projects are not posted, their last_seen time is refreshed
+            report, client = run(state_store)
+            assert (report['new'], report['skipped'], report['total'], len(client.posted)) == (0, 4, 4, 0)
+            assert client.seen == ['0', '1', '2', '3']
+            assert report['seen'] == {'projects': 4, 'status': True}
+
+            report, client = run(state_store, modified=2)
+            assert (report['new'], report['skipped'], client.posted[0][1]) == (1, 3, '2')
+            assert client.seen == ['0', '1', '3']
+
+            report, client = run(state_store, full=True)
+            assert (report['new'], report['skipped'], len(client.posted), client.seen) == (4, 0, 8, [])
+
+            # Skipping is opt-in: it depends on the seen route of the backend
+            report, client = run(state_store, incremental=False)
+            assert (report['skipped'], client.seen) == (0, [])
+            state_store.close()
+
+    @staticmethod
+    @patch.object(Logger, 'error')
+    def test_touch_seen_failed(_error):
+        """ Test the seen projects are posted in chunks, a failing chunk is reported """
+        client = MockIngestionClient()
+        iprox_ingestion = IproxIngestion(headers={}, client=client)
+        iprox_ingestion.page_size = 2
+        iprox_ingestion.seen = {'0', '1', '2'}
+        assert iprox_ingestion.touch_seen('http://api-server:8000/api/v1/ingest/projects', 'projects') is True
+        assert client.seen == ['0', '1', '2']
+
+        with patch.object(client, 'post', return_value=MockIngestionClient.Response(500, 'Mock error')):
+            assert iprox_ingestion.touch_seen('http://api-server:8000/api/v1/ingest/projects', 'projects') is False
+        _error.assert_called_once_with('Mock error')
+
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(IproxIngestion, 'get_set_project_details', side_effect=iprox_project_details)
+    @patch.object(IproxProjects, 'get_data')
+    def test_unchanged_payloads_not_posted(_get_data, _details, _print):
+        """ Test fetched projects with the same payload as last ingested are not posted again """
+        def run(state_store, modification_date, incremental=True):
+            items = listing(3)
+            for item in items:
+                item['modification_date'] = modification_date
+            client = MockIngestionClient(existing=['0', '1', '2'])
+            iprox_ingestion = IproxIngestion(headers={}, client=client, state_store=state_store,
+                                             incremental=incremental)
+            with patch.object(IproxProjects, 'parse_data', autospec=True,
+                              side_effect=lambda self: self.parsed_data.extend(items)):
+                return iprox_ingestion.get_set_projects('projects'), client, iprox_ingestion.scraper_report
+
+        with tempfile.TemporaryDirectory() as directory:
+            state_store = StateStore(os.path.join(directory, 'state.sqlite'))
+            report, client, _ = run(state_store, '1970-01-01')
+            assert (report['updated'], report['unchanged'], len(client.posted), client.seen) == (3, 0, 6, [])
+
+            # Listing changed, so the pages are fetched again, but the project details are the same
+            report, client, scraper_report = run(state_store, '1970-01-02')
+            assert [client.posted[i][0].split('/')[-1] for i in range(3)] == ['projects'] * 3
+            assert (report['updated'], report['unchanged'], report['total'], len(client.posted)) == (0, 3, 3, 3)
+            assert scraper_report['0']['history'] == 'project is: unchanged'
+            assert not client.seen
+
+            # Fetched again (the listing state is lost), nothing changed: nothing is posted, the projects are seen
+            for identifier in ['0', '1', '2']:
+                state_store.set_project(identifier, '1970-01-02', 'mock')
+            report, client, _ = run(state_store, '1970-01-02')
+            assert (report['unchanged'], len(client.posted), sorted(client.seen)) == (3, 0, ['0', '1', '2'])
+
+            # Not incremental: the same payloads are posted, nothing depends on the seen route
+            report, client, _ = run(state_store, '1970-01-02', incremental=False)
+            assert (report['updated'], len(client.posted), client.seen) == (3, 6, [])
+            state_store.close()
+
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(IproxIngestion, 'get_set_project_details', side_effect=iprox_project_details)
+    @patch.object(IproxProjects, 'get_data')
+    def test_bulk_existence_lookup(_get_data, _details, _print):
+        """ Test known projects are fetched in paginated bulk requests instead of one request per project """
+        client = MockIngestionClient(existing=['0', '1', '2', '3', '4'], bulk=True)
+        iprox_ingestion = IproxIngestion(headers={}, client=client, workers=4)
+        iprox_ingestion.page_size = 2
+        with patch.object(IproxProjects, 'parse_data', autospec=True,
+                          side_effect=lambda self: self.parsed_data.extend(listing(8))):
+            report = iprox_ingestion.get_set_projects('projects')
+
+        assert [params['page'] for params in client.gets if 'page' in params] == [1, 2, 3]
+        assert not [params for params in client.gets if 'identifier' in params]
+        assert (report['updated'], report['new']) == (5, 3)
+        assert iprox_ingestion.known_projects['4'] == '1970-01-01'
+
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(IproxIngestion, 'get_set_project_details', side_effect=iprox_project_details)
+    @patch.object(IproxProjects, 'get_data')
+    def test_bulk_lookup_feeds_incremental_skip(_get_data, _details, _print):
+        """ Test projects unknown by the backend are never skipped, even if unmodified since the last run """
+        with tempfile.TemporaryDirectory() as directory:
+            state_store = StateStore(os.path.join(directory, 'state.sqlite'))
+            for item in listing(3):
+                state_store.set_project(item['identifier'], item['modification_date'], Hashing.make_json_hash(item))
+
+            client = MockIngestionClient(existing=['0', '1'], bulk=True)
+            iprox_ingestion = IproxIngestion(headers={}, client=client, state_store=state_store, incremental=True)
+            with patch.object(IproxProjects, 'parse_data', autospec=True,
+                              side_effect=lambda self: self.parsed_data.extend(listing(3))):
+                report = iprox_ingestion.get_set_projects('projects')
+            state_store.close()
+
+        assert (report['skipped'], report['new']) == (2, 1)
+        assert iprox_ingestion.scraper_report['2']['history'] == 'project is: new'
+
+    @staticmethod
+    @patch('builtins.print')
+    @patch.object(IproxProjects, 'get_data')
+    def test_dead_projects_skipped(_get_data, _print):
+        """ Test a project page found dead is skipped on the next run, a network error is not remembered """
+        def get_data(self):
+            if self.identifier == '1':
+                self.dead_reason = 'status 404'
+            elif self.identifier == '2':
+                self.page_type = 'news'
+            elif self.identifier == '3':
+                return  # eg. a timeout
+            else:
+                self.page_type = 'subhome'
+
+        def run(negative_cache):
+            items = listing(4)
+            for item in items:
+                item['source_url'] = f'https://amsterdam.nl/@{item["identifier"]}/page/'
+            iprox_ingestion = IproxIngestion(headers={}, client=MockIngestionClient(), negative_cache=negative_cache)
+            with patch.object(IproxProjects, 'parse_data', autospec=True,
+                              side_effect=lambda self: self.parsed_data.extend(items)), \
+                    patch.object(IproxProject, 'get_data', autospec=True, side_effect=get_data) as project_get_data, \
+                    patch.object(IproxProject, 'parse_data'):
+                report = iprox_ingestion.start('projects')
+            return report, project_get_data.call_count
+
+        with tempfile.TemporaryDirectory() as directory:
+            negative_cache = NegativeCache(os.path.join(directory, 'dead_urls.sqlite'))
+            report, fetched = run(negative_cache)
+            assert (report['projects']['new'], report['projects']['failed'], report['projects']['dead']) == (1, 3, 0)
+            assert fetched == 4
+
+            report, fetched = run(negative_cache)
+            assert (report['projects']['new'], report['projects']['failed'], report['projects']['dead']) == (1, 1, 2)
+            assert fetched == 2
+            assert report['dead_urls'] == {'skipped': 2, 'marked': 2, 'revived': 0, 'dead': 2}
+            negative_cache.close()
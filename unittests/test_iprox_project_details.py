@@ -1,19 +1,22 @@
 """ UNITTESTS """
+import os
+import tempfile
 import unittest
-from unittest.mock import patch, call
+from unittest.mock import MagicMock, patch, call
 from unittest import TestCase
 from unittests.mock_data import TestData
 from unittests.mock_functions import mocked_requests_get, iprox_filter
 from FetchData.IproxProject import IproxProject
-from FetchData.IproxRecursion import IproxRecursion
+from FetchData.IproxIndex import IproxIndex
 from GenericFunctions.Logger import Logger
+from GenericFunctions.NegativeCache import NegativeCache
 
 
 class Unittests(unittest.TestCase):
     """ Unittests """
     @staticmethod
-    @patch('requests.get', mocked_requests_get)
-    def test_get_data_valid_item_is_none():
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_get_data_valid_item_is_none(_mocked_requests_get):
         """ Test get empty page """
         iprox_project = IproxProject('empty_json_response', 'identifier', 'title')
         iprox_project.get_data()
@@ -24,8 +27,8 @@ class Unittests(unittest.TestCase):
         assert iprox_project.url == 'empty_json_response?AppIdt=app-pagetype&reload=true'
 
     @staticmethod
-    @patch('requests.get', mocked_requests_get)
-    def test_get_data_valid_item_is_not_none():
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_get_data_valid_item_is_not_none(_mocked_requests_get):
         """ Test get valid page """
         iprox_project = IproxProject('valid_json_response', 'identifier', 'title')
         iprox_project.get_data()
@@ -37,8 +40,8 @@ class Unittests(unittest.TestCase):
 
     @staticmethod
     @patch.object(Logger, 'error')
-    @patch('requests.get', mocked_requests_get)
-    def test_get_data_raise_exception(mock):
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_get_data_raise_exception(_mocked_requests_get, mock):
         """ Test get data with raised exception """
         iprox_project = IproxProject('raise_exception', 'identifier', 'title')
         iprox_project.get_data()
@@ -50,9 +53,31 @@ class Unittests(unittest.TestCase):
         assert mock.call_args_list == [call('failed fetching data from raise_exception?AppIdt=app-pagetype&reload=true: Mock exception')]  # pylint: disable=line-too-long
 
     @staticmethod
-    @patch('requests.get', mocked_requests_get)
-    @patch.object(IproxRecursion, 'filter', side_effect=iprox_filter)
-    def test_parse_data(_iprox_filter):
+    @patch.object(Logger, 'error')
+    def test_failing_pages_not_dead(_error):
+        """ Test only a 404/410 or a page that is not json is dead, a 429 or 5xx is not remembered """
+        client = MagicMock()
+        for status_code, content, dead_reason in [(503, b'<html>', None), (429, b'', None), (410, b'', 'status 410'),
+                                                  (200, b'<html>', 'not json')]:
+            client.get.return_value.status_code = status_code
+            client.get.return_value.content = content
+            iprox_project = IproxProject('mock', 'identifier', 'title', client=client)
+            iprox_project.get_data()
+            assert iprox_project.dead_reason == dead_reason
+
+        with tempfile.TemporaryDirectory() as directory:
+            negative_cache = NegativeCache(os.path.join(directory, 'dead_urls.sqlite'))
+            iprox_project = IproxProject('mock', 'identifier', 'title', client=client, negative_cache=negative_cache)
+            for status_code in [502, 429, 404]:
+                client.get.return_value.status_code = status_code
+                assert iprox_project.get_json('https://mock/') is None
+            assert negative_cache.stats()['marked'] == 1
+            negative_cache.close()
+
+    @staticmethod
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    @patch.object(IproxIndex, 'filter', side_effect=iprox_filter)
+    def test_parse_data(_iprox_filter, _mocked_requests_get):
         """ Test parse data """
         test_data = TestData()
         iprox_project = IproxProject('None', 'identifier', '')
@@ -63,8 +88,27 @@ class Unittests(unittest.TestCase):
         TestCase().assertDictEqual(iprox_project.details, test_data.iprox_project_details)
 
     @staticmethod
-    @patch('requests.get', mocked_requests_get)
-    def test_get_timeline():
+    @patch.object(IproxProject, 'get_article_item')
+    @patch.object(IproxProject, 'get_timeline')
+    @patch.object(IproxIndex, 'filter', return_value=TestData().iprox_project_detail_extended)
+    def test_parse_page_golden(_iprox_filter, get_timeline, get_article_item):
+        """ Test parse page of the less common nodes (Titel, Contact, Coordinaten list, Koppeling, bogus items) """
+        test_data = TestData()
+        iprox_project = IproxProject('None', 'identifier', '')
+        iprox_project.parse_page([])
+
+        TestCase().assertDictEqual(iprox_project.details, test_data.iprox_project_details_extended)
+        assert iprox_project.links == [('timeline', 'https://mock_tijdlijn/'), ('work', 'https://mock_tijdlijn/')]
+        assert get_timeline.call_count == 0
+
+        iprox_project.follow_links()
+        assert iprox_project.links == []
+        assert get_timeline.call_args_list == [call('https://mock_tijdlijn/')]
+        assert get_article_item.call_args_list == [call('https://mock_tijdlijn/', _type='work')]
+
+    @staticmethod
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_get_timeline(_mocked_requests_get):
         """ Test get timeline """
         iprox_project = IproxProject('None', 'identifier', 'title')
         iprox_project.get_timeline('https://mock-timeline')
@@ -15,8 +15,8 @@ class Unittests(unittest.TestCase):
     """ Unittests """
     @staticmethod
     @patch.object(Logger, 'error')
-    @patch('requests.get', mocked_requests_get)
-    def test_get_data_raise_exception(mock):
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_get_data_raise_exception(_mocked_requests_get, mock):
         """ Test raise exception """
         iprox_project = IproxProjects('/raise_exception', 'identifier')
         iprox_project.get_data()
@@ -25,8 +25,8 @@ class Unittests(unittest.TestCase):
 
     @staticmethod
     @patch.object(Logger, 'error')
-    @patch('requests.get', mocked_requests_get)
-    def test_get_data(mock):
+    @patch('requests.Session.get', side_effect=mocked_requests_get)
+    def test_get_data(_mocked_requests_get, mock):
         """ Test get data """
         iprox_project = IproxProjects('/get', 'identifier')
         iprox_project.get_data()
@@ -1,6 +1,7 @@
 """ UNITTESTS """
+import json
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from unittest import TestCase
 import requests
 from unittests.mock_functions import mocked_requests_post
@@ -22,8 +23,8 @@ from FetchData.IproxStadsloketten import IproxStadsloket
 class Unittests(unittest.TestCase):
     """ Unittests """
     @staticmethod
-    @patch.object(requests, 'get', side_effect=iprox_stadsloketten_valid)
-    @patch.object(requests, 'post', side_effect=mocked_requests_post)
+    @patch.object(requests.Session, 'get', side_effect=iprox_stadsloketten_valid)
+    @patch.object(requests.Session, 'post', side_effect=mocked_requests_post)
     def test_iprox_stadsloketten_valid(_iprox_stadsloketten_valid, _mocked_requests_post):
         """ Test get stadsloketten """
         isl = IproxStadsloketten(headers={'test': 'test_iprox_stadsloketten_valid'})
@@ -36,7 +37,25 @@ class Unittests(unittest.TestCase):
         ]
 
     @staticmethod
-    @patch('requests.get', side_effect=iprox_stadsloketten_invalid)
+    def test_save_posts_json_bytes():
+        """ Test the city contact, city offices and city office are posted as json bytes """
+        client = MagicMock()
+        client.post.return_value.status_code = 200
+        isl = IproxStadsloketten(headers={}, client=client)
+        isl.sections = [{'title': 'contact', 'html': 'tekst', 'text': 'tekst'}]
+        isl.save()
+        isl = IproxStadsloket('https://unittest', '0000000000', headers={}, client=client)
+        isl.details['title'] = 'Stadsloket Centrum'
+        isl.save()
+
+        payloads = [(call[0][0].split('/')[-1], json.loads(call[1]['data'])) for call in client.post.call_args_list]
+        assert payloads == [('citycontact', [{'title': 'contact', 'html': 'tekst', 'text': 'tekst'}]),
+                            ('cityoffices', []),
+                            ('cityoffice', isl.details)]
+        assert all(call[1]['headers'] == {'Content-Type': 'application/json'} for call in client.post.call_args_list)
+
+    @staticmethod
+    @patch('requests.Session.get', side_effect=iprox_stadsloketten_invalid)
     def test_iprox_stadsloketten_invalid(_iprox_stadsloketten_invalid):
         """ Test get stadsloketten, invalid result """
         isl = IproxStadsloketten(headers={'test': 'test_iprox_stadsloketten_invalid'})
@@ -47,7 +66,7 @@ class Unittests(unittest.TestCase):
         assert not isl.stadsloketten
 
     @staticmethod
-    @patch('requests.get', side_effect=iprox_stadsloketten_exception)
+    @patch('requests.Session.get', side_effect=iprox_stadsloketten_exception)
     def test_iprox_stadsloketten_exception(_iprox_stadsloketten_exception):
         """ Test get stadsloketten, raise exception """
         isl = IproxStadsloketten(headers={'test': 'test_iprox_stadsloketten_exception'})
@@ -58,8 +77,8 @@ class Unittests(unittest.TestCase):
         assert not isl.stadsloketten
 
     @staticmethod
-    @patch('requests.get', side_effect=iprox_stadsloketten_ingest_fail)
-    @patch.object(requests, 'post', side_effect=mocked_requests_post)
+    @patch('requests.Session.get', side_effect=iprox_stadsloketten_ingest_fail)
+    @patch.object(requests.Session, 'post', side_effect=mocked_requests_post)
     def test_iprox_stadsloketten_ingest_fail(_iprox_stadsloketten_ingest_fail, _mocked_requests_post):
         """ Test failed ingestion """
         isl = IproxStadsloketten(headers={'test': 'test_iprox_stadsloketten_ingest_fail'})
@@ -72,8 +91,8 @@ class Unittests(unittest.TestCase):
         ]
 
     @staticmethod
-    @patch.object(requests, 'post', side_effect=mocked_requests_post)
-    @patch('requests.get', side_effect=iprox_stadsloket_valid)
+    @patch.object(requests.Session, 'post', side_effect=mocked_requests_post)
+    @patch('requests.Session.get', side_effect=iprox_stadsloket_valid)
     def test_iprox_stadsloket_valid(_iprox_stadsloket_valid, _mocked_requests_post):
         """ Test valid stadsloketten """
         isl = IproxStadsloket('https://unittest', '0000000000', headers={'test': 'test_iprox_stadsloket_valid'})
@@ -93,8 +112,8 @@ class Unittests(unittest.TestCase):
         TestCase().assertDictEqual(expected_result, isl.details)
 
     @staticmethod
-    @patch.object(requests, 'post', side_effect=mocked_requests_post)
-    @patch('requests.get', side_effect=iprox_stadsloket_invalid)
+    @patch.object(requests.Session, 'post', side_effect=mocked_requests_post)
+    @patch('requests.Session.get', side_effect=iprox_stadsloket_invalid)
     def test_iprox_stadsloket_invalid(_iprox_stadsloket_invalid, _mocked_requests_post):
         """ Test invalid stadsloketten """
         isl = IproxStadsloket('https://unittest', '0000000000', headers={'test': 'iprox_stadsloket_invalid'})
@@ -106,8 +125,8 @@ class Unittests(unittest.TestCase):
         TestCase().assertDictEqual(expected_result, isl.details)
 
     @staticmethod
-    @patch.object(requests, 'post', side_effect=mocked_requests_post)
-    @patch('requests.get', side_effect=iprox_stadsloket_valid)
+    @patch.object(requests.Session, 'post', side_effect=mocked_requests_post)
+    @patch('requests.Session.get', side_effect=iprox_stadsloket_valid)
     def test_iprox_stadsloket_ingest_failed(_iprox_stadsloket_valid, _mocked_requests_post):
         """ Test ingetion stadsloketten failed """
         isl = IproxStadsloket('https://unittest', '0000000000', headers={'test': 'test_iprox_stadsloket_ingest_failed'})
@@ -127,7 +146,7 @@ class Unittests(unittest.TestCase):
         TestCase().assertDictEqual(expected_result, isl.details)
 
     @staticmethod
-    @patch('requests.get', side_effect=iprox_stadsloket_exception)
+    @patch('requests.Session.get', side_effect=iprox_stadsloket_exception)
     def test_ingest_Exception(_iprox_stadsloket_exception):
         """ Test ingestion exception handling """
         isl = IproxStadsloket('https://unittest', '0000000000')
@@ -142,8 +161,8 @@ class Unittests(unittest.TestCase):
 
     # @staticmethod
     # @patch('threading.Thread', side_effect=MockThread)
-    # @patch('requests.get', side_effect=iprox_stadsloket_scraper)
-    # @patch.object(requests, 'post', side_effect=mocked_requests_post)
+    # @patch('requests.Session.get', side_effect=iprox_stadsloket_scraper)
+    # @patch.object(requests.Session, 'post', side_effect=mocked_requests_post)
     # def test_iprox_stads_loket_scraper(_mock_thread, _iprox_stadsloket_scraper, _mocked_requests_post):
     #     """ Test iprox stadsloket scraper """
     #     with patch('FetchData.Image', side_effect=iprox_stadsloket_scraper_images):
@@ -0,0 +1,40 @@
+""" UNITTESTS """
+import hashlib
+import json
+import unittest
+from unittest.mock import patch
+from GenericFunctions.Hashing import Hashing
+from GenericFunctions.JsonCodec import JsonCodec
+
+PAYLOAD = {'identifier': '0', 'title': 'Brug “nieuw” 😀', 'body': {'html': '<p>a\nb</p>', 'text': 'a\tb\x00'},
+           'coordinates': {'lon': 4.895168, 'lat': 52.370216}, 'images': [], 'district_id': -1, 'active': True,
+           'subtitle': None}
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_codec():
+        """ Test decoding bytes and str, compact and canonical encoding, decode errors are json decode errors """
+        assert JsonCodec.loads(b'{"a": [1, 2.5, null]}') == JsonCodec.loads('{"a": [1, 2.5, null]}') == \
+            {'a': [1, 2.5, None]}
+        assert JsonCodec.loads(b'\xef\xbb\xbf{}') == {}
+        assert JsonCodec.dumps({'b': 1, 'a': 'é'}) == '{"b":1,"a":"é"}'.encode()
+        assert JsonCodec.canonical({'b': 1, 'a': 'é'}) == '{"a":"é","b":1}'.encode()
+        assert JsonCodec.dumps({1: 2**70}) == b'{"1":1180591620717411303424}'
+        try:
+            JsonCodec.loads(b'<html>')
+            assert False
+        except json.JSONDecodeError:
+            pass
+
+    @staticmethod
+    def test_same_as_json():
+        """ Test both codecs give the bytes the json module gives, so payload hashes survive a change of codec """
+        expected = json.dumps(PAYLOAD, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+        assert JsonCodec.canonical(PAYLOAD) == expected
+        with patch('GenericFunctions.JsonCodec.orjson', None):
+            assert JsonCodec.canonical(PAYLOAD) == expected
+            assert JsonCodec.loads(expected) == PAYLOAD
+
+        assert Hashing.make_json_hash(PAYLOAD) == Hashing.make_bytes_hash(expected) == hashlib.md5(expected).hexdigest()
@@ -0,0 +1,37 @@
+""" UNITTESTS """
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from GenericFunctions.NegativeCache import NegativeCache
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_exponential_reprobe():
+        """ Test the re-probe interval doubles with every failure up to the maximum and a working url is forgotten """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dead_urls.sqlite')
+            negative_cache = NegativeCache(path, base_interval=10, max_interval=35)
+            with patch('time.time', return_value=1000):
+                intervals = []
+                for _ in range(4):
+                    negative_cache.mark_dead('https://amsterdam.nl/@1/page/', 'status 404')
+                    retry_at = negative_cache.connection.execute('SELECT retry_at FROM dead_urls').fetchone()[0]
+                    intervals.append(retry_at - 1000)
+                assert intervals == [10, 20, 35, 35]
+                assert negative_cache.is_dead('https://amsterdam.nl/@1/page/')
+                assert not negative_cache.is_dead('https://amsterdam.nl/@2/page/')
+            negative_cache.close()
+
+            # Persisted across runs, due for a re-probe once retry_at has passed
+            negative_cache = NegativeCache(path, base_interval=10, max_interval=35)
+            with patch('time.time', return_value=1030):
+                assert negative_cache.is_dead('https://amsterdam.nl/@1/page/')
+            with patch('time.time', return_value=1036):
+                assert not negative_cache.is_dead('https://amsterdam.nl/@1/page/')
+                negative_cache.mark_alive('https://amsterdam.nl/@1/page/')
+                negative_cache.mark_alive('https://amsterdam.nl/@2/page/')
+                assert negative_cache.stats() == {'skipped': 1, 'marked': 0, 'revived': 1, 'dead': 0}
+            negative_cache.close()
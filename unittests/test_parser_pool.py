@@ -0,0 +1,92 @@
+""" UNITTESTS """
+import unittest
+from unittest.mock import patch
+from unittests.mock_data import TestData
+from FetchData.IproxArticle import IproxArticle
+from FetchData.IproxProject import IproxProject
+from GenericFunctions.ParserPool import ParserPool
+from GenericFunctions.TextSanitizers import TextSanitizers
+
+PROJECT_PAGE = {'item': {'Url': 'https://mock/mock/', 'page': {
+    'pagetype': 'subhome', 'PagIdt': '1', 'title': 'Brug: nieuw',
+    'cluster': [{'Nam': 'Blok', 'cluster': [
+        {'Nam': 'Omschrijving', 'veld': [{'Nam': 'Titel', 'Wrd': 'Wat'},
+                                         {'Nam': 'Tekst', 'Txt': '<p>De <a href="/publish/pages/1/">brug</a></p>'},
+                                         {'Nam': 'App categorie', 'SelAka': 'what'}]},
+        {'Nam': 'Koppeling', 'veld': [{'Nam': 'App categorie', 'SelAka': 'news'},
+                                      {'Nam': 'Link', 'link': {'Url': 'https://mock_nieuws/'}}]}
+    ]}]
+}}}
+
+ARTICLE_PAGE = {'item': {'page': {'CorDtm': '20220131', 'title': 'Nieuws', 'cluster': [
+    {'Nam': 'Meta', 'cluster': [{'Nam': 'Gegevens', 'veld': [{'Nam': 'Samenvatting', 'Txt': '<p>Kort</p>'},
+                                                             {'Nam': 'Brondatum', 'Dtm': '20220201'}]}]},
+    {'Nam': 'Inhoud', 'veld': [{'Nam': 'Tekst', 'Txt': '<p>Lang</p>'}]},
+    {'Nam': 'Verwijzing', 'cluster': {'Nam': 'Verwijzing', 'veld': {'Nam': 'Bestand', 'Src': {'_': '/mock.pdf'},
+                                                                   'FilNam': 'mock.pdf', 'Wrd': 'Mock'}}}
+]}}}
+
+ARTICLE = {'identifier': '1', 'project_identifier': '0', 'url': 'https://mock/1/'}
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_inline():
+        """ Test without workers the functions run in the calling thread """
+        pool = ParserPool(workers=0)
+        assert pool.run(TextSanitizers.strip_html_uncached, '<p>mock</p>') == 'mock'
+        try:
+            pool.run(int, 'not a number')
+            assert False
+        except ValueError:
+            pass
+        assert pool.stats() == {'jobs': 2, 'chunks': 0, 'inline': 2, 'broken': 0, 'workers': 0}
+        pool.close()
+
+    @staticmethod
+    def test_workers():
+        """ Test jobs are run in worker processes in chunks, results and errors come back to their own future """
+        pool = ParserPool(workers=2, chunk_size=4)
+        try:
+            futures = [pool.submit(TextSanitizers.strip_html_uncached, f'<p>{i}</p>') for i in range(7)]
+            failing = pool.submit(int, 'not a number')
+            assert [future.result(timeout=30) for future in futures] == [str(i) for i in range(7)]
+            assert isinstance(failing.exception(timeout=30), ValueError)
+            stats = pool.stats()
+            assert stats['jobs'] == 8 and stats['chunks'] == 2 and stats['inline'] == 0
+        finally:
+            pool.close()
+
+    @staticmethod
+    def test_parse_in_workers():
+        """ Test pages parsed by the workers equal pages parsed in the thread, network calls stay in the thread """
+        pool = ParserPool(workers=1)
+        try:
+            project = pool.run(IproxProject.parse, PROJECT_PAGE, 'https://mock/', '0', 'Brug')
+            assert project == IproxProject.parse(PROJECT_PAGE, 'https://mock/', '0', 'Brug')
+            assert project[0]['body']['what'][0]['text'] == 'De\n\nbrug'
+            assert project[1] == [('news', 'https://mock_nieuws/')]
+
+            clusters = TestData().timeline_raw['item']['page']['cluster']
+            assert pool.run(IproxProject.parse_timeline, clusters) == IproxProject.parse_timeline(clusters)
+
+            article = pool.run(IproxArticle.parse, ARTICLE_PAGE, ARTICLE)
+            assert article == IproxArticle.parse(ARTICLE_PAGE, ARTICLE)
+            assert article[0]['publication_date'] == '2022-02-01'
+            assert article[1] == [(article[0]['assets'][0]['identifier'], 'application/pdf',
+                                   'https://www.amsterdam.nl/mock.pdf')]
+
+            with patch.object(IproxProject, 'get_article_item') as get_article_item:
+                iprox_project = IproxProject('https://mock/', '0', 'Brug', parser_pool=pool)
+                iprox_project.raw_data = PROJECT_PAGE
+                iprox_project.parse_data()
+                assert iprox_project.details == project[0]
+                get_article_item.assert_called_once_with('https://mock_nieuws/', _type='news')
+
+            with patch.object(IproxArticle, 'get_data', return_value=ARTICLE_PAGE), \
+                    patch.object(IproxArticle, 'get_set_asset') as get_set_asset:
+                assert IproxArticle(parser_pool=pool).scraper(ARTICLE) == article[0]
+                get_set_asset.assert_called_once_with(*article[1][0])
+        finally:
+            pool.close()
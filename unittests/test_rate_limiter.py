@@ -0,0 +1,92 @@
+""" UNITTESTS """
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+import requests
+from GenericFunctions.RateLimiter import AimdLimiter, RateLimiter, TokenBucket
+
+
+def response(status_code, headers=None):
+    """ Mock response """
+    result = MagicMock()
+    result.status_code = status_code
+    result.headers = headers or {}
+    return result
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_token_bucket():
+        """ Test the bucket allows a burst and then 'rate' requests per second """
+        bucket = TokenBucket(rate=50, burst=2)
+        started = time.monotonic()
+        for _ in range(7):
+            bucket.acquire()
+        assert time.monotonic() - started >= 0.09
+
+        unlimited = TokenBucket(rate=0, burst=1)
+        assert all(unlimited.acquire() == 0.0 for _ in range(100))
+
+    @staticmethod
+    def test_aimd():
+        """ Test the limit is halved on overload once per window and grows back additively on healthy responses """
+        aimd = AimdLimiter(max_limit=8)
+        started = [aimd.acquire() for _ in range(4)]
+        for start in started:
+            aimd.release(start, overloaded=True, healthy=False)
+        assert aimd.limit == 4
+        assert aimd.backoffs == 1
+
+        for _ in range(4):
+            aimd.release(aimd.acquire(), overloaded=False, healthy=True)
+        assert 4.9 < aimd.limit < 5
+
+        for _ in range(10):
+            aimd.release(aimd.acquire(), overloaded=True, healthy=False)
+        assert aimd.limit == 1
+
+    @staticmethod
+    def test_concurrency_per_host():
+        """ Test no more than 'concurrency' requests per host are in flight, other hosts are not blocked """
+        limiter = RateLimiter(rate=0, concurrency=2, hosts={'backend': {'concurrency': 1}})
+        lock = threading.Lock()
+        in_flight = {'iprox': 0, 'backend': 0}
+        peak = {'iprox': 0, 'backend': 0}
+
+        def request(host):
+            with lock:
+                in_flight[host] += 1
+                peak[host] = max(peak[host], in_flight[host])
+            time.sleep(0.02)
+            with lock:
+                in_flight[host] -= 1
+            return response(200)
+
+        threads = [threading.Thread(target=limiter.call, args=(f'http://{host}/page', lambda host=host: request(host)))
+                   for host in ['iprox', 'backend'] for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert peak == {'iprox': 2, 'backend': 1}
+
+    def test_backoff(self):
+        """ Test 5xx, 429 and timeouts cut the concurrency of the host, a 429 pauses its bucket """
+        limiter = RateLimiter(rate=1000, concurrency=8)
+        limiter.call('https://www.amsterdam.nl/a', lambda: response(503))
+        assert limiter.stats()['www.amsterdam.nl']['limit'] == 4
+
+        def timeout():
+            raise requests.exceptions.Timeout('Mock timeout')
+        with self.assertRaises(requests.exceptions.Timeout):
+            limiter.call('https://www.amsterdam.nl/a', timeout)
+        assert limiter.stats()['www.amsterdam.nl']['limit'] == 2
+
+        limiter.call('https://www.amsterdam.nl/a', lambda: response(429, {'Retry-After': '0.1'}))
+        started = time.monotonic()
+        limiter.call('https://www.amsterdam.nl/a', lambda: response(200))
+        assert time.monotonic() - started >= 0.09
+        assert limiter.stats()['www.amsterdam.nl']['backoffs'] == 3
@@ -0,0 +1,98 @@
+""" UNITTESTS """
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+import requests
+from GenericFunctions.CircuitBreaker import CircuitBreaker, CircuitOpenError
+from GenericFunctions.HttpClient import HttpClient
+from GenericFunctions.Retry import Retry
+
+
+def responses(*outcomes):
+    """ Mock session method: raise or return a response with the given status code for each call """
+    def request(url, **kwargs):
+        outcome = outcomes[request.calls]
+        request.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = MagicMock()
+        response.status_code = outcome
+        response.headers = {}
+        return response
+    request.calls = 0
+    return request
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_retry_get():
+        """ Test a GET is retried on timeouts and 5xx until it succeeds """
+        client = HttpClient(retry=Retry(attempts=3, base_delay=0.001, max_delay=0.01))
+        with patch('requests.Session.get', side_effect=responses(requests.exceptions.Timeout(), 503, 200)) as get:
+            response = client.get('https://www.amsterdam.nl/mock', timeout=10)
+
+        assert response.status_code == 200
+        assert get.call_count == 3
+        assert client.stats()['retries'] == 2
+
+    def test_retry_exhausted(self):
+        """ Test the last error (or response) is returned to the caller once the attempts are used """
+        client = HttpClient(retry=Retry(attempts=2, base_delay=0.001, max_delay=0.01))
+        with patch('requests.Session.get', side_effect=responses(503, 502)):
+            assert client.get('https://www.amsterdam.nl/mock', timeout=10).status_code == 502
+        with patch('requests.Session.get', side_effect=responses(requests.exceptions.ConnectionError(),
+                                                                 requests.exceptions.ConnectionError())):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                client.get('https://www.amsterdam.nl/other', timeout=10)
+
+    @staticmethod
+    def test_idempotency():
+        """ Test only POSTs carrying an identifier are retried """
+        client = HttpClient(retry=Retry(attempts=3, base_delay=0.001, max_delay=0.01))
+        with patch('requests.Session.post', side_effect=responses(500, 200)) as post:
+            assert client.post('http://api-server/project', json={'identifier': '1'}).status_code == 200
+            assert post.call_count == 2
+        with patch('requests.Session.post', side_effect=responses(500, 200)) as post:
+            assert client.post('http://api-server/report', json={'title': 'no identifier'}).status_code == 500
+            assert post.call_count == 1
+        with patch('requests.Session.post', side_effect=responses(500, 200)) as post:
+            assert client.post('http://api-server/project/batch', data=b'[]', idempotent=True).status_code == 200
+            assert post.call_count == 2
+
+    def test_circuit_breaker(self):
+        """ Test a host fails fast once its circuit is open, a successful probe closes it, others are unaffected """
+        breaker = CircuitBreaker(failures=2, reset_timeout=0.05)
+        client = HttpClient(retry=Retry(attempts=3, base_delay=0.001, max_delay=0.01), breaker=breaker)
+        with patch('requests.Session.get', side_effect=responses(*([requests.exceptions.Timeout()] * 6))) as get:
+            # One failure per request, once all its attempts failed
+            for _ in range(2):
+                with self.assertRaises(requests.exceptions.Timeout):
+                    client.get('https://www.amsterdam.nl/mock', timeout=10)
+            with self.assertRaises(CircuitOpenError):
+                client.get('https://www.amsterdam.nl/mock', timeout=10)
+            assert get.call_count == 6
+
+        with patch('requests.Session.get', side_effect=responses(200)):
+            assert client.get('http://api-server/mock', timeout=10).status_code == 200
+
+        time.sleep(0.06)
+        with patch('requests.Session.get', side_effect=responses(200)):
+            assert client.get('https://www.amsterdam.nl/mock', timeout=10).status_code == 200
+
+        assert breaker.stats()['www.amsterdam.nl']['state'] == 'closed'
+        assert breaker.stats()['www.amsterdam.nl']['opened'] == 1
+        assert breaker.stats()['www.amsterdam.nl']['rejected'] >= 1
+        assert breaker.stats()['api-server']['state'] == 'closed'
+
+    @staticmethod
+    def test_circuit_breaker_5xx():
+        """ Test 5xx responses do not open the circuit: the host answers, the page fails """
+        breaker = CircuitBreaker(failures=1)
+        client = HttpClient(retry=Retry(attempts=2, base_delay=0.001, max_delay=0.01), breaker=breaker)
+        with patch('requests.Session.get', side_effect=responses(503, 503, 500, 500, 200)) as get:
+            assert client.get('https://www.amsterdam.nl/mock', timeout=10).status_code == 503
+            assert client.get('https://www.amsterdam.nl/other', timeout=10).status_code == 500
+            assert client.get('https://www.amsterdam.nl/mock', timeout=10).status_code == 200
+            assert get.call_count == 5
+        assert breaker.stats()['www.amsterdam.nl'] == {'state': 'closed', 'opened': 0, 'rejected': 0}
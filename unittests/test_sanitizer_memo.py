@@ -0,0 +1,77 @@
+""" UNITTESTS """
+import os
+import tempfile
+import unittest
+from GenericFunctions.SanitizerMemo import SanitizerMemo
+from GenericFunctions.TextSanitizers import TextSanitizers
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_memo():
+        """ Test a fragment is sanitized once, the least recently used fragment is evicted """
+        calls = []
+
+        def sanitize(fragment):
+            calls.append(fragment)
+            return fragment.upper()
+
+        memo = SanitizerMemo(max_entries=2)
+        assert [memo.get('upper', fragment, sanitize) for fragment in ['a', 'b', 'a', 'c', 'b']] == \
+               ['A', 'B', 'A', 'C', 'B']
+        assert calls == ['a', 'b', 'c', 'b']
+        assert memo.get('other', 'a', lambda fragment: fragment * 2) == 'aa'
+        assert memo.get('upper', None, lambda fragment: 'not memoized') == 'not memoized'
+
+        stats = memo.stats()
+        assert (stats['hits'], stats['misses'], stats['evicted'], stats['entries']) == (1, 5, 3, 2)
+        assert stats['hit_rate'] == round(1 / 6, 3)
+
+    @staticmethod
+    def test_persist():
+        """ Test the memo is kept between runs """
+        with tempfile.TemporaryDirectory() as state_dir:
+            path = os.path.join(state_dir, 'sanitizer.sqlite')
+            memo = SanitizerMemo(path=path)
+            memo.get('strip_html', '<p>mock</p>', TextSanitizers.strip_html_uncached)
+            memo.get('sanitize', '<p>mock</p>', TextSanitizers.sanitize_uncached)
+            memo.close()
+
+            memo = SanitizerMemo(path=path)
+            assert memo.get('strip_html', '<p>mock</p>', lambda fragment: 'not used') == 'mock'
+            assert memo.get('sanitize', '<p>mock</p>', lambda fragment: 'not used') == ('<p>mock</p>', 'mock')
+            assert memo.stats()['hits'] == 2
+            memo.close()
+
+    @staticmethod
+    def test_version():
+        """ Test a stored memo of other sanitizer code is cleared """
+        version = TextSanitizers.version()
+        assert version == TextSanitizers.version() and len(version) == 32
+        with tempfile.TemporaryDirectory() as state_dir:
+            path = os.path.join(state_dir, 'sanitizer.sqlite')
+            memo = SanitizerMemo(path=path, version=version)
+            memo.get('strip_html', '<p>mock</p>', TextSanitizers.strip_html_uncached)
+            memo.close()
+
+            memo = SanitizerMemo(path=path, version=version)
+            assert memo.stats()['entries'] == 1
+            memo.close()
+
+            memo = SanitizerMemo(path=path, version='other')
+            assert memo.get('strip_html', '<p>mock</p>', lambda fragment: 'new') == 'new'
+            memo.close()
+
+    @staticmethod
+    def test_text_sanitizers():
+        """ Test strip_html, rewrite_html and sanitize use the memo when it is set """
+        TextSanitizers.memo = SanitizerMemo()
+        try:
+            for _ in range(3):
+                assert TextSanitizers.strip_html('<p>mock</p>') == 'mock'
+                assert TextSanitizers.rewrite_html('"/publish/pages/') == '"https://www.amsterdam.nl/publish/pages/'
+                assert TextSanitizers.sanitize('<p>mock</p>') == ('<p>mock</p>', 'mock')
+            assert TextSanitizers.memo.stats()['hits'] == 6
+        finally:
+            TextSanitizers.memo = None
@@ -0,0 +1,35 @@
+""" UNITTESTS """
+import os
+import tempfile
+import unittest
+from GenericFunctions.StateStore import StateStore
+
+
+class Unittests(unittest.TestCase):
+    """ Unittests """
+    @staticmethod
+    def test_state_store_persists():
+        """ Test project state survives re-opening the store """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'state', 'state.sqlite')
+            state_store = StateStore(path)
+            assert state_store.get_project('0') is None
+            state_store.set_project('0', '1970-01-01', 'hash')
+            state_store.set_project('0', '1970-01-02', 'new hash')
+            state_store.close()
+
+            state_store = StateStore(path)
+            assert state_store.get_project('0') == ('1970-01-02', 'new hash')
+            state_store.close()
+
+    @staticmethod
+    def test_payload_hashes():
+        """ Test payload hashes are stored per kind and identifier """
+        with tempfile.TemporaryDirectory() as directory:
+            state_store = StateStore(os.path.join(directory, 'state.sqlite'))
+            assert state_store.is_ingested('project', '0', 'hash') is False
+            state_store.set_ingested('project', '0', 'hash')
+            assert state_store.is_ingested('project', '0', 'hash') is True
+            assert state_store.is_ingested('project', '0', 'other hash') is False
+            assert state_store.is_ingested('project_details', '0', 'hash') is False
+            state_store.close()
@@ -1,4 +1,5 @@
 """ UNITTEST """
+import re
 import unittest
 from GenericFunctions.TextSanitizers import TextSanitizers
 
@@ -31,3 +32,19 @@ class Unittests(unittest.TestCase):
         result = text_sanitizer.sentence_case(sentence, strip_spaces=False)
 
         assert result == ' mock '
+
+    @staticmethod
+    def test_remove_captions():
+        """ Test captions are removed the same way the regex they replace removes them """
+        caption = re.compile(r'<(?:(?!<).)*?>Klik op de \S+ om te vergroten.+?>')
+        for html in ['<p>tekst</p><figcaption>Klik op de foto om te vergroten</figcaption><p>meer</p>',
+                     '<a>b>Klik op de kaart om te vergroten>>c',
+                     '<a><b>Klik op de foto om te vergroten\n</b>',
+                     '<a\n>Klik op de foto om te vergroten</a>',
+                     '<a>Klik op de  foto om te vergroten</a>',
+                     '<a>Klik op de foto om te vergroten',
+                     'x>Klik op de foto om te vergroten</a><b>Klik op de foto om te vergroten</b>',
+                     '<<a>Klik op de foto om te vergroten<>Klik op de foto om te vergroten>']:
+            assert TextSanitizers.remove_captions(html) == caption.sub('', html), html
+        html = '<a href="/publish/pages/1/">x</a><i>Klik op de foto om te vergroten</i>'
+        assert TextSanitizers.rewrite_html(html) == '<a href="https://www.amsterdam.nl/publish/pages/1/">x</a>'